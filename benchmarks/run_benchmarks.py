@@ -0,0 +1,316 @@
+"""
+Benchmarks for the REST routes and the MCP tools of the Fristenkalender API.
+
+The app is driven in-process through httpx' ASGITransport (no server, no network), so the numbers only
+contain the time spent in the app (incl. its middleware) and are reproducible on one machine. For every
+scenario the suite measures
+  * the latency of cold requests (all caches are cleared before each of them),
+  * the latency of warm requests (percentiles),
+  * the throughput (requests per second) of many concurrent warm requests and
+  * the memory allocated per warm request (peak of the memory traced by tracemalloc).
+
+Usage (from the repository root):
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --output benchmarks/baseline.json
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json --tolerance 0.25
+The comparison mode exits with code 1 if any metric is worse than the baseline by more than the tolerance.
+Only compare results that were measured on the same machine.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from app import metrics
+from app.main import app
+from app.settings import WorkingDayIndexSettings
+from app.working_days import build_index
+
+_MCP_HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """one request (REST) or tool call (MCP) that is benchmarked"""
+
+    name: str
+    path: str = ""
+    method: str = "GET"
+    body: Any = None
+    tool: str | None = None
+    arguments: dict[str, Any] = field(default_factory=dict)
+
+
+_YEAR = 2025
+_DATES = [f"{_YEAR}-{month:02d}-{day:02d}" for month in range(1, 13) for day in (1, 10, 20)]
+
+SCENARIOS = [
+    Scenario("IsWorkingDay", f"/api/IsWorkingDay/{_YEAR}-06-02"),
+    Scenario("NextWorkingDay", f"/api/NextWorkingDay/{_YEAR}-12-23"),
+    Scenario("PreviousWorkingDay", f"/api/PreviousWorkingDay/{_YEAR}-12-27"),
+    Scenario("AddWorkingDays", f"/api/AddWorkingDays/{_YEAR}-01-02/20"),
+    Scenario("AddCalendarDays", f"/api/AddCalendarDays/{_YEAR}-01-02/20?end_date_type=inclusive"),
+    Scenario("WorkingDaysBetween", f"/api/WorkingDaysBetween/{_YEAR}-01-01/{_YEAR + 1}-01-01"),
+    Scenario("ListWorkingDays", f"/api/ListWorkingDays/{_YEAR}-01-01/{_YEAR + 1}-01-01"),
+    Scenario(
+        "IsWorkingDayBatch",
+        "/api/IsWorkingDayBatch",
+        "POST",
+        {"start_date": f"{_YEAR}-01-01", "end_date": f"{_YEAR}-12-31"},
+    ),
+    Scenario(
+        "AddWorkingDaysBatch",
+        "/api/AddWorkingDaysBatch",
+        "POST",
+        {"start_dates": _DATES, "numbers_of_days": list(range(len(_DATES)))},
+    ),
+    Scenario(
+        "AddCalendarDaysBatch",
+        "/api/AddCalendarDaysBatch",
+        "POST",
+        {"start_dates": _DATES, "numbers_of_days": list(range(len(_DATES)))},
+    ),
+    Scenario("GenerateAllFristen", f"/api/GenerateAllFristen/{_YEAR}"),
+    Scenario("GenerateFristenForType", f"/api/GenerateFristenForType/{_YEAR}/GPKE"),
+    Scenario("GenerateAllFristenRange", f"/api/GenerateAllFristenRange/{_YEAR}/{_YEAR + 2}"),
+    Scenario("GenerateAndExportWholeCalendar", f"/api/GenerateAndExportWholeCalendar/f.ics/a@example.com/{_YEAR}"),
+    Scenario(
+        "GenerateAndExportFristenForType",
+        f"/api/GenerateAndExportFristenForType/f.ics/a@example.com/{_YEAR}/GPKE",
+    ),
+    Scenario("mcp:is_working_day", tool="is_working_day", arguments={"check_date": f"{_YEAR}-06-02"}),
+    Scenario("mcp:next_working_day", tool="next_working_day", arguments={"start_date": f"{_YEAR}-12-23"}),
+    Scenario("mcp:previous_working_day", tool="previous_working_day", arguments={"start_date": f"{_YEAR}-12-27"}),
+    Scenario(
+        "mcp:add_working_days",
+        tool="add_working_days",
+        arguments={"start_date": f"{_YEAR}-01-02", "number_of_days": 20},
+    ),
+    Scenario(
+        "mcp:add_calendar_days",
+        tool="add_calendar_days",
+        arguments={"start_date": f"{_YEAR}-01-02", "number_of_days": 20},
+    ),
+    Scenario("mcp:generate_all_fristen", tool="generate_all_fristen", arguments={"year": _YEAR}),
+    Scenario(
+        "mcp:generate_fristen_for_type",
+        tool="generate_fristen_for_type",
+        arguments={"year": _YEAR, "fristen_type": "GPKE"},
+    ),
+]
+
+
+def _clear_caches() -> None:
+    # every cache of the app registers itself for the metrics
+    for cache in metrics.registered_caches().values():
+        cache.clear()
+
+
+def _percentiles(samples_in_seconds: list[float]) -> dict[str, float]:
+    """p50/p90/p99 (nearest rank), mean and max in milliseconds"""
+    ordered = sorted(sample * 1000 for sample in samples_in_seconds)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+    return {
+        "p50": round(percentile(0.5), 3),
+        "p90": round(percentile(0.9), 3),
+        "p99": round(percentile(0.99), 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class _Driver:
+    """sends the request of a scenario to the app (MCP tool calls within one MCP session)"""
+
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+        self._session_id: str | None = None
+        self._call_id = 0
+
+    async def _mcp_post(self, payload: dict[str, Any]) -> httpx.Response:
+        headers = dict(_MCP_HEADERS)
+        if self._session_id is not None:
+            headers["mcp-session-id"] = self._session_id
+        return await self._client.post("/mcp", headers=headers, json=payload)
+
+    async def open_mcp_session(self) -> None:
+        """initializes an MCP session (waits until the lazily built MCP server is ready)"""
+        response = await self._mcp_post(
+            {
+                "jsonrpc": "2.0",
+                "id": 0,
+                "method": "initialize",
+                "params": {
+                    "protocolVersion": "2025-03-26",
+                    "capabilities": {},
+                    "clientInfo": {"name": "benchmarks", "version": "1.0"},
+                },
+            }
+        )
+        response.raise_for_status()
+        self._session_id = response.headers["mcp-session-id"]
+        await self._mcp_post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def send(self, scenario: Scenario) -> None:
+        """sends the request and fails if it was not successful"""
+        if scenario.tool is None:
+            response = await self._client.request(scenario.method, scenario.path, json=scenario.body)
+            response.raise_for_status()
+            return
+        self._call_id += 1
+        response = await self._mcp_post(
+            {
+                "jsonrpc": "2.0",
+                "id": self._call_id,
+                "method": "tools/call",
+                "params": {"name": scenario.tool, "arguments": scenario.arguments},
+            }
+        )
+        response.raise_for_status()
+        data = next(line[6:] for line in response.text.splitlines() if line.startswith("data: "))
+        if json.loads(data)["result"].get("isError"):
+            raise RuntimeError(f"MCP tool call {scenario.name} failed: {data}")
+
+
+async def _time(request: Callable[[], Awaitable[None]]) -> float:
+    start = time.perf_counter()
+    await request()
+    return time.perf_counter() - start
+
+
+async def _benchmark(driver: _Driver, scenario: Scenario, args: argparse.Namespace) -> dict[str, Any]:
+    cold = []
+    for _ in range(args.cold_requests):
+        _clear_caches()
+        cold.append(await _time(lambda: driver.send(scenario)))
+    warm = [await _time(lambda: driver.send(scenario)) for _ in range(args.warm_requests)]
+
+    requests_per_worker = max(1, args.throughput_requests // args.concurrency)
+
+    async def worker() -> None:
+        for _ in range(requests_per_worker):
+            await driver.send(scenario)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    requests_per_second = requests_per_worker * args.concurrency / (time.perf_counter() - start)
+
+    allocations = []
+    tracemalloc.start()
+    try:
+        for _ in range(args.allocation_requests):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await driver.send(scenario)
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "cold_ms": _percentiles(cold),
+        "warm_ms": _percentiles(warm),
+        "requests_per_second": round(requests_per_second, 1),
+        "concurrency": args.concurrency,
+        "allocated_kib_per_request": round(sorted(allocations)[len(allocations) // 2] / 1024, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """runs all (selected) scenarios against the app (with its lifespan) and returns the results"""
+    build_index(WorkingDayIndexSettings())  # measure the steady state, not the fallback during the index build
+    scenarios = [scenario for scenario in SCENARIOS if not args.only or args.only in scenario.name]
+    results: dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmarks") as client:
+            driver = _Driver(client)
+            # also waits for the MCP server, which is built in the background and would slow down the measurements
+            await driver.open_mcp_session()
+            for scenario in scenarios:
+                results[scenario.name] = await _benchmark(driver, scenario, args)
+                print(f"{scenario.name:35} {json.dumps(results[scenario.name])}", file=sys.stderr)
+    return {
+        "metadata": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "packages": {
+                package: version(package)
+                for package in ("fastapi", "fastmcp", "fristenkalender-generator", "bdew-datetimes", "holidays")
+            },
+        },
+        "results": results,
+    }
+
+
+# (metric path, True if larger values are better)
+_COMPARED_METRICS = [
+    (("cold_ms", "p50"), False),
+    (("warm_ms", "p50"), False),
+    (("warm_ms", "p90"), False),
+    (("requests_per_second",), True),
+    (("allocated_kib_per_request",), False),
+]
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], tolerance: float) -> list[str]:
+    """returns a description of every metric that is worse than in the baseline by more than the tolerance"""
+    regressions = []
+    for name, current_result in current["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+        for metric_path, larger_is_better in _COMPARED_METRICS:
+            old, new = baseline_result, current_result
+            for key in metric_path:
+                old, new = old[key], new[key]
+            if larger_is_better:
+                is_regression = new < old * (1 - tolerance)
+            else:
+                # absolute slack, so that sub-millisecond/-kilobyte jitter is not reported
+                is_regression = new > old * (1 + tolerance) + 0.05
+            if is_regression:
+                regressions.append(f"{name} {'.'.join(metric_path)}: {old} -> {new}")
+    return regressions
+
+
+def main() -> None:
+    """command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=Path, help="write the results to this JSON (baseline) file")
+    parser.add_argument("--compare", type=Path, help="compare the results with this JSON baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default: 0.25)")
+    parser.add_argument("--only", help="only run the scenarios whose names contain this string")
+    parser.add_argument("--cold-requests", type=int, default=5)
+    parser.add_argument("--warm-requests", type=int, default=200)
+    parser.add_argument("--throughput-requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--allocation-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.compare is not None:
+        regressions = compare(json.loads(args.compare.read_text(encoding="utf-8")), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+A small, thread-safe, size bounded in-process LRU cache.
+
+The sync endpoints run in Starlette's thread pool, so the cache has to be safe to use from many threads
+at once. Unlike ``functools.lru_cache`` the size is configurable at runtime (see app.settings) and the
+hit/miss counters are available per cache instance.
+
+Concurrent requests for the same missing key are coalesced ("single-flight"): only the first one computes
+the value, the others wait for its result instead of computing the same value again.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, NamedTuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheStats(NamedTuple):
+    """a snapshot of the counters of a :class:`LruCache`"""
+
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+    coalesced: int = 0
+    """number of lookups that waited for the computation that another thread had already started for their key"""
+
+
+class LruCache(Generic[K, V]):
+    """
+    A least-recently-used cache that computes missing values on demand.
+
+    The computation of a missing value runs outside the lock, so a slow computation does not block
+    lookups of other keys. Lookups of a key whose value is being computed wait for that computation.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive but was {maxsize}")
+        self._maxsize = maxsize
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: dict[K, Future[V]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def get_or_compute(self, key: K, compute: Callable[[], V]) -> V:
+        """
+        Returns the cached value for key; if there is none, the value is computed by calling compute()
+        and stored (evicting the least recently used entry if the cache is full).
+        If another thread is already computing the value for key, waits for (and returns) its result; if that
+        computation fails, the exception is raised in all waiting threads, too (and nothing is cached).
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            future = self._in_flight.get(key)
+            computes_value = future is None
+            if future is None:
+                self._misses += 1
+                future = self._in_flight[key] = Future()
+            else:
+                self._coalesced += 1
+        if not computes_value:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as exception:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(exception)
+            raise
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def stats(self) -> CacheStats:
+        """returns the current hit/miss counters and the fill level"""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                size=len(self._entries),
+                maxsize=self._maxsize,
+                coalesced=self._coalesced,
+            )
+
+    def clear(self) -> None:
+        """
+        removes all entries (computations in flight are not affected); the counters are kept, so that they never
+        decrease (they are exported as Prometheus counters, see app.metrics)
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+__all__ = ["CacheStats", "LruCache"]
@@ -0,0 +1,300 @@
+"""
+A read-only binary file with everything the app would otherwise compute on startup or on demand: the tables of
+the working day index (see app.working_days) and the Fristen of all years and types.
+
+The file is written once at build time (the Docker image ships one, see the Dockerfile):
+
+    python -m app.calendar_artifact calendar.artifact [--first-year 1901] [--last-year 2099]
+
+With CALENDAR_ARTIFACT_PATH (see app.settings.CalendarArtifactSettings) every worker process opens it with
+mmap. The large tables of the working day index are used directly as memoryviews of the mapping, so all workers
+share the same pages (of the OS page cache) instead of building and holding their own copies; the Fristen of
+a (year, type) are decoded from their fixed size records when they are first requested (which is much cheaper
+than generating them). The results are the same either way (a test guards this).
+
+Layout (all offsets are relative to the start of the file, the tables start at multiples of 8):
+  * the magic bytes, the length of the header (4 bytes, little endian) and the header (UTF-8 JSON): the
+    format version, the versions of the calendar libraries the artifact was computed with, the covered ranges,
+    the strings (labels, descriptions, holiday names) and the position of every table
+  * the working day flags (1 byte per day), working_days_before and working_day_offsets (unsigned int each)
+  * the holidays: their offsets from the first day (unsigned int) and the indices of their names (unsigned short)
+  * the Fristen: one record per Frist (see _FRIST_RECORD), grouped by (year, type)
+
+The artifact is only used if its format version, the byte order and the library versions match the running
+app; otherwise the app logs a warning and computes everything itself (see load()).
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import struct
+import sys
+import threading
+from array import array
+from datetime import date
+from importlib.metadata import version
+from pathlib import Path
+from typing import Any, Literal, Sequence
+
+from fristenkalender_generator.bdew_calendar_generator import (
+    FristenType,
+    FristWithAttributes,
+    FristWithAttributesAndType,
+)
+
+from app.generation import generate
+from app.settings import CalendarArtifactSettings, WorkingDayIndexSettings
+from app.working_days import Holiday, WorkingDayIndex
+
+_logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+"""increment on every change of the layout (or of the meaning of its contents)"""
+
+_MAGIC = b"FKARTIFT"
+_HEADER_LENGTH = struct.Struct("<I")
+_ALIGNMENT = 8
+
+_FRIST_RECORD = struct.Struct("<IHbHB")
+"""date (ordinal), label (string index), ref_not_in_the_same_month (-1 = None), description (string index), type"""
+_NO_FRISTEN_TYPE = 255
+_FRISTEN_TYPES = list(FristenType)
+
+_LIBRARIES = ("fristenkalender-generator", "holidays", "bdew-datetimes")
+
+
+def installed_versions() -> dict[str, str]:
+    """the versions of the libraries that the contents of the artifact depend on"""
+    return {library: version(library) for library in _LIBRARIES}
+
+
+def _fristen_key(year: int, fristen_type: FristenType | None) -> str:
+    return f"{year}/{'all' if fristen_type is None else fristen_type.name}"
+
+
+class CalendarArtifact:  # pylint:disable=too-many-instance-attributes
+    """an opened (memory mapped) calendar artifact"""
+
+    def __init__(self, buffer: memoryview, header: dict[str, Any]) -> None:
+        self._buffer = buffer
+        self._strings: list[str] = header["strings"]
+        self._fristen: dict[str, list[int]] = header["fristen"]  # key -> [first record, number of records]
+        self._fristen_offset: int = header["tables"]["fristen"][0]
+        self.versions: dict[str, str] = header["versions"]
+        self.first_year: int = header["first_year"]
+        self.last_year: int = header["last_year"]
+        self.working_day_index = self._working_day_index(header)
+
+    def _table(self, header: dict[str, Any], name: str, item_format: Literal["B", "H", "I"] = "B") -> memoryview:
+        offset, length = header["tables"][name]
+        return self._buffer[offset : offset + length].cast(item_format)
+
+    def _working_day_index(self, header: dict[str, Any]) -> WorkingDayIndex:
+        first_day = date.fromisoformat(header["index_first_day"])
+        holiday_offsets = self._table(header, "holiday_offsets", "I")
+        holiday_names = self._table(header, "holiday_names", "H")
+        holidays = [
+            Holiday(date.fromordinal(first_day.toordinal() + offset), self._strings[name])
+            for offset, name in zip(holiday_offsets, holiday_names)
+        ]
+        return WorkingDayIndex(
+            first_day,
+            self._table(header, "flags"),
+            holidays,
+            working_days_before=self._table(header, "working_days_before", "I"),
+            working_day_offsets=self._table(header, "working_day_offsets", "I"),
+        )
+
+    @classmethod
+    def open(cls, path: Path) -> "CalendarArtifact":
+        """maps the artifact into memory; raises a ValueError if it was not written for the running app"""
+        with open(path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)  # stays valid after closing the file
+        buffer = memoryview(mapping)
+        header_start = len(_MAGIC) + _HEADER_LENGTH.size
+        if bytes(buffer[: len(_MAGIC)]) != _MAGIC:
+            raise ValueError(f"{path} is not a calendar artifact")
+        (header_length,) = _HEADER_LENGTH.unpack_from(buffer, len(_MAGIC))
+        header = json.loads(bytes(buffer[header_start : header_start + header_length]))
+        if header["format_version"] != FORMAT_VERSION or header["byteorder"] != sys.byteorder:
+            raise ValueError(
+                f"{path} has format version {header['format_version']} ({header['byteorder']} endian) but "
+                f"version {FORMAT_VERSION} ({sys.byteorder} endian) is required"
+            )
+        if header["versions"] != installed_versions():
+            raise ValueError(f"{path} was computed with {header['versions']} but {installed_versions()} are installed")
+        return cls(buffer, header)
+
+    def covers(self, year: int, fristen_type: FristenType | None = None) -> bool:
+        """true if the artifact contains the Fristen of the year (of the given type)"""
+        return _fristen_key(year, fristen_type) in self._fristen
+
+    def fristen(self, year: int, fristen_type: FristenType | None = None) -> tuple[FristWithAttributes, ...] | None:
+        """the Fristen of the year (of the given type); None if the year is not covered"""
+        position = self._fristen.get(_fristen_key(year, fristen_type))
+        if position is None:
+            return None
+        start = self._fristen_offset + position[0] * _FRIST_RECORD.size
+        records = self._buffer[start : start + position[1] * _FRIST_RECORD.size]
+        return tuple(self._frist(*record) for record in _FRIST_RECORD.iter_unpack(records))
+
+    def _frist(self, ordinal: int, label: int, ref: int, description: int, type_index: int) -> FristWithAttributes:
+        # the labels are the Literal strings the generator wrote
+        values: tuple[date, Any, int | None, str] = (
+            date.fromordinal(ordinal),
+            self._strings[label],
+            None if ref < 0 else ref,
+            self._strings[description],
+        )
+        if type_index == _NO_FRISTEN_TYPE:
+            return FristWithAttributes(*values)
+        return FristWithAttributesAndType(*values, _FRISTEN_TYPES[type_index])
+
+
+def write(path: Path, first_year: int, last_year: int, index_first_year: int, index_last_year: int) -> None:
+    """
+    computes the working day index for [index_first_year, index_last_year] and the Fristen of all types for
+    [first_year, last_year] and writes them to path (see the module docstring for the layout)
+    """
+    index = WorkingDayIndex.build(date(index_first_year, 1, 1), date(index_last_year, 12, 31))
+    strings: dict[str, int] = {}  # string -> index
+    records, fristen_positions = _fristen_records(range(first_year, last_year + 1), strings)
+    holiday_names = [strings.setdefault(name, len(strings)) for name in index.holiday_names]
+    tables = {
+        "flags": bytes(index.flags),
+        "working_days_before": array("I", index.working_days_before).tobytes(),
+        "working_day_offsets": array("I", index.working_day_offsets).tobytes(),
+        "holiday_offsets": index.holiday_offsets.tobytes(),
+        "holiday_names": array("H", holiday_names).tobytes(),
+        "fristen": records,
+    }
+    header: dict[str, Any] = {
+        "format_version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "versions": installed_versions(),
+        "first_year": first_year,
+        "last_year": last_year,
+        "index_first_day": index.first_day.isoformat(),
+        "strings": list(strings),
+        "fristen": fristen_positions,
+    }
+    content = _layout(header, tables)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_bytes(content)
+    temporary.replace(path)
+    _logger.info("Wrote the calendar artifact (%s bytes) to %s", len(content), path)
+
+
+def _fristen_records(years: range, strings: dict[str, int]) -> tuple[bytes, dict[str, list[int]]]:
+    """the records of all Fristen of the years and the [first record, number of records] per (year, type)"""
+    records = bytearray()
+    positions: dict[str, list[int]] = {}
+    for year in years:
+        for fristen_type in [None, *FristenType]:
+            generated = generate(year, fristen_type)
+            positions[_fristen_key(year, fristen_type)] = [len(records) // _FRIST_RECORD.size, len(generated)]
+            for frist in generated:
+                records += _FRIST_RECORD.pack(
+                    frist.date.toordinal(),
+                    strings.setdefault(frist.label, len(strings)),
+                    -1 if frist.ref_not_in_the_same_month is None else frist.ref_not_in_the_same_month,
+                    strings.setdefault(frist.description, len(strings)),
+                    _NO_FRISTEN_TYPE if fristen_type is None else _FRISTEN_TYPES.index(fristen_type),
+                )
+        _logger.info("Computed the Fristen of %s", year)
+    return bytes(records), positions
+
+
+def _layout(header: dict[str, Any], tables: dict[str, bytes]) -> bytes:
+    """the complete artifact; adds the positions of the tables to the header"""
+    # the positions of the tables depend on the length of the header (which contains them)
+    header_length = 0
+    while True:
+        offset = _aligned(len(_MAGIC) + _HEADER_LENGTH.size + header_length)
+        header["tables"] = {}
+        for name, table in tables.items():
+            header["tables"][name] = [offset, len(table)]
+            offset = _aligned(offset + len(table))
+        encoded_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(encoded_header) <= header_length:
+            break
+        header_length = len(encoded_header)
+    content = bytearray(_MAGIC + _HEADER_LENGTH.pack(header_length) + encoded_header.ljust(header_length))
+    for name, table in tables.items():
+        content += bytes(header["tables"][name][0] - len(content)) + table
+    return bytes(content)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+_artifact: CalendarArtifact | None = None  # pylint:disable=invalid-name
+_artifact_lock = threading.Lock()
+
+
+def load(settings: CalendarArtifactSettings) -> CalendarArtifact | None:
+    """
+    opens the configured artifact (once) and uses it for all following lookups (see fristen()); None if no
+    artifact is configured or if it cannot be used (e.g. because it was computed with other library versions)
+    """
+    global _artifact  # pylint:disable=global-statement
+    path = settings.calendar_artifact_path
+    if path is None:
+        return None
+    with _artifact_lock:
+        if _artifact is None:
+            try:
+                _artifact = CalendarArtifact.open(path)
+            except (OSError, ValueError, KeyError):
+                _logger.warning("Not using the calendar artifact %s", path, exc_info=True)
+                return None
+            _logger.info("Using the calendar artifact %s (%s-%s)", path, _artifact.first_year, _artifact.last_year)
+        return _artifact
+
+
+def get_artifact() -> CalendarArtifact | None:
+    """the artifact used by fristen(); None as long as none is loaded"""
+    return _artifact
+
+
+def covers(year: int, fristen_type: FristenType | None = None) -> bool:
+    """true if an artifact is loaded and contains the Fristen of the year (of the given type)"""
+    artifact = _artifact
+    return artifact is not None and artifact.covers(year, fristen_type)
+
+
+def fristen(year: int, fristen_type: FristenType | None = None) -> tuple[FristWithAttributes, ...] | None:
+    """the Fristen of the year (of the given type) from the loaded artifact; None if there is none or it lacks them"""
+    artifact = _artifact
+    return None if artifact is None else artifact.fristen(year, fristen_type)
+
+
+def main(arguments: Sequence[str] | None = None) -> None:
+    """writes the artifact (for the years the Fristen endpoints accept and the configured working day index)"""
+    index_settings = WorkingDayIndexSettings()
+    parser = argparse.ArgumentParser(description="Precomputes the working days and the Fristen of all years.")
+    parser.add_argument("path", type=Path, help="the artifact file to write")
+    parser.add_argument("--first-year", type=int, default=1901, help="first year of the Fristen")
+    parser.add_argument("--last-year", type=int, default=2099, help="last year (inclusive) of the Fristen")
+    parser.add_argument("--index-first-year", type=int, default=index_settings.working_day_index_first_year)
+    parser.add_argument("--index-last-year", type=int, default=index_settings.working_day_index_last_year)
+    parsed = parser.parse_args(arguments)
+    logging.basicConfig(level=logging.INFO)
+    write(parsed.path, parsed.first_year, parsed.last_year, parsed.index_first_year, parsed.index_last_year)
+
+
+__all__ = [
+    "FORMAT_VERSION",
+    "CalendarArtifact",
+    "covers",
+    "fristen",
+    "get_artifact",
+    "installed_versions",
+    "load",
+    "write",
+]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Caches the Fristen generated by the ``fristenkalender_generator``.
+
+The generated Fristen only depend on the year, the (optional) FristenType and the versions of the
+packages that implement the calendar logic. So instead of regenerating a whole year on every request,
+the results are kept in a size bounded LRU cache (see app.cache) whose keys contain all of the above.
+The JSON responses of the Fristen endpoints (in both the default and the columnar format) are cached (as bytes,
+see app.serialization) the same way.
+Missing results are read from the calendar artifact (see app.calendar_artifact), if one is loaded and covers
+them, or generated via app.generation (in worker processes, if the pool is enabled).
+"""
+
+import logging
+from concurrent.futures import Future
+from datetime import date
+from importlib.metadata import version
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+from fristenkalender_generator.bdew_calendar_generator import (
+    FristenType,
+    FristWithAttributes,
+    FristWithAttributesAndType,
+)
+
+from app import calendar_artifact, generation, metrics
+from app.cache import LruCache
+from app.serialization import serialize_fristen, serialize_fristen_columnar
+from app.settings import FristenCacheSettings
+
+_logger = logging.getLogger(__name__)
+
+GENERATOR_VERSION = version("fristenkalender-generator")
+HOLIDAYS_VERSION = version("holidays")
+
+
+class FristenCacheKey(NamedTuple):
+    """identifies one result of the generator; fristen_type None means 'all fristen'"""
+
+    year: int
+    fristen_type: FristenType | None
+    generator_version: str
+    holidays_version: str
+
+
+def make_key(year: int, fristen_type: FristenType | None = None) -> FristenCacheKey:
+    """creates the cache key for the given year and type using the currently installed package versions"""
+    return FristenCacheKey(year, fristen_type, GENERATOR_VERSION, HOLIDAYS_VERSION)
+
+
+fristen_cache: LruCache[FristenCacheKey, tuple[FristWithAttributes, ...]] = LruCache(
+    maxsize=FristenCacheSettings().fristen_cache_size
+)
+"""
+The cached fristen are shared between requests and must not be modified by the callers.
+"""
+
+serialized_fristen_cache: LruCache[FristenCacheKey, bytes] = LruCache(maxsize=FristenCacheSettings().fristen_cache_size)
+"""
+The pre-serialized JSON arrays of the cached fristen (see app.serialization), ready to be sent as response body.
+"""
+
+columnar_fristen_cache: LruCache[FristenCacheKey, bytes] = LruCache(maxsize=FristenCacheSettings().fristen_cache_size)
+"""
+The cached fristen serialized in the (opt-in) columnar format (see app.serialization.serialize_fristen_columnar).
+"""
+
+metrics.register_cache("fristen", fristen_cache)
+metrics.register_cache("fristen_json", serialized_fristen_cache)
+metrics.register_cache("fristen_columnar", columnar_fristen_cache)
+
+
+def type_label(fristen_type: FristenType | None) -> str:
+    """the fristen_type label of the metrics (and log messages)"""
+    return "all" if fristen_type is None else fristen_type.name
+
+
+def sort_key(frist: FristWithAttributes) -> tuple[date, str, int, str]:
+    """orders the fristen by date; fristen on the same date in a fixed order, regardless of the year they came from"""
+    return frist.date, frist.label, frist.ref_not_in_the_same_month or 0, frist.description
+
+
+_PendingFristen = dict[tuple[int, FristenType | None], Future[tuple[FristWithAttributes, ...]]]
+
+
+def _get_fristen(
+    year: int, fristen_type: FristenType | None, pending: _PendingFristen | None = None
+) -> tuple[FristWithAttributes, ...]:
+    """
+    returns the cached fristen or (on a miss) the precomputed ones of the calendar artifact, the result of the
+    pending generation or of a new one
+    """
+    return fristen_cache.get_or_compute(
+        make_key(year, fristen_type), lambda: _compute_fristen(year, fristen_type, pending)
+    )
+
+
+def _compute_fristen(
+    year: int, fristen_type: FristenType | None, pending: _PendingFristen | None = None
+) -> tuple[FristWithAttributes, ...]:
+    """the precomputed fristen of the calendar artifact or the result of the pending generation or of a new one"""
+    precomputed = calendar_artifact.fristen(year, fristen_type)
+    if precomputed is not None:
+        return precomputed
+    with metrics.timer("fristen_generation_seconds", (("fristen_type", type_label(fristen_type)),)):
+        future = (pending or {}).get((year, fristen_type)) or generation.submit(year, fristen_type)
+        return future.result()
+
+
+def _generate_missing(requests: Iterable[tuple[int, FristenType | None]]) -> _PendingFristen:
+    """
+    starts generating all (year, fristen_type) results that are neither cached nor precomputed yet in parallel
+    (if the pool is used)
+    """
+    return generation.submit_all(
+        request
+        for request in requests
+        if make_key(*request) not in fristen_cache and not calendar_artifact.covers(*request)
+    )
+
+
+def _generate_ahead(requests: Sequence[tuple[int, FristenType | None]]) -> Iterator[_PendingFristen]:
+    """
+    yields the pending generations once before each of the requests is used (in their order). With the pool, the
+    missing results of the next 2 x pool size requests are generated in parallel ahead of their use -- but not
+    more, so that a long range of years is streamed instead of being held in memory at once.
+    """
+    window = 2 * generation.pool_size()
+    pending: _PendingFristen = {}
+    for position, request in enumerate(requests):
+        ahead = requests[position : position + window]
+        pending.update(_generate_missing(next_request for next_request in ahead if next_request not in pending))
+        yield pending
+        pending.pop(request, None)
+
+
+def get_all_fristen(year: int) -> tuple[FristWithAttributes, ...]:
+    """returns all fristen for the given year (cached)"""
+    return _get_fristen(year, None)
+
+
+def get_fristen_for_type(year: int, fristen_type: FristenType) -> tuple[FristWithAttributesAndType, ...]:
+    """returns the fristen of the given type for the given year (cached)"""
+    fristen = _get_fristen(year, fristen_type)
+    return fristen  # type: ignore[return-value] # entries with a fristen_type are always FristWithAttributesAndType
+
+
+def iter_fristen(
+    from_year: int, to_year: int, fristen_type: FristenType | None = None
+) -> Iterator[FristWithAttributes]:
+    """
+    Yields the (cached) fristen of all years in [from_year, to_year] (of the given type, if any), year by year.
+
+    The fristen of one year range from December of the previous to January of the following year, so the
+    results of consecutive years overlap; fristen that were already yielded for the previous year are skipped.
+    The generator does not list the fristen of a year in the order of their dates (e.g. those of one type are
+    grouped by label), so the remaining fristen of every year are sorted (see sort_key). Hence, the fristen are
+    yielded in the order of their dates, each one exactly once.
+    If the generation pool is used, the missing years are generated in parallel, a few years ahead.
+    """
+    requests = [(year, fristen_type) for year in range(from_year, to_year + 1)]
+    previous_year_fristen: frozenset[FristWithAttributes] = frozenset()
+    for (year, _), pending in zip(requests, _generate_ahead(requests)):
+        fristen = _get_fristen(year, fristen_type, pending)
+        yield from sorted((frist for frist in fristen if frist not in previous_year_fristen), key=sort_key)
+        previous_year_fristen = frozenset(fristen)
+
+
+def read_fristen(years: range, fristen_type: FristenType | None = None) -> Iterator[tuple[FristWithAttributes, ...]]:
+    """
+    Yields the fristen of every year in years (of the given type, if any), year by year. Unlike iter_fristen, the
+    years that are not cached yet are not added to the cache, so that reading many years at once (e.g. to index
+    them) does not evict the years that are requested the most.
+    """
+    requests = [(year, fristen_type) for year in years]
+    for (year, _), pending in zip(requests, _generate_ahead(requests)):
+        if make_key(year, fristen_type) in fristen_cache:
+            yield _get_fristen(year, fristen_type)
+        else:
+            yield _compute_fristen(year, fristen_type, pending)
+
+
+def _get_fristen_json(year: int, fristen_type: FristenType | None, columnar: bool = False) -> bytes:
+    def compute() -> bytes:
+        fristen = _get_fristen(year, fristen_type)
+        with metrics.timer("fristen_serialization_seconds", (("fristen_type", type_label(fristen_type)),)):
+            if not columnar:
+                return serialize_fristen(fristen)
+            # the columns are known even if there are no fristen (of the type) in the year
+            frist_class = FristWithAttributes if fristen_type is None else FristWithAttributesAndType
+            return serialize_fristen_columnar(fristen, frist_class)
+
+    cache = columnar_fristen_cache if columnar else serialized_fristen_cache
+    return cache.get_or_compute(make_key(year, fristen_type), compute)
+
+
+def get_all_fristen_json(year: int, columnar: bool = False) -> bytes:
+    """returns all fristen for the given year as compact JSON array (or in the columnar format) (cached)"""
+    return _get_fristen_json(year, None, columnar)
+
+
+def get_fristen_for_type_json(year: int, fristen_type: FristenType, columnar: bool = False) -> bytes:
+    """
+    returns the fristen of the given type for the given year as compact JSON array (or in the columnar format)
+    (cached)
+    """
+    return _get_fristen_json(year, fristen_type, columnar)
+
+
+def warmup_years(settings: FristenCacheSettings, today: date | None = None) -> range:
+    """the years that are pre-computed on startup: the current year +/- the configured number of years"""
+    current_year = (today or date.today()).year
+    return range(
+        current_year - settings.fristen_cache_warmup_years, current_year + settings.fristen_cache_warmup_years + 1
+    )
+
+
+def warm_up(years: range) -> None:
+    """fills the cache with all fristen and the fristen of every type for the given years"""
+    all_types: list[FristenType | None] = [None, *FristenType]
+    pending = _generate_missing((year, fristen_type) for year in years for fristen_type in all_types)
+    for year in years:
+        for fristen_type in all_types:
+            _get_fristen(year, fristen_type, pending)
+        get_all_fristen_json(year)
+        for fristen_type in FristenType:
+            get_fristen_for_type_json(year, fristen_type)
+    _logger.info("Warmed up the fristen cache for years %s-%s: %s", years.start, years.stop - 1, fristen_cache.stats())
+
+
+__all__ = [
+    "FristenCacheKey",
+    "columnar_fristen_cache",
+    "fristen_cache",
+    "get_all_fristen",
+    "get_all_fristen_json",
+    "get_fristen_for_type",
+    "get_fristen_for_type_json",
+    "iter_fristen",
+    "make_key",
+    "read_fristen",
+    "serialized_fristen_cache",
+    "sort_key",
+    "type_label",
+    "warm_up",
+    "warmup_years",
+]
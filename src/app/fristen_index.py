@@ -0,0 +1,171 @@
+"""
+Answers "which Fristen lie between two dates" (e.g. "this week" or "this month") and "which are the next n Fristen
+from a date on" with a binary search.
+
+The Fristen are generated (and cached, see app.fristen_cache) per year, and the Fristen of one year are neither
+sorted by date nor limited to that year (they range from December of the previous to January of the following
+year). Instead of collecting and scanning whole years on every request, the Fristen of the configured years
+are merged once (in the background on startup, see app.settings.FristenIndexSettings) into one list per
+FristenType (plus one of all Fristen) that is sorted by date; a range of dates is then found by bisecting the
+dates of that list, the upcoming Fristen are the n ones after the bisected position. The index reaches up to
+the last year the Fristen can be generated for, so that it also knows when there are no more (upcoming)
+Fristen, e.g. of a type that ends. Dates before the indexed years (or requested before the index is ready)
+are answered by scanning the years instead, with the same result.
+"""
+
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Iterable, Iterator
+
+from fristenkalender_generator.bdew_calendar_generator import FristenType, FristWithAttributes
+
+from app.fristen_cache import read_fristen, sort_key, type_label
+from app.settings import FristenIndexSettings
+
+_logger = logging.getLogger(__name__)
+
+FIRST_YEAR = 1901
+"""the first year the Fristen can be generated for"""
+
+LAST_YEAR = 2099
+"""the last year the Fristen can be generated for"""
+
+
+def _sorted_between(
+    fristen: Iterable[FristWithAttributes], first_day: date, last_day: date
+) -> tuple[FristWithAttributes, ...]:
+    return tuple(sorted((frist for frist in fristen if first_day <= frist.date <= last_day), key=sort_key))
+
+
+def _own_year_fristen(
+    first_year: int, last_year: int, fristen_type: FristenType | None
+) -> Iterator[FristWithAttributes]:
+    """
+    the fristen dated in [first_year, last_year], each one once; the generated fristen of a year contain all
+    fristen dated in that year (plus some of the adjacent years, which are skipped here)
+    """
+    years = range(first_year, last_year + 1)
+    for year, fristen in zip(years, read_fristen(years, fristen_type)):
+        yield from (frist for frist in fristen if frist.date.year == year)
+
+
+class FristenIndex:
+    """the fristen (of one type or all) dated in [first_day, last_day], sorted by date"""
+
+    def __init__(self, first_day: date, last_day: date, fristen: Iterable[FristWithAttributes]) -> None:
+        self.first_day = first_day
+        self.last_day = last_day
+        self.fristen = _sorted_between(fristen, first_day, last_day)
+        # the ordinals of the dates of the fristen (ascending), for bisect
+        self._ordinals = array("I", (frist.date.toordinal() for frist in self.fristen))
+
+    @classmethod
+    def build(cls, first_year: int, last_year: int, fristen_type: FristenType | None = None) -> "FristenIndex":
+        """indexes the fristen dated in [first_year, last_year] (without adding the years to the fristen cache)"""
+        return cls(
+            date(first_year, 1, 1), date(last_year, 12, 31), _own_year_fristen(first_year, last_year, fristen_type)
+        )
+
+    def covers(self, first_day: date, last_day: date) -> bool:
+        """true if all fristen dated in [first_day, last_day] are in the index"""
+        return self.first_day <= first_day and last_day <= self.last_day
+
+    def between(self, first_day: date, last_day: date) -> tuple[FristWithAttributes, ...] | None:
+        """the fristen dated in [first_day, last_day], sorted by date; None if the range is not covered"""
+        if not self.covers(first_day, last_day):
+            return None
+        start = bisect_left(self._ordinals, first_day.toordinal())
+        end = bisect_right(self._ordinals, last_day.toordinal(), lo=start)
+        return self.fristen[start:end]
+
+    def upcoming(self, from_day: date, number: int) -> tuple[FristWithAttributes, ...] | None:
+        """
+        the first number fristen dated on or after from_day (fewer if the fristen end before LAST_YEAR does),
+        sorted by date; None if from_day is not covered or if the fristen after last_day are needed, too
+        """
+        if not self.covers(from_day, from_day):
+            return None
+        start = bisect_left(self._ordinals, from_day.toordinal())
+        if start + number > len(self.fristen) and self.last_day.year < LAST_YEAR:
+            return None
+        return self.fristen[start : start + number]
+
+
+_indexes: dict[FristenType | None, FristenIndex] = {}
+"""fristen type (None = all fristen) -> index; every index is used as soon as it is built"""
+_indexes_lock = threading.Lock()
+
+
+def indexed_years(settings: FristenIndexSettings, today: date | None = None) -> tuple[int, int]:
+    """the (inclusive) range of years to index: the current year - fristen_index_past_years up to LAST_YEAR"""
+    year = (today or date.today()).year
+    return min(max(FIRST_YEAR, year - settings.fristen_index_past_years), LAST_YEAR), LAST_YEAR
+
+
+def build_indexes(settings: FristenIndexSettings) -> None:
+    """builds the index of all fristen and of every fristen type for the configured years (once)"""
+    first_year, last_year = indexed_years(settings)
+    with _indexes_lock:
+        for fristen_type in (None, *FristenType):
+            if fristen_type not in _indexes:
+                _indexes[fristen_type] = FristenIndex.build(first_year, last_year, fristen_type)
+                _logger.info(
+                    "Built the fristen index of %s fristen for %s-%s", type_label(fristen_type), first_year, last_year
+                )
+
+
+def build_indexes_in_background(settings: FristenIndexSettings) -> None:
+    """
+    Building the indexes takes a moment if the years are not cached yet. Until they are ready, the ranges are
+    answered by scanning the (cached) years, so the app does not have to wait for them to serve requests.
+    """
+    if len(_indexes) == len(FristenType) + 1:
+        return
+    threading.Thread(target=build_indexes, args=(settings,), name="fristen-index", daemon=True).start()
+
+
+def fristen_between(
+    first_day: date, last_day: date, fristen_type: FristenType | None = None
+) -> tuple[FristWithAttributes, ...]:
+    """the fristen (of the given type, if any) dated in [first_day, last_day], sorted by date"""
+    index = _indexes.get(fristen_type)
+    result = index.between(first_day, last_day) if index is not None else None
+    if result is None:
+        # without adding the years to the fristen cache: the range may span many years
+        return _sorted_between(_own_year_fristen(first_day.year, last_day.year, fristen_type), first_day, last_day)
+    return result
+
+
+def upcoming_fristen(
+    from_day: date, number: int, fristen_type: FristenType | None = None
+) -> tuple[FristWithAttributes, ...]:
+    """
+    the first number fristen (of the given type, if any) dated on or after from_day, sorted by date across the
+    years; fewer if the fristen end before (in LAST_YEAR)
+    """
+    index = _indexes.get(fristen_type)
+    result = index.upcoming(from_day, number) if index is not None else None
+    if result is not None:
+        return result
+    upcoming: list[FristWithAttributes] = []
+    for year in range(from_day.year, LAST_YEAR + 1):
+        # year by year, and without adding them to the fristen cache: there may be no more fristen of the type
+        upcoming.extend(_sorted_between(_own_year_fristen(year, year, fristen_type), from_day, date(year, 12, 31)))
+        if len(upcoming) >= number:
+            break
+    return tuple(upcoming[:number])
+
+
+__all__ = [
+    "FIRST_YEAR",
+    "LAST_YEAR",
+    "FristenIndex",
+    "build_indexes",
+    "build_indexes_in_background",
+    "fristen_between",
+    "indexed_years",
+    "upcoming_fristen",
+]
@@ -0,0 +1,98 @@
+"""
+Runs the ``fristenkalender_generator`` either in the calling thread or in a pool of worker processes.
+
+Generating the Fristen of a year is pure python CPU work. In the calling thread it holds the GIL, so
+concurrent generations run one after another and slow down every other request that is served by the
+thread pool in the meantime. When the pool is started (see app.settings.GenerationPoolSettings, off by
+default), the generation runs in worker processes instead: requests for several years or types fan out
+over all cores and the threads of the API process stay free for cheap requests.
+
+The results are plain (picklable) dataclasses, so the callers cannot tell where they were generated.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable
+
+from fristenkalender_generator.bdew_calendar_generator import FristenkalenderGenerator, FristenType, FristWithAttributes
+
+from app.settings import GenerationPoolSettings
+
+_logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None  # pylint:disable=invalid-name
+_pool_size = 0  # pylint:disable=invalid-name
+_pool_lock = threading.Lock()
+
+
+def generate(year: int, fristen_type: FristenType | None = None) -> tuple[FristWithAttributes, ...]:
+    """generates all fristen (fristen_type None) or the fristen of the given type for the year in this process"""
+    if fristen_type is None:
+        return tuple(FristenkalenderGenerator().generate_all_fristen(year))
+    return tuple(FristenkalenderGenerator().generate_fristen_for_type(year, fristen_type))
+
+
+def start_pool(settings: GenerationPoolSettings) -> None:
+    """starts the worker processes (once); from now on, submit() runs the generation in the pool"""
+    global _pool, _pool_size  # pylint:disable=global-statement
+    with _pool_lock:
+        if _pool is None:
+            _pool_size = settings.generation_pool_size or os.cpu_count() or 1
+            # "spawn" instead of "fork": the API process runs threads (e.g. the working day index build) and
+            # forking a multithreaded process may copy locks in an acquired state
+            _pool = ProcessPoolExecutor(max_workers=_pool_size, mp_context=multiprocessing.get_context("spawn"))
+            _logger.info("Started the generation pool with %s worker processes", _pool_size)
+
+
+def shutdown_pool() -> None:
+    """stops the worker processes; the generation runs in the calling thread again afterwards"""
+    global _pool, _pool_size  # pylint:disable=global-statement
+    with _pool_lock:
+        pool, _pool, _pool_size = _pool, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def is_pool_running() -> bool:
+    """true if the generation runs in worker processes"""
+    return _pool is not None
+
+
+def pool_size() -> int:
+    """the number of worker processes; 0 if the generation runs in the calling thread"""
+    return _pool_size
+
+
+def submit(year: int, fristen_type: FristenType | None = None) -> Future[tuple[FristWithAttributes, ...]]:
+    """
+    Starts the generation in the pool and returns the future result. Without a pool, the fristen are
+    generated right away (in the calling thread) and returned as a completed future.
+    """
+    pool = _pool
+    if pool is not None:
+        return pool.submit(generate, year, fristen_type)
+    future: Future[tuple[FristWithAttributes, ...]] = Future()
+    try:
+        future.set_result(generate(year, fristen_type))
+    except Exception as exception:  # pylint:disable=broad-exception-caught # re-raised by future.result()
+        future.set_exception(exception)
+    return future
+
+
+def submit_all(
+    requests: Iterable[tuple[int, FristenType | None]],
+) -> dict[tuple[int, FristenType | None], Future[tuple[FristWithAttributes, ...]]]:
+    """
+    Starts the generation of all (year, fristen_type) requests in the pool at once, so that they run in
+    parallel. Without a pool nothing is generated in advance (an empty dict is returned); the callers then
+    generate each result on demand (e.g. while streaming the previous one).
+    """
+    if _pool is None:
+        return {}
+    return {request: submit(*request) for request in dict.fromkeys(requests)}
+
+
+__all__ = ["generate", "is_pool_running", "pool_size", "shutdown_pool", "start_pool", "submit", "submit_all"]
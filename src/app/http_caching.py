@@ -0,0 +1,164 @@
+"""
+Conditional GET support (ETag, Cache-Control and 304 Not Modified) for the API routes.
+
+The responses of the API only depend on the request (path and query) and on the deployment, i.e. on the
+version of this app (version.json) and of the libraries that implement the calendar logic. So the ETag of a
+response can be derived from those alone, without hashing the body. A request whose If-None-Match contains
+that ETag still reaches the endpoint (so that unknown routes, invalid parameters and other errors are answered
+as such), but a successful response is replaced by a 304 without its body.
+
+The ETags are weak, because the ICS exports contain the time they were rendered (DTSTAMP) and are thus only
+semantically equivalent (but not byte-identical) for the same request.
+"""
+
+import hashlib
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.route_matching import match_route
+from app.settings import HttpCachingSettings
+
+_CACHEABLE_METHODS = {"GET", "HEAD"}
+
+
+# the results of routes with these path parameters may lie arbitrarily far after the dates in their path
+_UNBOUNDED_PATH_PARAMS = {"number_of_days"}
+
+# ... and so may the results of these routes (e.g. the next n Fristen of a type with only a few per year)
+_UNBOUNDED_ROUTES = {"/api/UpcomingFristen/{from_date}"}
+
+
+def _latest_year(path_params: dict[str, str]) -> int | None:
+    """
+    the latest year that the (raw) year/date path parameters refer to; None if they refer to none or if the
+    result of the route is not limited to the (year after the) referenced years
+    """
+    if _UNBOUNDED_PATH_PARAMS.intersection(path_params):
+        return None
+    years: list[int] = []
+    for name, value in path_params.items():
+        try:
+            if name == "year" or name.endswith("_year"):
+                years.append(int(value))
+            elif name == "date" or name.endswith("_date"):
+                years.append(date.fromisoformat(value).year)
+        except ValueError:
+            return None  # invalid parameters are rejected by the endpoint anyway
+    return max(years, default=None)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    weak comparison (RFC 9110, 13.1.2) of the etag with the list of entity tags in an If-None-Match header; the
+    wildcard "*" is not supported, i.e. such requests are answered in full
+    """
+    opaque_tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque_tag for candidate in if_none_match.split(","))
+
+
+def is_not_modified(headers: Headers, etag: str, last_modified: datetime) -> bool:
+    """
+    true if the conditional request (If-None-Match or, only if that is missing, If-Modified-Since, see RFC 9110,
+    13.2.2) can be answered with 304 for a response with the given validators
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        modified_since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False  # invalid dates are ignored
+    return modified_since.tzinfo is not None and last_modified <= modified_since
+
+
+class ConditionalGetMiddleware:  # pylint:disable=too-few-public-methods
+    """
+    Adds a (weak) ETag and Cache-Control to the successful GET responses of all routes below path_prefix
+    and replaces them with 304 (without the body) if the If-None-Match of the request matches the ETag.
+    Error responses never carry an ETag and are thus never replaced.
+
+    Resources that only refer to years before the previous year (according to their year/date path
+    parameters) are marked as immutable. Routes whose paths start with one of the excluded_paths handle
+    caching on their own.
+    """
+
+    def __init__(  # pylint:disable=too-many-arguments
+        self,
+        app: ASGIApp,
+        *,
+        deployment_key: str,
+        routers: Sequence[Router],
+        settings: HttpCachingSettings,
+        path_prefix: str = "/api/",
+        excluded_paths: Iterable[str] = (),
+    ) -> None:
+        """
+        deployment_key identifies the deployment (app and library versions); the routes of the routers are
+        used to find the path parameters of a request before it is handled.
+        """
+        self.app = app
+        self._deployment_key = deployment_key.encode("utf-8")
+        self._routers = routers
+        self._settings = settings
+        self._path_prefix = path_prefix
+        self._excluded_paths = tuple(excluded_paths)
+
+    def _is_cacheable(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] not in _CACHEABLE_METHODS:
+            return False
+        path: str = scope["path"]
+        return path.startswith(self._path_prefix) and not path.startswith(self._excluded_paths)
+
+    def _etag(self, scope: Scope) -> str:
+        digest = hashlib.sha256(self._deployment_key)
+        digest.update(b"\0" + scope["path"].encode("utf-8") + b"?" + scope["query_string"])
+        return f'W/"{digest.hexdigest()[:32]}"'
+
+    def _cache_control(self, scope: Scope) -> str:
+        match = match_route(self._routers, scope)
+        if match is None or getattr(match[0], "path", None) in _UNBOUNDED_ROUTES:
+            latest_year = None
+        else:
+            latest_year = _latest_year(match[1])
+        # the fristen of a year and e.g. the next working day after a date may reach into the following year
+        if latest_year is not None and latest_year + 1 < date.today().year:
+            return f"public, max-age={self._settings.http_cache_immutable_max_age}, immutable"
+        return f"public, max-age={self._settings.http_cache_max_age}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._is_cacheable(scope):
+            await self.app(scope, receive, send)
+            return
+        etag = self._etag(scope)
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        not_modified = False
+
+        async def send_with_validators(message: Message) -> None:
+            nonlocal not_modified
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                if "etag" not in headers:
+                    headers["ETag"] = etag
+                    headers["Cache-Control"] = self._cache_control(scope)
+                    if if_none_match is not None and _etag_matches(if_none_match, etag):
+                        not_modified = True
+                        headers = MutableHeaders({"ETag": etag, "Cache-Control": headers["Cache-Control"]})
+                        await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+                        await send({"type": "http.response.body", "body": b""})
+                        return
+            elif message["type"] == "http.response.body" and not_modified:
+                return  # the (empty) body of the 304 has been sent already
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
+
+
+__all__ = ["ConditionalGetMiddleware", "is_not_modified"]
@@ -0,0 +1,284 @@
+"""
+Renders the Fristen as ICS calendar in memory (instead of exporting them to a temporary file).
+
+A rendered calendar only depends on the Fristen and on the attendee; the attendee is just one content
+line of the calendar. So the calendar is rendered once per (year, type) with a placeholder attendee and
+cached as the bytes before and after the attendee line. The actual attendee line is inserted when the
+response is sent, so that one rendered calendar serves every attendee.
+
+stream_calendar() combines several years and types into one calendar. It cuts the cached calendars of one
+(year, type) after another into their events and yields them right away, so neither the time to the first byte
+nor the memory depend on the number of years.
+
+subscription_feed() serves the rolling window of months that calendar clients subscribe to (and poll every few
+hours). It is rendered once per window and cached until the window moves; its events get stable UIDs and
+DTSTAMPs (unlike those of the generator, which contain the day of the rendering), so that every rendering of
+the same window is byte-identical and its ETag only changes when the window (or the deployment) does.
+"""
+
+import functools
+import hashlib
+import heapq
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+from fristenkalender_generator.bdew_calendar_generator import FristenkalenderGenerator, FristenType, FristWithAttributes
+
+from app import metrics
+from app.cache import LruCache
+from app.fristen_cache import (
+    GENERATOR_VERSION,
+    HOLIDAYS_VERSION,
+    FristenCacheKey,
+    get_all_fristen,
+    get_fristen_for_type,
+    iter_fristen,
+    make_key,
+    read_fristen,
+    type_label,
+)
+from app.settings import FristenCacheSettings
+
+_ATTENDEE_PLACEHOLDER = "fristenkalender-attendee-placeholder"
+_BEGIN_EVENT = b"BEGIN:VEVENT\r\n"
+_END_CALENDAR = b"END:VCALENDAR\r\n"
+
+
+class RenderedCalendar(NamedTuple):
+    """a rendered ICS calendar, split at its attendee line"""
+
+    before_attendee: bytes
+    after_attendee: bytes
+
+    def with_attendee(self, attendee: str) -> bytes:
+        """returns the complete ICS file for the given attendee"""
+        return self.before_attendee + _attendee_line(attendee) + self.after_attendee
+
+
+class IcsCacheKey(NamedTuple):
+    """
+    The generator stamps each event with the current time (DTSTAMP) and date (UID), so a rendered calendar
+    is only reused on the day it was rendered.
+    """
+
+    fristen_key: FristenCacheKey
+    rendered_on: date
+
+
+ics_cache: LruCache[IcsCacheKey, RenderedCalendar] = LruCache(maxsize=FristenCacheSettings().fristen_cache_size)
+metrics.register_cache("ics", ics_cache)
+
+
+@functools.lru_cache(maxsize=1024)
+def _attendee_line(attendee: str) -> bytes:
+    """the (possibly folded) ATTENDEE content line, exactly as the generator writes it, incl. the line break"""
+    lines = FristenkalenderGenerator().create_ical(attendee, []).to_ical().split(b"\r\n")
+    start = next(index for index, line in enumerate(lines) if line.startswith(b"ATTENDEE"))
+    end = start + 1
+    while lines[end].startswith(b" "):  # folded continuation lines start with a single space
+        end += 1
+    return b"".join(line + b"\r\n" for line in lines[start:end])
+
+
+def _split_at_attendee(ical: bytes) -> RenderedCalendar:
+    before_attendee, placeholder_line, after_attendee = ical.partition(_attendee_line(_ATTENDEE_PLACEHOLDER))
+    assert placeholder_line, "the rendered calendar must contain the placeholder attendee"
+    return RenderedCalendar(before_attendee, after_attendee)
+
+
+def _render(fristen_type: FristenType | None, fristen: Sequence[FristWithAttributes]) -> RenderedCalendar:
+    with metrics.timer("ics_render_seconds", (("fristen_type", type_label(fristen_type)),)):
+        ical = FristenkalenderGenerator().create_ical(_ATTENDEE_PLACEHOLDER, list(fristen)).to_ical()
+    return _split_at_attendee(ical)
+
+
+def _rendered(year: int, fristen_type: FristenType | None) -> RenderedCalendar:
+    def render() -> RenderedCalendar:
+        fristen = get_all_fristen(year) if fristen_type is None else get_fristen_for_type(year, fristen_type)
+        return _render(fristen_type, fristen)
+
+    return ics_cache.get_or_compute(IcsCacheKey(make_key(year, fristen_type), date.today()), render)
+
+
+def _rendered_uncached(
+    year: int, fristen_type: FristenType | None, fristen: Sequence[FristWithAttributes]
+) -> RenderedCalendar:
+    """the cached calendar of the year (and type); if it is not cached, it is rendered without adding it to the cache"""
+    if IcsCacheKey(make_key(year, fristen_type), date.today()) in ics_cache:
+        return _rendered(year, fristen_type)
+    return _render(fristen_type, fristen)
+
+
+def export_whole_calendar(attendee: str, year: int) -> bytes:
+    """returns the ICS file with all fristen of the given year for the given attendee"""
+    return _rendered(year, None).with_attendee(attendee)
+
+
+def export_fristen_for_type(attendee: str, year: int, fristen_type: FristenType) -> bytes:
+    """returns the ICS file with the fristen of the given type and year for the given attendee"""
+    return _rendered(year, fristen_type).with_attendee(attendee)
+
+
+class _Event(NamedTuple):
+    frist: FristWithAttributes
+    ics: bytes
+
+
+def _date(event: _Event) -> date:
+    return event.frist.date
+
+
+def _split(rendered: RenderedCalendar, fristen: Sequence[FristWithAttributes]) -> tuple[bytes, list[_Event]]:
+    """
+    the lines of the calendar (rendered from the fristen) between the attendee and the first event, and its events
+    (in the order of the fristen, see create_ical)
+    """
+    assert rendered.after_attendee.endswith(_END_CALENDAR)
+    head, *events = rendered.after_attendee.removesuffix(_END_CALENDAR).split(_BEGIN_EVENT)
+    return head, [_Event(frist, _BEGIN_EVENT + ics) for frist, ics in zip(fristen, events, strict=True)]
+
+
+def _start(attendee: str, rendered: RenderedCalendar, fristen: Sequence[FristWithAttributes]) -> bytes:
+    """the lines of the calendar (rendered from the fristen) before its first event, for the attendee"""
+    head, _ = _split(rendered, fristen)
+    return rendered.before_attendee + _attendee_line(attendee) + head
+
+
+def stream_calendar(
+    attendee: str, from_year: int, to_year: int, fristen_types: Sequence[FristenType] = ()
+) -> Iterator[bytes]:
+    """
+    Yields the ICS file with the fristen of the given types (all fristen if there are none) of all years in
+    [from_year, to_year] for the given attendee, ordered by date, event by event.
+
+    The fristen of one year range from December of the previous to January of the following year, and the types
+    share some fristen (e.g. MABIS and KOV). Their events are the same (and so are their UIDs), so every event
+    is only yielded once.
+    The years that are not cached yet are rendered without adding them to the caches (see read_fristen), so that a
+    long range does not evict the years that are requested the most.
+    """
+    types: Sequence[FristenType | None] = fristen_types or [None]
+    years = range(from_year, to_year + 1)
+    previous_year_keys: set[tuple[date, str, int | None]] = set()
+    for year, fristen_of_types in zip(years, zip(*(read_fristen(years, fristen_type) for fristen_type in types))):
+        calendars = [
+            (_rendered_uncached(year, fristen_type, fristen), fristen)
+            for fristen_type, fristen in zip(types, fristen_of_types)
+        ]
+        if year == from_year:
+            yield _start(attendee, *calendars[0])
+        # the generator does not always list the fristen of a year in the order of their dates
+        events = heapq.merge(*(sorted(_split(*calendar)[1], key=_date) for calendar in calendars), key=_date)
+        keys: set[tuple[date, str, int | None]] = set()
+        for event in events:
+            key = (event.frist.date, event.frist.label, event.frist.ref_not_in_the_same_month)
+            if key not in keys and key not in previous_year_keys:
+                keys.add(key)
+                yield event.ics
+        previous_year_keys = keys
+    yield _END_CALENDAR
+
+
+class FeedWindow(NamedTuple):
+    """the months (first_day to last_day, inclusive) of a subscription feed"""
+
+    first_day: date
+    last_day: date
+
+    @classmethod
+    def around(cls, today: date, months_before: int, months_after: int) -> "FeedWindow":
+        """the months_before months before the month of today, that month and the months_after months after it"""
+        return cls(_first_day_of_month(today, -months_before), _first_day_of_month(today, months_after + 1) - _DAY)
+
+
+_DAY = timedelta(days=1)
+
+
+def _first_day_of_month(day: date, months_later: int) -> date:
+    year, month_index = divmod(day.year * 12 + day.month - 1 + months_later, 12)
+    return date(year, month_index + 1, 1)
+
+
+class _FeedKey(NamedTuple):
+    window: FeedWindow
+    fristen_types: tuple[FristenType, ...]
+    generator_version: str
+    holidays_version: str
+
+
+class Feed(NamedTuple):
+    """a rendered subscription feed and its validators"""
+
+    calendar: RenderedCalendar
+    digest: bytes
+    """hash of the rendered calendar (without the attendee)"""
+    last_modified: datetime
+    """the time the window last moved (the start of its current month); the feed does not change in between"""
+
+    def etag(self, attendee: str) -> str:
+        """the (strong) ETag of the feed for the attendee"""
+        return f'"{hashlib.sha256(self.digest + attendee.encode("utf-8")).hexdigest()[:32]}"'
+
+
+feed_cache: LruCache[_FeedKey, Feed] = LruCache(maxsize=FristenCacheSettings().fristen_cache_size)
+metrics.register_cache("ics_feed", feed_cache)
+
+
+def _window_fristen(window: FeedWindow, fristen_types: Sequence[FristenType | None]) -> list[FristWithAttributes]:
+    """the fristen of the types in the window, ordered by date; fristen that several types share only once"""
+    fristen: dict[tuple[date, str, int | None], FristWithAttributes] = {}
+    for fristen_type in fristen_types:
+        for frist in iter_fristen(window.first_day.year, window.last_day.year, fristen_type):
+            if window.first_day <= frist.date <= window.last_day:
+                fristen.setdefault((frist.date, frist.label, frist.ref_not_in_the_same_month), frist)
+    return sorted(fristen.values(), key=lambda frist: (frist.date, frist.label))
+
+
+def _render_feed(fristen: Iterable[FristWithAttributes], stamp: datetime) -> RenderedCalendar:
+    generator = FristenkalenderGenerator()
+    calendar = generator.create_ical(_ATTENDEE_PLACEHOLDER, [])
+    for frist in fristen:
+        event = generator.create_ical_event(frist)
+        # stable across renderings (the ones of the generator contain the day of the rendering)
+        del event["uid"], event["dtstamp"]
+        ref = "" if frist.ref_not_in_the_same_month is None else f"-{frist.ref_not_in_the_same_month}"
+        event.add("uid", f"{frist.date:%Y%m%d}-{frist.label}{ref}@fristenkalender")
+        event.add("dtstamp", stamp)
+        calendar.add_component(event)
+    return _split_at_attendee(calendar.to_ical())
+
+
+def subscription_feed(
+    fristen_types: Sequence[FristenType], months_before: int, months_after: int, today: date | None = None
+) -> Feed:
+    """
+    the (cached) feed with the fristen of the given types (all fristen if there are none) of the window of
+    months around today
+    """
+    today = today or date.today()
+    window = FeedWindow.around(today, months_before, months_after)
+    types = tuple(sorted(set(fristen_types), key=lambda fristen_type: fristen_type.name))
+    # the window (and thus the feed) only moves at the start of a month
+    window_moved_at = datetime.combine(today.replace(day=1), time(), timezone.utc)
+
+    def compute() -> Feed:
+        fristen = _window_fristen(window, types or [None])
+        with metrics.timer("ics_render_seconds", (("fristen_type", "feed"),)):
+            calendar = _render_feed(fristen, window_moved_at)
+        digest = hashlib.sha256(calendar.before_attendee + b"\0" + calendar.after_attendee).digest()
+        return Feed(calendar, digest, window_moved_at)
+
+    return feed_cache.get_or_compute(_FeedKey(window, types, GENERATOR_VERSION, HOLIDAYS_VERSION), compute)
+
+
+__all__ = [
+    "Feed",
+    "FeedWindow",
+    "RenderedCalendar",
+    "export_fristen_for_type",
+    "export_whole_calendar",
+    "feed_cache",
+    "ics_cache",
+    "stream_calendar",
+    "subscription_feed",
+]
@@ -1,17 +1,39 @@
 """FastAPI application for Fristenkalender."""
 
 from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import date
+from importlib.metadata import version as package_version
 from pathlib import Path
 from typing import Any, AsyncGenerator
 
+import anyio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-from app.mcp_server import attach_mcp
+from app.calendar_artifact import load as load_calendar_artifact
+from app.fristen_cache import warm_up, warmup_years
+from app.fristen_index import build_indexes_in_background
+from app.generation import shutdown_pool, start_pool
+from app.http_caching import ConditionalGetMiddleware
+from app.mcp_server.lazy import attach_lazy_mcp
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, collect, render, start_dumping
+from app.profiling import ProfilingMiddleware
 from app.routers import calendar, fristen
+from app.settings import (
+    CalendarArtifactSettings,
+    FristenCacheSettings,
+    FristenIndexSettings,
+    GenerationPoolSettings,
+    HttpCachingSettings,
+    MetricsSettings,
+    ProfilingSettings,
+    WorkingDayIndexSettings,
+)
+from app.working_days import WorkingDayIndex, build_index_in_background, use_index
 
-# assigned by attach_mcp() at the bottom of this module; referenced (late-bound) inside the
+# assigned by attach_lazy_mcp() at the bottom of this module; referenced (late-bound) inside the
 # lifespan below. stays None only when the MCP is disabled via MCP_ENABLE=false.
 _mcp_app = None
 
@@ -19,15 +41,47 @@ _mcp_app = None
 @asynccontextmanager
 async def lifespan(_app: FastAPI) -> AsyncGenerator[None, Any]:
     """
-    Runs the MCP sub-app's lifespan (required for its session manager to initialise)
-    when the MCP is mounted; a no-op otherwise.
+    Opens the calendar artifact (if configured via CALENDAR_ARTIFACT_PATH), takes the working day index from it or
+    starts building the index (in the background), starts the generation worker processes
+    (if enabled via GENERATION_POOL_ENABLE=true), warms up the fristen cache (unless disabled via
+    FRISTEN_CACHE_WARMUP=false), starts building the date sorted index of the fristen (in the background, unless
+    disabled via FRISTEN_INDEX_ENABLE=false) and, when the MCP is mounted, builds the MCP server in the background and
+    runs its lifespan (required for its session manager to initialise). With METRICS_MULTIPROCESS_DIR set,
+    the metrics of this worker are dumped to that directory periodically.
     """
+    artifact = load_calendar_artifact(CalendarArtifactSettings())
+    working_day_index_settings = WorkingDayIndexSettings()
+    if working_day_index_settings.working_day_index_enable:
+        if artifact is not None and _covers_configured_years(artifact.working_day_index, working_day_index_settings):
+            use_index(artifact.working_day_index)
+        else:
+            build_index_in_background(working_day_index_settings)
     async with AsyncExitStack() as stack:
+        if _metrics_settings.metrics_enable and _metrics_settings.metrics_multiprocess_dir is not None:
+            stack.callback(start_dumping(_metrics_settings).set)
+        generation_pool_settings = GenerationPoolSettings()
+        if generation_pool_settings.generation_pool_enable:
+            start_pool(generation_pool_settings)
+            stack.push_async_callback(anyio.to_thread.run_sync, shutdown_pool)
+        cache_settings = FristenCacheSettings()
+        if cache_settings.fristen_cache_warmup:
+            # the generator is pure CPU work; keep the event loop free while it runs
+            await anyio.to_thread.run_sync(warm_up, warmup_years(cache_settings))
+        fristen_index_settings = FristenIndexSettings()
+        if fristen_index_settings.fristen_index_enable:
+            # after the warm-up, so that the index reuses the warmed up years
+            build_indexes_in_background(fristen_index_settings)
         if _mcp_app is not None:
             await stack.enter_async_context(_mcp_app.lifespan(_app))
         yield
 
 
+def _covers_configured_years(index: WorkingDayIndex, settings: WorkingDayIndexSettings) -> bool:
+    return index.covers(date(settings.working_day_index_first_year, 1, 1)) and index.covers(
+        date(settings.working_day_index_last_year, 12, 31)
+    )
+
+
 class VersionInfo(BaseModel):
     """Version information for the application."""
 
@@ -53,6 +107,26 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+def _deployment_key() -> str:
+    """the responses only change with a new deployment: either of this app or of the calendar libraries"""
+    library_versions = (
+        package_version(package) for package in ("fristenkalender-generator", "bdew-datetimes", "holidays")
+    )
+    return "|".join([_version.model_dump_json(), *library_versions])
+
+
+_http_caching_settings = HttpCachingSettings()
+if _http_caching_settings.http_caching_enable:
+    # added before (= inside of) the CORS middleware, so that the 304 responses get the CORS headers, too
+    app.add_middleware(
+        ConditionalGetMiddleware,
+        deployment_key=_deployment_key(),
+        routers=[fristen.router, calendar.router],
+        settings=_http_caching_settings,
+        excluded_paths=[fristen.SUBSCRIPTION_PATH],
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -61,6 +135,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_profiling_settings = ProfilingSettings()
+if _profiling_settings.profiling_enable:
+    app.add_middleware(
+        ProfilingMiddleware, routers=[fristen.router, calendar.router, app.router], settings=_profiling_settings
+    )
+
+_metrics_settings = MetricsSettings()
+if _metrics_settings.metrics_enable:
+    # the outermost middleware, so that the recorded durations contain the time spent in all other middleware
+    app.add_middleware(MetricsMiddleware, routers=[fristen.router, calendar.router, app.router])
+
 app.include_router(fristen.router)
 app.include_router(calendar.router)
 
@@ -77,12 +162,22 @@ async def version() -> VersionInfo:
     return _version
 
 
-# Serve the read-only MCP server (wraps the routes above) at /mcp, built after the routes and
-# endpoints are registered so the OpenAPI spec -- and thus the tool set -- is complete.
-# attach_mcp returns None only if disabled via MCP_ENABLE=false; a misconfiguration (e.g. only
+def metrics() -> PlainTextResponse:
+    """Metrics of the requests, the Fristen generation and the caches in the Prometheus text format."""
+    return PlainTextResponse(render(collect(_metrics_settings)), media_type=CONTENT_TYPE)
+
+
+if _metrics_settings.metrics_enable:
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+
+
+# Serve the read-only MCP server (wraps the routes above) at /mcp. It is only built once the app has
+# started (see app.mcp_server.lazy) -- after all routes and endpoints are registered, so the OpenAPI
+# spec -- and thus the tool set -- is complete, and without delaying the first REST response.
+# attach_lazy_mcp returns None only if disabled via MCP_ENABLE=false; a misconfiguration (e.g. only
 # one of the MCP_AUTH0_* pair) raises and aborts startup on purpose (see app.mcp_server.settings)
 # rather than silently leaving /mcp unauthenticated.
-_mcp_app = attach_mcp(app)
+_mcp_app = attach_lazy_mcp(app)
 
 
 __all__ = ["app"]
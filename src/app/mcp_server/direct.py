@@ -0,0 +1,159 @@
+"""
+Executes the MCP tools in-process instead of via an internal HTTP request through the REST layer.
+
+``FastMCP.from_fastapi`` turns every tool call into an HTTP request to the app (over an ASGI transport): the
+arguments are encoded into a request that is routed and validated, the response is encoded to JSON, decoded
+again and finally re-encoded for MCP. With ``MCP_DIRECT_TOOL_EXECUTION`` (on by default), the tools of the
+allowlisted operations whose parameters are path or query parameters or (at most) one request body model
+call the endpoint function of their route directly instead. (FastMCP flattens the fields of the body model
+into the tool arguments; they are collected into the body model again.)
+
+Nothing else changes: the tool definitions (name, description, input and output schema) are still the ones
+derived from the OpenAPI spec, the arguments are validated against the signature of the endpoint (including
+the constraints of its Path/Query parameters) and the endpoint itself is the very same function the REST API
+calls -- so both modes accept the same arguments and return the same results (a test guards this). Tool
+calls that are executed in-process do not pass the middleware of the REST API (e.g. they are not recorded
+as REST requests in the metrics).
+"""
+
+import inspect
+import json
+import logging
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Callable, Iterable, Iterator, Mapping, NamedTuple, Sequence
+
+import anyio
+from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from fastmcp.server.transforms import GetToolNext, Transform
+from fastmcp.tools import Tool, ToolResult
+from fastmcp.utilities.versions import VersionSpec
+from pydantic import BaseModel, ValidationError, validate_call
+from starlette.responses import Response
+from starlette.routing import BaseRoute
+
+_logger = logging.getLogger(__name__)
+
+
+def _api_routes(routes: Iterable[BaseRoute]) -> Iterator[APIRoute]:
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield route
+        included_router = getattr(route, "original_router", None)  # a router included via app.include_router
+        if included_router is not None:
+            yield from _api_routes(included_router.routes)
+
+
+class DirectEndpoint(NamedTuple):
+    """the endpoint function of a route and the name of its body parameter (None if it has no body)"""
+
+    function: Callable[..., Any]
+    body_parameter: str | None = None
+
+
+def _direct_endpoint(route: APIRoute) -> DirectEndpoint | None:
+    """
+    the endpoint of the route, if all its arguments are path or query parameters or one (not embedded) body
+    model; None if it has other arguments (e.g. headers or dependencies)
+    """
+    dependant = route.dependant
+    if dependant.header_params or dependant.cookie_params or dependant.dependencies:
+        return None
+    if not dependant.body_params:
+        return DirectEndpoint(route.endpoint)
+    if len(dependant.body_params) > 1:
+        return None
+    field_info = dependant.body_params[0].field_info
+    annotation = field_info.annotation
+    if getattr(field_info, "embed", False) or not (isinstance(annotation, type) and issubclass(annotation, BaseModel)):
+        return None
+    return DirectEndpoint(route.endpoint, dependant.body_params[0].name)
+
+
+class DirectTool(Tool):  # pylint:disable=abstract-method # like fastmcp's own tools
+    """an OpenAPI derived tool that calls the endpoint of its route in-process instead of via HTTP"""
+
+    def __init__(self, tool: Tool, endpoint: DirectEndpoint) -> None:
+        super().__init__(**{field: getattr(tool, field) for field in Tool.model_fields.keys()})
+        self._is_async = inspect.iscoroutinefunction(endpoint.function)
+        self._body_parameter = endpoint.body_parameter
+        self._parameter_names = frozenset(inspect.signature(endpoint.function).parameters) - {endpoint.body_parameter}
+        # validates (and converts) the arguments exactly like FastAPI does for the path, query and body parameters
+        self._endpoint = validate_call(endpoint.function)
+
+    def __repr__(self) -> str:
+        return f"DirectTool(name={self.name!r})"
+
+    async def _call_endpoint(self, arguments: dict[str, Any]) -> Any:
+        # like the REST API, ignore arguments the endpoint does not know
+        known_arguments = {name: value for name, value in arguments.items() if name in self._parameter_names}
+        if self._body_parameter is not None:
+            known_arguments[self._body_parameter] = {
+                name: value for name, value in arguments.items() if name not in self._parameter_names
+            }
+        if self._is_async:
+            return await self._endpoint(**known_arguments)
+        # sync endpoints are run in the thread pool by FastAPI, too
+        return await anyio.to_thread.run_sync(partial(self._endpoint, **known_arguments))
+
+    async def run(self, arguments: dict[str, Any]) -> ToolResult:
+        """calls the endpoint and returns its (JSON) result as structured content, like the OpenAPI tool does"""
+        try:
+            result = await self._call_endpoint(arguments)
+        except ValidationError as error:
+            raise ValueError(f"Invalid arguments for {self.name}: {error}") from error
+        except HTTPException as error:
+            error_data = {"detail": error.detail}
+            raise ValueError(
+                f"HTTP error {error.status_code}: {HTTPStatus(error.status_code).phrase} - {error_data}"
+            ) from error
+        content = json.loads(bytes(result.body)) if isinstance(result, Response) else jsonable_encoder(result)
+        wrap_result = self.output_schema is not None and self.output_schema.get("x-fastmcp-wrap-result")
+        if wrap_result or not isinstance(content, dict):
+            content = {"result": content}
+        return ToolResult(structured_content=content)
+
+
+class DirectExecution(Transform):
+    """replaces the tools of the given operations with tools that call their endpoints in-process"""
+
+    def __init__(self, endpoints: Mapping[str, DirectEndpoint]) -> None:
+        """endpoints: tool name -> endpoint"""
+        self._endpoints = endpoints
+        self._direct_tools: dict[str, DirectTool] = {}
+
+    def _direct(self, tool: Tool) -> Tool:
+        endpoint = self._endpoints.get(tool.name)
+        if endpoint is None:
+            return tool
+        direct_tool = self._direct_tools.get(tool.name)
+        if direct_tool is None:
+            direct_tool = self._direct_tools[tool.name] = DirectTool(tool, endpoint)
+        return direct_tool
+
+    async def list_tools(self, tools: Sequence[Tool]) -> Sequence[Tool]:
+        return [self._direct(tool) for tool in tools]
+
+    async def get_tool(self, name: str, call_next: GetToolNext, *, version: VersionSpec | None = None) -> Tool | None:
+        tool = await call_next(name, version=version)
+        return None if tool is None else self._direct(tool)
+
+
+def direct_endpoints(app: FastAPI, mcp_names: Mapping[str, str]) -> dict[str, DirectEndpoint]:
+    """tool name -> endpoint of all operations in mcp_names that can be called in-process"""
+    endpoints: dict[str, DirectEndpoint] = {}
+    for route in _api_routes(app.routes):
+        tool_name = mcp_names.get(route.unique_id)
+        if tool_name is None:
+            continue
+        endpoint = _direct_endpoint(route)
+        if endpoint is not None:
+            endpoints[tool_name] = endpoint
+        else:
+            _logger.info("The MCP tool %s is executed via the REST API", tool_name)
+    return endpoints
+
+
+__all__ = ["DirectEndpoint", "DirectExecution", "DirectTool", "direct_endpoints"]
@@ -0,0 +1,147 @@
+"""
+Serves the MCP at ``/mcp`` without building it at import time.
+
+Building the MCP server (see :mod:`app.mcp_server.server`) imports ``fastmcp``, ``mcp`` and the auth
+stack and turns the whole OpenAPI spec into tools. At import time, that delays the first REST response
+of every cold start (e.g. after a scale-to-zero). Instead, :func:`attach_lazy_mcp` only registers
+placeholder routes; the MCP server is built in the background once the app has started (or, without a
+lifespan, on the first request to ``/mcp``). Requests to ``/mcp`` that arrive before it is ready wait
+for it. The allowlist and the auth wiring are exactly the ones of :func:`app.mcp_server.server.attach_mcp`.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncGenerator
+
+import anyio
+from fastapi import FastAPI
+from starlette.routing import Route, Router
+from starlette.types import Receive, Scope, Send
+
+from .settings import McpSettings
+
+if TYPE_CHECKING:
+    from fastmcp.server.http import StarletteWithLifespan
+
+_logger = logging.getLogger(__name__)
+
+# the RFC 9728 Protected Resource Metadata route that RemoteAuthProvider adds when auth is enabled
+_PROTECTED_RESOURCE_METADATA_PATH = "/.well-known/oauth-protected-resource/mcp"
+
+
+class LazyMcp:
+    """
+    An ASGI app that dispatches the requests of the MCP routes to the MCP server once it is built.
+
+    Its :meth:`lifespan` must be chained into the parent app's lifespan (like the lifespan of the eagerly
+    built MCP sub-app); it builds the MCP server in the background and runs the MCP lifespan.
+    """
+
+    def __init__(self, app: FastAPI, settings: McpSettings) -> None:
+        self._app = app
+        self._settings = settings
+        self._build_lock = threading.Lock()
+        self._mcp_app: "StarletteWithLifespan | None" = None
+        self._router: Router | None = None
+        # resolved once requests can be served: the MCP server is built and (if the app has a running
+        # lifespan) its lifespan is entered; holds the exception if building it failed
+        self._ready: Future[None] = Future()
+        self._in_lifespan = False
+
+    @property
+    def paths(self) -> list[str]:
+        """the paths of the routes the MCP server serves"""
+        if self._settings.auth_enabled:
+            return ["/mcp", _PROTECTED_RESOURCE_METADATA_PATH]
+        return ["/mcp"]
+
+    def is_built(self) -> bool:
+        """true once the MCP server is built"""
+        return self._mcp_app is not None
+
+    def build(self) -> "StarletteWithLifespan":
+        """builds the MCP server (once; blocking, so better call it from a worker thread)"""
+        with self._build_lock:
+            if self._mcp_app is None:
+                # pylint:disable-next=import-outside-toplevel # importing fastmcp is what we defer here
+                from .server import build_mcp_app
+
+                mcp_app = build_mcp_app(self._app, self._settings)
+                self._router = Router(routes=mcp_app.routes)
+                self._mcp_app = mcp_app
+                _logger.info("MCP server built (auth=%s)", "on" if self._settings.auth_enabled else "OFF")
+            return self._mcp_app
+
+    def _set_ready(self, exception: BaseException | None = None) -> None:
+        with self._build_lock:
+            if not self._ready.done():
+                if exception is None:
+                    self._ready.set_result(None)
+                else:
+                    self._ready.set_exception(exception)
+
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI) -> AsyncGenerator[None, Any]:
+        """
+        Builds the MCP server in the background (the parent app starts serving the REST API meanwhile) and
+        runs its lifespan (required for the MCP session manager) until the parent app shuts down.
+        """
+        self._in_lifespan = True
+        try:
+            async with anyio.create_task_group() as task_group:
+                shutdown = anyio.Event()
+                task_group.start_soon(self._serve, app, shutdown)
+                try:
+                    yield
+                finally:
+                    shutdown.set()
+        finally:
+            self._in_lifespan = False
+            self._ready = Future()
+
+    async def _serve(self, app: FastAPI, shutdown: anyio.Event) -> None:
+        try:
+            mcp_app = await anyio.to_thread.run_sync(self.build)
+            async with mcp_app.lifespan(app):
+                self._set_ready()
+                await shutdown.wait()
+        except Exception as exception:  # pylint:disable=broad-exception-caught # raised by the requests to /mcp
+            _logger.exception("Building/running the MCP server failed")
+            self._set_ready(exception)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        ready = self._ready
+        if not ready.done():
+            if not self._in_lifespan:
+                # no lifespan runs (e.g. a TestClient that is not used as context manager): build on demand
+                await anyio.to_thread.run_sync(self.build)
+                self._set_ready()
+            else:
+                await anyio.to_thread.run_sync(ready.result)
+        ready.result()  # raises if building the MCP server failed
+        assert self._router is not None
+        await self._router(scope, receive, send)
+
+
+def attach_lazy_mcp(app: FastAPI) -> LazyMcp | None:
+    """
+    Register the MCP routes (``/mcp`` and, with auth, the RFC 9728 metadata route at the host root, see
+    :func:`app.mcp_server.server.attach_mcp`) on ``app`` without building the MCP server yet.
+
+    Returns the :class:`LazyMcp` (whose ``.lifespan`` the caller MUST chain into the parent app's
+    lifespan) or ``None`` if the MCP is disabled. The settings are validated right away, so a
+    misconfiguration still aborts the startup.
+    """
+    settings = McpSettings()
+    if not settings.mcp_enable:
+        _logger.info("MCP server disabled via MCP_ENABLE=false")
+        return None
+    lazy_mcp = LazyMcp(app, settings)
+    app.router.routes.extend(Route(path, endpoint=lazy_mcp, include_in_schema=False) for path in lazy_mcp.paths)
+    _logger.info("MCP server will be available at /mcp (auth=%s)", "on" if settings.auth_enabled else "OFF")
+    return lazy_mcp
+
+
+__all__ = ["LazyMcp", "attach_lazy_mcp"]
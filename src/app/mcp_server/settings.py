@@ -14,6 +14,7 @@ Env vars mirror the sibling repos so cross-repo ops is uniform:
                                    e.g. ``https://fristenkalender-api.../mcp``
   * ``MCP_RESOURCE``               RFC 9728 resource value; defaults to the audience
   * ``MCP_ENABLE``                 set false to skip the mount entirely
+  * ``MCP_DIRECT_TOOL_EXECUTION``  set false to execute every tool call via the REST API
 
 Auth is optional: set BOTH issuer and audience to enable it, NEITHER to run
 ``/mcp`` unauthenticated (local dev / spike). Setting exactly one raises -- a
@@ -39,6 +40,10 @@ class McpSettings(BaseSettings):
     # feature toggle: set MCP_ENABLE=false to skip mounting /mcp without code changes
     mcp_enable: bool = True
 
+    # call the endpoints of the tools in-process instead of sending an HTTP request through the REST layer
+    # for every tool call (see app.mcp_server.direct); set MCP_DIRECT_TOOL_EXECUTION=false to go via HTTP
+    mcp_direct_tool_execution: bool = True
+
     # Auth0 resource-server config (all optional; validated as a pair below)
     mcp_auth0_issuer_base_url: str | None = None
     mcp_auth0_audience: str | None = None
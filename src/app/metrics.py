@@ -0,0 +1,333 @@
+"""
+Prometheus metrics (in the text exposition format) of the HTTP requests, the Fristen generation and the caches.
+
+Recording a value must not slow down the requests: every thread records into its own shard (plain dicts,
+no locks, no I/O). The shards are only summed up when /metrics is scraped. With several worker processes,
+each worker writes its metrics to a shared directory from a background thread (see
+app.settings.MetricsSettings) and /metrics, served by any of the workers, reports the sum of all workers.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple, Sequence
+
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.cache import LruCache
+from app.route_matching import route_template
+from app.settings import MetricsSettings
+
+_logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""upper bounds (in seconds) of the buckets of all histograms"""
+
+Labels = tuple[tuple[str, str], ...]
+_Key = tuple[str, Labels]
+
+_METRICS: dict[str, tuple[str, str]] = {
+    "http_requests_total": ("counter", "Number of handled HTTP requests"),
+    "http_request_duration_seconds": ("histogram", "Duration of the HTTP requests"),
+    "http_requests_in_flight": ("gauge", "Number of HTTP requests that are being handled"),
+    "fristen_generation_seconds": ("histogram", "Time spent generating fristen (on cache misses)"),
+    "fristen_serialization_seconds": ("histogram", "Time spent serializing fristen to JSON (on cache misses)"),
+    "ics_render_seconds": ("histogram", "Time spent rendering fristen as ICS calendar (on cache misses)"),
+    "cache_hits_total": ("counter", "Number of lookups that were answered from the cache"),
+    "cache_misses_total": ("counter", "Number of lookups that computed the value"),
+    "cache_coalesced_total": ("counter", "Number of lookups that waited for the computation of another lookup"),
+    "cache_entries": ("gauge", "Number of entries in the cache"),
+    "cache_max_entries": ("gauge", "Maximum number of entries in the cache"),
+}
+"""name -> (type, help) of all metrics"""
+
+
+class _Shard:  # pylint:disable=too-few-public-methods
+    """the metrics recorded by one thread; only this thread writes to it"""
+
+    __slots__ = ("counters", "gauges", "histograms")
+
+    def __init__(self) -> None:
+        self.counters: dict[_Key, float] = {}
+        self.gauges: dict[_Key, float] = {}
+        # the counts per bucket (the last one is +Inf), followed by the sum of all observed values
+        self.histograms: dict[_Key, list[float]] = {}
+
+
+_shards: list[_Shard] = []
+_shards_lock = threading.Lock()
+_local = threading.local()
+_caches: dict[str, LruCache[Any, Any]] = {}
+
+
+def _shard() -> _Shard:
+    shard: _Shard | None = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _Shard()
+        with _shards_lock:  # only once per thread
+            _shards.append(shard)
+        _local.shard = shard
+    return shard
+
+
+def inc(name: str, labels: Labels = (), value: float = 1) -> None:
+    """increments the counter"""
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def add(name: str, labels: Labels, delta: float) -> None:
+    """adds delta (which may be negative) to the gauge"""
+    gauges = _shard().gauges
+    key = (name, labels)
+    gauges[key] = gauges.get(key, 0) + delta
+
+
+def observe(name: str, labels: Labels, value: float) -> None:
+    """records the value in the histogram"""
+    histograms = _shard().histograms
+    key = (name, labels)
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [0.0] * (len(DURATION_BUCKETS) + 2)
+    histogram[bisect_left(DURATION_BUCKETS, value)] += 1
+    histogram[-1] += value
+
+
+@contextmanager
+def timer(name: str, labels: Labels = ()) -> Iterator[None]:
+    """records the duration of the with block (in seconds) in the histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, labels, time.perf_counter() - start)
+
+
+def register_cache(name: str, cache: LruCache[Any, Any]) -> None:
+    """reports the statistics of the cache (as cache_*{cache="name"})"""
+    _caches[name] = cache
+
+
+def registered_caches() -> dict[str, LruCache[Any, Any]]:
+    """all caches registered with register_cache (by name)"""
+    return dict(_caches)
+
+
+class Snapshot(NamedTuple):
+    """the values of all metrics at one point in time"""
+
+    counters: dict[_Key, float]
+    gauges: dict[_Key, float]
+    histograms: dict[_Key, list[float]]
+
+
+def _merge(snapshots: Sequence[Snapshot]) -> Snapshot:
+    merged = Snapshot({}, {}, {})
+    for part in snapshots:
+        for merged_values, values in ((merged.counters, part.counters), (merged.gauges, part.gauges)):
+            for key, value in values.items():
+                merged_values[key] = merged_values.get(key, 0) + value
+        for key, histogram in part.histograms.items():
+            merged_histogram = merged.histograms.get(key)
+            merged.histograms[key] = (
+                list(histogram) if merged_histogram is None else [a + b for a, b in zip(merged_histogram, histogram)]
+            )
+    return merged
+
+
+def snapshot() -> Snapshot:
+    """the current values of the metrics of this process"""
+    with _shards_lock:
+        shards = list(_shards)
+    # copying a dict (with tuple keys) is atomic under the GIL, so the owning threads may keep on recording
+    shard_snapshots = [
+        Snapshot(
+            dict(shard.counters),
+            dict(shard.gauges),
+            {key: list(histogram) for key, histogram in dict(shard.histograms).items()},
+        )
+        for shard in shards
+    ]
+    cache_snapshot = Snapshot({}, {}, {})
+    for cache_name, cache in _caches.items():
+        stats = cache.stats()
+        labels = (("cache", cache_name),)
+        cache_snapshot.counters[("cache_hits_total", labels)] = stats.hits
+        cache_snapshot.counters[("cache_misses_total", labels)] = stats.misses
+        cache_snapshot.counters[("cache_coalesced_total", labels)] = stats.coalesced
+        cache_snapshot.gauges[("cache_entries", labels)] = stats.size
+        cache_snapshot.gauges[("cache_max_entries", labels)] = stats.maxsize
+    return _merge([*shard_snapshots, cache_snapshot])
+
+
+def _to_json(values: Snapshot) -> str:
+    return json.dumps(
+        {
+            field_name: [[name, [list(label) for label in labels], value] for (name, labels), value in field.items()]
+            for field_name, field in values._asdict().items()
+        }
+    )
+
+
+def _from_json(serialized: str) -> Snapshot:
+    data = json.loads(serialized)
+    fields = {
+        field_name: {(name, tuple((label, value) for label, value in labels)): value for name, labels, value in entries}
+        for field_name, entries in data.items()
+    }
+    return Snapshot(**fields)
+
+
+def _dump_file(directory: Path) -> Path:
+    return directory / f"metrics-{os.getpid()}.json"
+
+
+def dump(directory: Path) -> None:
+    """writes the metrics of this process to the (shared) directory, see collect()"""
+    target = _dump_file(directory)
+    temporary = target.with_suffix(".tmp")
+    temporary.write_text(_to_json(snapshot()), encoding="utf-8")
+    temporary.replace(target)  # atomic, so that other workers never read a partially written file
+
+
+def collect(settings: MetricsSettings) -> Snapshot:
+    """
+    the metrics of this process plus (in multiprocess mode) the last dumped metrics of all other workers.
+    Workers that stopped dumping (e.g. because they were restarted) still contribute their counters and
+    histograms (those only grow), but no longer their gauges.
+    """
+    snapshots = [snapshot()]
+    directory = settings.metrics_multiprocess_dir
+    if directory is not None:
+        own_file = _dump_file(directory)
+        stale_before = time.time() - 3 * settings.metrics_dump_interval_seconds
+        for file in sorted(directory.glob("metrics-*.json")):
+            if file == own_file:
+                continue
+            try:
+                worker_snapshot = _from_json(file.read_text(encoding="utf-8"))
+                is_stale = file.stat().st_mtime < stale_before
+            except (OSError, ValueError):
+                _logger.warning("Could not read the metrics file %s", file, exc_info=True)
+                continue
+            snapshots.append(worker_snapshot._replace(gauges={}) if is_stale else worker_snapshot)
+    return _merge(snapshots)
+
+
+def start_dumping(settings: MetricsSettings) -> threading.Event:
+    """
+    starts a background thread that periodically dumps the metrics of this process to the multiprocess
+    directory; set the returned event to stop it (after a last dump)
+    """
+    directory = settings.metrics_multiprocess_dir
+    assert directory is not None
+    directory.mkdir(parents=True, exist_ok=True)
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(settings.metrics_dump_interval_seconds):
+            dump(directory)
+        dump(directory)
+
+    threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+    return stop
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(values: Snapshot) -> str:
+    """the metrics in the Prometheus text exposition format"""
+    lines: list[str] = []
+    for name, (metric_type, help_text) in _METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type == "histogram":
+            for (key_name, labels), histogram in sorted(values.histograms.items()):
+                if key_name != name:
+                    continue
+                cumulative = 0.0
+                for bound, count in zip((*map(str, DURATION_BUCKETS), "+Inf"), histogram):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels((*labels, ('le', bound)))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        else:
+            samples = values.counters if metric_type == "counter" else values.gauges
+            for (key_name, labels), value in sorted(samples.items()):
+                if key_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:  # pylint:disable=too-few-public-methods
+    """
+    Records the number, the duration and the number of in-flight HTTP requests per route template (e.g.
+    '/api/IsWorkingDay/{check_date}'), so that the number of time series does not depend on the requested
+    dates. Requests that match no route are recorded as route 'unmatched'.
+    """
+
+    def __init__(self, app: ASGIApp, *, routers: Sequence[Router]) -> None:
+        self.app = app
+        self._routers = routers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = route_template(self._routers, scope) or "unmatched"
+        labels = (("method", scope["method"]), ("route", route))
+        status = 500  # if the app raises before it starts the response
+
+        async def send_recording_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        add("http_requests_in_flight", (("route", route),), 1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_recording_status)
+        finally:
+            observe("http_request_duration_seconds", labels, time.perf_counter() - start)
+            add("http_requests_in_flight", (("route", route),), -1)
+            inc("http_requests_total", (*labels, ("status", str(status))))
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "MetricsMiddleware",
+    "Snapshot",
+    "add",
+    "collect",
+    "dump",
+    "inc",
+    "observe",
+    "register_cache",
+    "registered_caches",
+    "render",
+    "snapshot",
+    "start_dumping",
+    "timer",
+]
@@ -0,0 +1,212 @@
+"""
+Profiles single requests on demand, to find out where the time of a slow request goes (e.g. to the generator,
+to the conversion of the Fristen or to the JSON serialization).
+
+Off by default (see app.settings.ProfilingSettings). When enabled, a request is profiled if it sends the
+configured token in the X-Profile header or if it is picked by the sample rate -- but never more than the
+configured number of requests per minute, so that a forgotten switch cannot take the service down.
+
+The sync endpoints run in the thread pool, not in the thread of the event loop, so a deterministic profiler
+(cProfile) that is enabled around the request would not see them. Instead, a sampling profiler records the
+stacks of
+  * the event loop thread, while it executes (the middleware and everything inside of it for) the request and
+  * the threads that execute the endpoint function of the request
+at a fixed interval. Concurrent requests to the same sync endpoint thus end up in each other's profiles.
+The profile is written as "folded stacks" (one line "outermost;...;innermost frame count" per distinct stack,
+as read by e.g. speedscope or flamegraph.pl) to <id>.folded, the metadata of the request to <id>.json.
+Both files are written by the sampling thread, after the response was sent.
+"""
+
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.route_matching import match_route
+from app.settings import ProfilingSettings
+
+_logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+"""request header; a request that sends the configured token in it is profiled"""
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+"""response header of the requests that were profiled because of the PROFILE_HEADER: the id of the profile"""
+
+
+class _RateLimit:  # pylint:disable=too-few-public-methods
+    """allows at most max_per_minute acquisitions in any sliding window of one minute"""
+
+    def __init__(self, max_per_minute: int) -> None:
+        self._max_per_minute = max_per_minute
+        self._acquired_at: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """true if the limit is not reached yet (and counts this acquisition); false otherwise"""
+        now = time.monotonic()
+        with self._lock:
+            while self._acquired_at and self._acquired_at[0] <= now - 60:
+                self._acquired_at.popleft()
+            if len(self._acquired_at) >= self._max_per_minute:
+                return False
+            self._acquired_at.append(now)
+            return True
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """samples the stacks of one request until stop() is called, then writes the profile"""
+
+    def __init__(
+        self, *, interval: float, loop_thread_id: int, request_frame: FrameType, endpoint_code: CodeType | None
+    ) -> None:
+        super().__init__(name="profiling-sampler", daemon=True)
+        self._interval = interval
+        self._loop_thread_id = loop_thread_id
+        self._request_frame = request_frame
+        self._endpoint_code = endpoint_code
+        self._stopped = threading.Event()
+        self._output: tuple[Path, str, dict[str, Any]] | None = None
+        self.stacks: Counter[str] = Counter()
+
+    def _request_stack(self, thread_id: int, frame: FrameType | None) -> list[str] | None:
+        """the frames (outermost first) of the thread that belong to the request; None if it works on something else"""
+        names: list[str] = []
+        while frame is not None:
+            names.append(_frame_name(frame))
+            if thread_id == self._loop_thread_id:
+                is_outermost = frame is self._request_frame
+            else:
+                is_outermost = frame.f_code is self._endpoint_code
+            if is_outermost:
+                names.reverse()
+                return names
+            frame = frame.f_back
+        return None
+
+    def sample(self) -> None:
+        """records the current stacks of the request"""
+        for thread_id, frame in sys._current_frames().items():  # pylint:disable=protected-access
+            stack = self._request_stack(thread_id, frame)
+            if stack is not None:
+                self.stacks[";".join(stack)] += 1
+
+    def stop(self, directory: Path, profile_id: str, metadata: dict[str, Any]) -> None:
+        """stops sampling; the profile (and the metadata) is then written to the directory"""
+        self._output = (directory, profile_id, metadata)
+        self._stopped.set()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.sample()
+        assert self._output is not None
+        directory, profile_id, metadata = self._output
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f"{profile_id}.folded").write_text(
+                "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()), encoding="utf-8"
+            )
+            (directory / f"{profile_id}.json").write_text(
+                json.dumps({**metadata, "samples": self.stacks.total()}, indent=2), encoding="utf-8"
+            )
+        except OSError:
+            _logger.warning("Could not write the profile %s to %s", profile_id, directory, exc_info=True)
+            return
+        _logger.info("Wrote the profile %s of %s to %s", profile_id, metadata["path"], directory)
+
+
+class ProfilingMiddleware:  # pylint:disable=too-few-public-methods
+    """
+    Profiles the requests that send the configured token in the X-Profile header or that are picked by the
+    sample rate (at most profiling_max_per_minute per minute, see app.settings.ProfilingSettings).
+    """
+
+    def __init__(self, app: ASGIApp, *, routers: Sequence[Router], settings: ProfilingSettings) -> None:
+        self.app = app
+        self._routers = routers
+        self._settings = settings
+        self._token = None if settings.profiling_token is None else settings.profiling_token.get_secret_value()
+        self._rate_limit = _RateLimit(settings.profiling_max_per_minute)
+
+    def _trigger(self, scope: Scope) -> str | None:
+        """why the request is to be profiled ('header' or 'sample'); None if it is not"""
+        if self._token:
+            token = Headers(scope=scope).get(PROFILE_HEADER)
+            if token is not None and hmac.compare_digest(token.encode("utf-8"), self._token.encode("utf-8")):
+                return "header"
+        # not used for anything security related
+        if random.random() < self._settings.profiling_sample_rate:  # nosec B311
+            return "sample"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None or not self._rate_limit.acquire():
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        match = match_route(self._routers, scope)
+        route = None if match is None else match[0]
+        sampler = _Sampler(
+            interval=self._settings.profiling_sample_interval_seconds,
+            loop_thread_id=threading.get_ident(),
+            request_frame=sys._getframe(),  # pylint:disable=protected-access
+            endpoint_code=getattr(getattr(route, "endpoint", None), "__code__", None),
+        )
+        status = 500  # if the app raises before it starts the response
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trigger == "header":
+                    MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile_id
+            await send(message)
+
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop(
+                self._settings.profiling_output_dir,
+                profile_id,
+                {
+                    "id": profile_id,
+                    "trigger": trigger,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "started_at": started_at.isoformat(),
+                    "duration_seconds": time.perf_counter() - start,
+                    "sample_interval_seconds": self._settings.profiling_sample_interval_seconds,
+                    "pid": os.getpid(),
+                },
+            )
+
+
+__all__ = ["PROFILE_HEADER", "PROFILE_ID_HEADER", "ProfilingMiddleware"]
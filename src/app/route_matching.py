@@ -0,0 +1,34 @@
+"""
+Finds the route that will handle a request before the request reaches the router.
+
+The ASGI middleware of this app (see app.http_caching and app.metrics) needs to know the route (template)
+and the path parameters of a request up front. The included routers of the app do not expose their routes
+to app.routes one by one, so the routes are matched against the routers they were declared on.
+"""
+
+from typing import Any, Sequence
+
+from starlette.routing import BaseRoute, Match, Router
+from starlette.types import Scope
+
+
+def match_route(routers: Sequence[Router], scope: Scope) -> tuple[BaseRoute, dict[str, Any]] | None:
+    """
+    the first route (of the given routers, in order) that fully matches the request, together with the
+    (raw, i.e. not yet converted) path parameters; None if no route matches
+    """
+    for router in routers:
+        for route in router.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL and hasattr(route, "path"):
+                return route, child_scope.get("path_params", {})
+    return None
+
+
+def route_template(routers: Sequence[Router], scope: Scope) -> str | None:
+    """the path template (e.g. '/api/IsWorkingDay/{check_date}') of the route that handles the request"""
+    match = match_route(routers, scope)
+    return None if match is None else getattr(match[0], "path", None)
+
+
+__all__ = ["match_route", "route_template"]
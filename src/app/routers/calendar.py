@@ -1,21 +1,62 @@
-"""Router for BDEW calendar/working day endpoints."""
+"""
+Router for BDEW calendar/working day endpoints.
 
-from datetime import date
-from typing import Annotated, Literal
+The single-date endpoints are async: once the working day index (see app.working_days) is built, their
+lookups are O(1) array operations that are cheaper than dispatching the request to the thread pool. Only
+lookups the index has no result for (which evaluate the holiday rules via bdew_datetimes) run in a worker thread.
+Their responses are written from prebuilt JSON templates instead of being validated and serialized via
+the response models; the response models are still declared (as response_model) for the OpenAPI schema.
+"""
 
+import json
+from datetime import date, timedelta
+from http import HTTPStatus
+from typing import Annotated, Callable, Iterator, Literal, TypeVar
+
+import anyio
 from bdew_datetimes.enums import DayType, EndDateType
 from bdew_datetimes.models import Period
-from bdew_datetimes.periods import (
-    add_frist,
-    get_next_working_day,
-    get_previous_working_day,
-    is_bdew_working_day,
-)
-from fastapi import APIRouter, Path, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+
+from app import working_days
+from app.working_days import WorkingDayIndex
 
 router = APIRouter(prefix="/api")
 
+_MAX_BATCH_SIZE = 5_000_000
+"""upper bound for the number of dates evaluated by one batch request"""
+
+T = TypeVar("T")
+
+
+async def _lookup(indexed: Callable[..., T | None], fallback: Callable[..., T], *args: object) -> T:
+    """
+    returns indexed(index, *args) right away if the working day index has the result; otherwise (the index is not
+    built yet or the days or the result lie outside of it, e.g. when adding a million working days), fallback(*args)
+    evaluates the holiday rules via bdew_datetimes in a worker thread, so that it does not block the event loop
+    """
+    index = working_days.get_index()
+    result = indexed(index, *args) if index is not None else None
+    if result is not None:
+        return result
+    return await anyio.to_thread.run_sync(fallback, *args)
+
+
+def _json_response(content: str) -> Response:
+    return Response(content=content, media_type="application/json")
+
+
+# The templates produce exactly the JSON of the respective response model (see the tests).
+_IS_WORKING_DAY_TEMPLATE = '{{"date":"{}","is_working_day":{}}}'
+_NEXT_WORKING_DAY_TEMPLATE = '{{"start_date":"{}","next_working_day":"{}"}}'
+_PREVIOUS_WORKING_DAY_TEMPLATE = '{{"start_date":"{}","previous_working_day":"{}"}}'
+_WORKING_DAYS_BETWEEN_TEMPLATE = (
+    '{{"start_date":"{}","end_date":"{}","end_date_type":"{}","number_of_working_days":{}}}'
+)
+_ADD_DAYS_TEMPLATE = '{{"start_date":"{}","number_of_days":{},"day_type":"{}","end_date_type":"{}","result_date":"{}"}}'
+
 
 class IsWorkingDayResponse(BaseModel):
     """Response model for IsWorkingDay endpoint."""
@@ -24,6 +65,38 @@ class IsWorkingDayResponse(BaseModel):
     is_working_day: bool
 
 
+class IsWorkingDayBatchRequest(BaseModel):
+    """Request model for IsWorkingDayBatch endpoint: either a list of dates or a date range (start and end)."""
+
+    dates: list[date] | None = Field(default=None, max_length=_MAX_BATCH_SIZE, description="Dates to check")
+    start_date: date | None = Field(default=None, description="First date of the range to check")
+    end_date: date | None = Field(default=None, description="Last date (inclusive) of the range to check")
+
+    @model_validator(mode="after")
+    def _check_dates_xor_range(self) -> "IsWorkingDayBatchRequest":
+        """either dates or start_date+end_date must be given"""
+        has_range = self.start_date is not None or self.end_date is not None
+        if (self.dates is None) == (not has_range):
+            raise ValueError("Provide either 'dates' or 'start_date' and 'end_date'")
+        if has_range:
+            if self.start_date is None or self.end_date is None:
+                raise ValueError("A date range needs both 'start_date' and 'end_date'")
+            if self.end_date < self.start_date:
+                raise ValueError("'end_date' must not be before 'start_date'")
+            if (self.end_date - self.start_date).days >= _MAX_BATCH_SIZE:
+                raise ValueError(f"The date range must not contain more than {_MAX_BATCH_SIZE} days")
+        return self
+
+
+class IsWorkingDayBatchResponse(BaseModel):
+    """
+    Response model for IsWorkingDayBatch endpoint.
+    is_working_day[i] is 1 if the i-th requested date (of the list or the range) is a BDEW working day, 0 otherwise.
+    """
+
+    is_working_day: list[int]
+
+
 class NextWorkingDayResponse(BaseModel):
     """Response model for NextWorkingDay endpoint."""
 
@@ -38,6 +111,31 @@ class PreviousWorkingDayResponse(BaseModel):
     previous_working_day: date
 
 
+class WorkingDaysBetweenResponse(BaseModel):
+    """Response model for WorkingDaysBetween endpoint."""
+
+    start_date: date
+    end_date: date
+    end_date_type: Literal["inclusive", "exclusive"]
+    number_of_working_days: int
+
+
+class Holiday(BaseModel):
+    """A BDEW holiday: a national or state holiday or a day the BDEW defines as holiday (e.g. Christmas Eve)."""
+
+    date: date
+    name: str
+
+
+class HolidaysResponse(BaseModel):
+    """
+    Response model for Holidays and HolidaysBetween endpoints (in ascending order).
+    Weekends are only listed if they are holidays, too.
+    """
+
+    holidays: list[Holiday]
+
+
 class AddDaysResponse(BaseModel):
     """Response model for AddWorkingDays and AddCalendarDays endpoints."""
 
@@ -48,69 +146,254 @@ class AddDaysResponse(BaseModel):
     result_date: date
 
 
-@router.get("/IsWorkingDay/{check_date}")
-def check_is_working_day(
+class AddDaysBatchRequest(BaseModel):
+    """
+    Request model for AddWorkingDaysBatch and AddCalendarDaysBatch endpoints.
+    The i-th result is the i-th start date plus the i-th number of days (with the i-th end date type).
+    """
+
+    start_dates: list[date] = Field(max_length=_MAX_BATCH_SIZE, description="Start dates")
+    numbers_of_days: list[int] = Field(max_length=_MAX_BATCH_SIZE, description="Number of days to add")
+    end_date_types: list[Literal["inclusive", "exclusive"]] | None = Field(
+        default=None,
+        max_length=_MAX_BATCH_SIZE,
+        description="Whether the end dates are inclusive or exclusive (default: all exclusive)",
+    )
+
+    @model_validator(mode="after")
+    def _check_lengths(self) -> "AddDaysBatchRequest":
+        """all lists must have the same length"""
+        if len(self.numbers_of_days) != len(self.start_dates) or (
+            self.end_date_types is not None and len(self.end_date_types) != len(self.start_dates)
+        ):
+            raise ValueError("'start_dates', 'numbers_of_days' and 'end_date_types' must have the same length")
+        return self
+
+
+class AddDaysBatchResponse(BaseModel):
+    """Response model for AddWorkingDaysBatch and AddCalendarDaysBatch endpoints (results in request order)."""
+
+    day_type: Literal["working_day", "calendar_day"]
+    result_dates: list[date]
+
+
+@router.get("/IsWorkingDay/{check_date}", response_model=IsWorkingDayResponse)
+async def check_is_working_day(
     check_date: Annotated[date, Path(..., description="Date to check")],
-) -> IsWorkingDayResponse:
+) -> Response:
     """Check if a given date is a BDEW working day."""
-    return IsWorkingDayResponse(date=check_date, is_working_day=is_bdew_working_day(check_date))
+    is_working_day = await _lookup(WorkingDayIndex.is_working_day, working_days.is_working_day, check_date)
+    return _json_response(_IS_WORKING_DAY_TEMPLATE.format(check_date, "true" if is_working_day else "false"))
 
 
-@router.get("/NextWorkingDay/{start_date}")
-def get_next_working_day_endpoint(
+_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+@router.post("/IsWorkingDayBatch", response_model=IsWorkingDayBatchResponse)
+def check_is_working_day_batch(request: IsWorkingDayBatchRequest) -> Response:
+    """Check for many dates (a list or a range) at once if they are BDEW working days."""
+    if request.dates is not None:
+        flags = working_days.working_day_flags(request.dates)
+    else:
+        assert request.start_date is not None and request.end_date is not None  # checked by the model validator
+        flags = working_days.working_day_flags_between(request.start_date, request.end_date)
+    # "0110..." -> "0,1,1,0,...": the JSON array is written directly from the flags, without a list of ints
+    content = '{"is_working_day":[' + ",".join(flags.translate(_DIGITS).decode("ascii")) + "]}"
+    return _json_response(content)
+
+
+@router.get("/NextWorkingDay/{start_date}", response_model=NextWorkingDayResponse)
+async def get_next_working_day_endpoint(
     start_date: Annotated[date, Path(..., description="Start date")],
-) -> NextWorkingDayResponse:
+) -> Response:
     """Get the next BDEW working day after the given date."""
-    return NextWorkingDayResponse(start_date=start_date, next_working_day=get_next_working_day(start_date))
+    next_working_day = await _lookup(WorkingDayIndex.next_working_day, working_days.next_working_day, start_date)
+    return _json_response(_NEXT_WORKING_DAY_TEMPLATE.format(start_date, next_working_day))
 
 
-@router.get("/PreviousWorkingDay/{start_date}")
-def get_previous_working_day_endpoint(
+@router.get("/PreviousWorkingDay/{start_date}", response_model=PreviousWorkingDayResponse)
+async def get_previous_working_day_endpoint(
     start_date: Annotated[date, Path(..., description="Start date")],
-) -> PreviousWorkingDayResponse:
+) -> Response:
     """Get the previous BDEW working day before the given date."""
-    return PreviousWorkingDayResponse(start_date=start_date, previous_working_day=get_previous_working_day(start_date))
+    previous_working_day = await _lookup(
+        WorkingDayIndex.previous_working_day, working_days.previous_working_day, start_date
+    )
+    return _json_response(_PREVIOUS_WORKING_DAY_TEMPLATE.format(start_date, previous_working_day))
 
 
-@router.get("/AddWorkingDays/{start_date}/{number_of_days}")
-def add_working_days_endpoint(
+def _last_day_of_range(
+    start_date: date, end_date: date, end_date_type: Literal["inclusive", "exclusive"]
+) -> date | None:
+    """the last day (inclusive) of the given range; None if the range is empty"""
+    if end_date < start_date:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="end_date must not be before start_date")
+    if (end_date - start_date).days > _MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail=f"The range must not contain more than {_MAX_BATCH_SIZE} days"
+        )
+    last_day = end_date if end_date_type == "inclusive" else end_date - timedelta(days=1)
+    return last_day if last_day >= start_date else None
+
+
+@router.get("/WorkingDaysBetween/{start_date}/{end_date}", response_model=WorkingDaysBetweenResponse)
+async def working_days_between_endpoint(
+    start_date: Annotated[date, Path(..., description="Start date (inclusive)")],
+    end_date: Annotated[date, Path(..., description="End date")],
+    end_date_type: Annotated[
+        Literal["inclusive", "exclusive"],
+        Query(description="Whether the end date is inclusive or exclusive"),
+    ] = "exclusive",
+) -> Response:
+    """Count the BDEW working days between two dates."""
+    last_day = _last_day_of_range(start_date, end_date, end_date_type)
+    number_of_working_days = (
+        0
+        if last_day is None
+        else await _lookup(WorkingDayIndex.count_working_days, working_days.count_working_days, start_date, last_day)
+    )
+    return _json_response(
+        _WORKING_DAYS_BETWEEN_TEMPLATE.format(start_date, end_date, end_date_type, number_of_working_days)
+    )
+
+
+_LIST_CHUNK_SIZE = 1024
+"""number of dates written to the response stream at once"""
+
+
+def _stream_json_array_of_dates(days: Iterator[date]) -> Iterator[str]:
+    yield "["
+    separator = ""
+    chunk: list[str] = []
+    for day in days:
+        chunk.append(f'"{day.isoformat()}"')
+        if len(chunk) == _LIST_CHUNK_SIZE:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + ",".join(chunk)
+    yield "]"
+
+
+@router.get("/ListWorkingDays/{start_date}/{end_date}", response_model=list[date])
+async def list_working_days_endpoint(
+    start_date: Annotated[date, Path(..., description="Start date (inclusive)")],
+    end_date: Annotated[date, Path(..., description="End date")],
+    end_date_type: Annotated[
+        Literal["inclusive", "exclusive"],
+        Query(description="Whether the end date is inclusive or exclusive"),
+    ] = "exclusive",
+) -> StreamingResponse:
+    """List the BDEW working days between two dates (streamed, in ascending order)."""
+    # the days are iterated lazily (in a worker thread) while the response is streamed
+    last_day = _last_day_of_range(start_date, end_date, end_date_type)
+    days = iter(()) if last_day is None else working_days.iter_working_days(start_date, last_day)
+    return StreamingResponse(_stream_json_array_of_dates(days), media_type="application/json")
+
+
+def _holidays_json(holidays: list[working_days.Holiday]) -> str:
+    entries = (f'{{"date":"{day}","name":{json.dumps(name, ensure_ascii=False)}}}' for day, name in holidays)
+    return '{"holidays":[' + ",".join(entries) + "]}"
+
+
+@router.get("/Holidays/{year}", response_model=HolidaysResponse)
+async def holidays_endpoint(
+    year: Annotated[int, Path(..., ge=1, le=9999, description="Year to list the holidays for")],
+) -> Response:
+    """List the BDEW holidays of a year (national and state holidays plus Christmas Eve and New Year's Eve)."""
+    first_day, last_day = date(year, 1, 1), date(year, 12, 31)
+    holidays = await _lookup(WorkingDayIndex.holidays_between, working_days.holidays_between, first_day, last_day)
+    return _json_response(_holidays_json(holidays))
+
+
+@router.get("/HolidaysBetween/{start_date}/{end_date}", response_model=HolidaysResponse)
+async def holidays_between_endpoint(
+    start_date: Annotated[date, Path(..., description="Start date (inclusive)")],
+    end_date: Annotated[date, Path(..., description="End date")],
+    end_date_type: Annotated[
+        Literal["inclusive", "exclusive"],
+        Query(description="Whether the end date is inclusive or exclusive"),
+    ] = "exclusive",
+) -> Response:
+    """List the BDEW holidays between two dates (in ascending order)."""
+    last_day = _last_day_of_range(start_date, end_date, end_date_type)
+    holidays = (
+        []
+        if last_day is None
+        else await _lookup(WorkingDayIndex.holidays_between, working_days.holidays_between, start_date, last_day)
+    )
+    return _json_response(_holidays_json(holidays))
+
+
+async def _add_days(
+    start_date: date,
+    number_of_days: int,
+    day_type: DayType,
+    end_date_type: Literal["inclusive", "exclusive"],
+) -> Response:
+    end_type = EndDateType.INCLUSIVE if end_date_type == "inclusive" else EndDateType.EXCLUSIVE
+    period = Period(number_of_days=number_of_days, day_type=day_type, end_date_type=end_type)
+    result_date = await _lookup(WorkingDayIndex.add_frist, working_days.add_frist, start_date, period)
+    day_type_name = "working_day" if day_type == DayType.WORKING_DAY else "calendar_day"
+    return _json_response(
+        _ADD_DAYS_TEMPLATE.format(start_date, number_of_days, day_type_name, end_date_type, result_date)
+    )
+
+
+@router.get("/AddWorkingDays/{start_date}/{number_of_days}", response_model=AddDaysResponse)
+async def add_working_days_endpoint(
     start_date: Annotated[date, Path(..., description="Start date")],
     number_of_days: Annotated[int, Path(..., description="Number of working days to add")],
     end_date_type: Annotated[
         Literal["inclusive", "exclusive"],
         Query(description="Whether the end date is inclusive or exclusive"),
     ] = "exclusive",
-) -> AddDaysResponse:
+) -> Response:
     """Add a number of BDEW working days to a given date."""
-    end_type = EndDateType.INCLUSIVE if end_date_type == "inclusive" else EndDateType.EXCLUSIVE
-    period = Period(number_of_days=number_of_days, day_type=DayType.WORKING_DAY, end_date_type=end_type)
-    result_date = add_frist(start_date, period)
-    return AddDaysResponse(
-        start_date=start_date,
-        number_of_days=number_of_days,
-        day_type="working_day",
-        end_date_type=end_date_type,
-        result_date=result_date,
-    )
+    return await _add_days(start_date, number_of_days, DayType.WORKING_DAY, end_date_type)
 
 
-@router.get("/AddCalendarDays/{start_date}/{number_of_days}")
-def add_calendar_days_endpoint(
+@router.get("/AddCalendarDays/{start_date}/{number_of_days}", response_model=AddDaysResponse)
+async def add_calendar_days_endpoint(
     start_date: Annotated[date, Path(..., description="Start date")],
     number_of_days: Annotated[int, Path(..., description="Number of calendar days to add")],
     end_date_type: Annotated[
         Literal["inclusive", "exclusive"],
         Query(description="Whether the end date is inclusive or exclusive"),
     ] = "exclusive",
-) -> AddDaysResponse:
+) -> Response:
     """Add a number of calendar days to a given date."""
-    end_type = EndDateType.INCLUSIVE if end_date_type == "inclusive" else EndDateType.EXCLUSIVE
-    period = Period(number_of_days=number_of_days, day_type=DayType.CALENDAR_DAY, end_date_type=end_type)
-    result_date = add_frist(start_date, period)
-    return AddDaysResponse(
-        start_date=start_date,
-        number_of_days=number_of_days,
-        day_type="calendar_day",
-        end_date_type=end_date_type,
-        result_date=result_date,
+    return await _add_days(start_date, number_of_days, DayType.CALENDAR_DAY, end_date_type)
+
+
+def _add_days_batch(request: AddDaysBatchRequest, day_type: DayType) -> Response:
+    end_date_types = request.end_date_types or ["exclusive"] * len(request.start_dates)
+    periods = [
+        Period(
+            number_of_days=number_of_days,
+            day_type=day_type,
+            end_date_type=EndDateType.INCLUSIVE if end_date_type == "inclusive" else EndDateType.EXCLUSIVE,
+        )
+        for number_of_days, end_date_type in zip(request.numbers_of_days, end_date_types, strict=True)
+    ]
+    result_dates = working_days.add_frists(request.start_dates, periods)
+    day_type_name = "working_day" if day_type == DayType.WORKING_DAY else "calendar_day"
+    content = (
+        f'{{"day_type":"{day_type_name}","result_dates":['
+        + ",".join(f'"{result_date.isoformat()}"' for result_date in result_dates)
+        + "]}"
     )
+    return _json_response(content)
+
+
+@router.post("/AddWorkingDaysBatch", response_model=AddDaysBatchResponse)
+def add_working_days_batch_endpoint(request: AddDaysBatchRequest) -> Response:
+    """Add numbers of BDEW working days to many dates at once."""
+    return _add_days_batch(request, DayType.WORKING_DAY)
+
+
+@router.post("/AddCalendarDaysBatch", response_model=AddDaysBatchResponse)
+def add_calendar_days_batch_endpoint(request: AddDaysBatchRequest) -> Response:
+    """Add numbers of calendar days to many dates at once."""
+    return _add_days_batch(request, DayType.CALENDAR_DAY)
@@ -1,32 +1,68 @@
 """Router for fristen endpoints."""
 
-import dataclasses
-import json
 import logging
-import tempfile
+from datetime import date, timedelta
+from email.utils import format_datetime
 from http import HTTPStatus
-from pathlib import Path as FilePath
-from typing import Annotated, Literal
+from typing import Annotated, Iterator, Literal
+from urllib.parse import quote
 
-from fastapi import APIRouter, HTTPException, Path
-from fastapi.responses import FileResponse, JSONResponse
-from fristenkalender_generator.bdew_calendar_generator import FristenkalenderGenerator, FristenType
-from starlette.background import BackgroundTask
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from fristenkalender_generator.bdew_calendar_generator import FristenType
+
+from app.fristen_cache import get_all_fristen_json, get_fristen_for_type_json, iter_fristen
+from app.fristen_index import FIRST_YEAR, LAST_YEAR, fristen_between, upcoming_fristen
+from app.http_caching import is_not_modified
+from app.ics_export import export_fristen_for_type, export_whole_calendar, stream_calendar, subscription_feed
+from app.serialization import serialize_frist, serialize_fristen
+from app.settings import HttpCachingSettings
 
 router = APIRouter(prefix="/api")
 
+SUBSCRIPTION_PATH = "/api/FristenSubscription/"
+"""the subscription feed sends its own validators (see app.http_caching.ConditionalGetMiddleware)"""
+
+_http_caching_settings = HttpCachingSettings()
+
+_FORMAT_DESCRIPTION = (
+    "'json' (default): an array of objects. 'columnar': an object with one array per field"
+    ' ({"columns": {field: [...]}, "length": n, "values": {field: [...]}}); the columns of the text fields'
+    " (label, description, fristen_type) hold indices into the distinct values in 'values' instead of the texts."
+)
+
+
+def _ics_content_disposition(filename: str) -> str:
+    """the content-disposition header a FileResponse(filename=f"{filename}.ics") would send"""
+    download_name = f"{filename}.ics"
+    quoted_download_name = quote(download_name)
+    if quoted_download_name != download_name:
+        return f"attachment; filename*=utf-8''{quoted_download_name}"
+    return f'attachment; filename="{download_name}"'
+
+
+def _ics_file_response(ics: bytes, filename: str) -> Response:
+    """an ICS file download, with the same headers a FileResponse(filename=f"{filename}.ics") would send"""
+    return Response(
+        content=ics, media_type="text/calendar", headers={"content-disposition": _ics_content_disposition(filename)}
+    )
+
 
 @router.get("/GenerateAllFristen/{year}")
-def generate_all_fristen(year: Annotated[int, Path(..., gt=1900, lt=2100, description="Year to generate fristen for")]):
+def generate_all_fristen(
+    year: Annotated[int, Path(..., gt=1900, lt=2100, description="Year to generate fristen for")],
+    format: Annotated[  # pylint:disable=redefined-builtin # the name of the query parameter
+        Literal["json", "columnar"], Query(description=_FORMAT_DESCRIPTION)
+    ] = "json",
+):
     """Generate all fristen for a given year."""
-    logging.info("Generating all fristen for year='%s'", year)
+    logging.info("Generating all fristen for year='%s' format='%s'", year, format)
 
     try:
-        all_fristen = FristenkalenderGenerator().generate_all_fristen(year)
-        all_fristen_serialized = [dataclasses.asdict(x) for x in all_fristen]
-        return JSONResponse(
-            content=json.loads(json.dumps(all_fristen_serialized, indent=4, sort_keys=True, default=str)),
+        return Response(
+            content=get_all_fristen_json(year, columnar=format == "columnar"),
             status_code=HTTPStatus.OK,
+            media_type="application/json",
         )
     except (TypeError, ValueError) as error:
         logging.warning("Request parameter is invalid: %s", str(error))
@@ -37,6 +73,9 @@ def generate_all_fristen(year: Annotated[int, Path(..., gt=1900, lt=2100, descri
 def generate_fristen_for_type(
     year: int = Path(..., gt=1900, lt=2100, description="Year to generate fristen for"),
     fristen_type: str = Path(..., description="Type of fristen (e.g., GPKE)"),
+    format: Annotated[  # pylint:disable=redefined-builtin # the name of the query parameter
+        Literal["json", "columnar"], Query(description=_FORMAT_DESCRIPTION)
+    ] = "json",
 ):
     """Generate fristen for a given type and year."""
     try:
@@ -47,11 +86,95 @@ def generate_fristen_for_type(
         logging.warning("Request parameter is invalid: %s", str(error))
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(error)) from error
 
-    fristen_with_type = FristenkalenderGenerator().generate_fristen_for_type(year, fristen_type_enum)
-    fristen_serialized = [dataclasses.asdict(x) for x in fristen_with_type]
-    return JSONResponse(
-        content=json.loads(json.dumps(fristen_serialized, indent=4, sort_keys=True, default=str)),
+    return Response(
+        content=get_fristen_for_type_json(year, fristen_type_enum, columnar=format == "columnar"),
+        status_code=HTTPStatus.OK,
+        media_type="application/json",
+    )
+
+
+def _stream_ndjson(from_year: int, to_year: int, fristen_type: FristenType | None) -> Iterator[bytes]:
+    for frist in iter_fristen(from_year, to_year, fristen_type):
+        yield serialize_frist(frist) + b"\n"
+
+
+@router.get(
+    "/GenerateAllFristenRange/{from_year}/{to_year}",
+    response_class=StreamingResponse,
+    responses={HTTPStatus.OK: {"content": {"application/x-ndjson": {}}, "description": "One JSON object per line"}},
+)
+def generate_all_fristen_range(
+    from_year: Annotated[int, Path(..., gt=1900, lt=2100, description="First year to generate fristen for")],
+    to_year: Annotated[int, Path(..., gt=1900, lt=2100, description="Last year (inclusive) to generate fristen for")],
+    fristen_type: Annotated[
+        Literal["MABIS", "GPKE", "GELI", "KOV"] | None, Query(description="Only fristen of this type (e.g., GPKE)")
+    ] = None,
+):
+    """
+    Generate the fristen for a range of years as newline delimited JSON (one frist per line), ordered by date.
+    The years are generated one after another while the response is streamed.
+    """
+    if to_year < from_year:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="to_year must not be before from_year")
+    logging.info("Generating fristen for years='%s'-'%s' fristen_type='%s'", from_year, to_year, fristen_type or "all")
+    fristen_type_enum = FristenType(fristen_type) if fristen_type is not None else None
+    return StreamingResponse(_stream_ndjson(from_year, to_year, fristen_type_enum), media_type="application/x-ndjson")
+
+
+@router.get("/FristenBetween/{start_date}/{end_date}")
+def get_fristen_between(
+    start_date: Annotated[date, Path(..., description="Start date (inclusive)")],
+    end_date: Annotated[date, Path(..., description="End date")],
+    end_date_type: Annotated[
+        Literal["inclusive", "exclusive"],
+        Query(description="Whether the end date is inclusive or exclusive"),
+    ] = "exclusive",
+    fristen_type: Annotated[
+        Literal["MABIS", "GPKE", "GELI", "KOV"] | None, Query(description="Only fristen of this type (e.g., GPKE)")
+    ] = None,
+):
+    """
+    List the fristen between two dates (e.g. of this week or this month), ordered by date.
+    The fristen of the years around the current one are looked up in an index sorted by date.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="end_date must not be before start_date")
+    last_day = end_date if end_date_type == "inclusive" else end_date - timedelta(days=1)
+    if start_date.year < FIRST_YEAR or last_day.year > LAST_YEAR:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f"The fristen can only be generated for the years {FIRST_YEAR}-{LAST_YEAR}",
+        )
+    fristen_type_enum = FristenType(fristen_type) if fristen_type is not None else None
+    return Response(
+        content=serialize_fristen(fristen_between(start_date, last_day, fristen_type_enum)),
+        status_code=HTTPStatus.OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/UpcomingFristen/{from_date}")
+def get_upcoming_fristen(
+    from_date: Annotated[date, Path(..., description="The first day (inclusive) to list the fristen from")],
+    n: Annotated[int, Query(ge=1, le=100, description="Number of fristen to list")] = 10,
+    type: Annotated[  # pylint:disable=redefined-builtin # the name of the query parameter
+        Literal["MABIS", "GPKE", "GELI", "KOV"] | None, Query(description="Only fristen of this type (e.g., GPKE)")
+    ] = None,
+):
+    """
+    List the next n fristen on or after a date, ordered by date (across year boundaries).
+    The fristen of the years around the current one are looked up in an index sorted by date.
+    """
+    if not FIRST_YEAR <= from_date.year <= LAST_YEAR:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f"The fristen can only be generated for the years {FIRST_YEAR}-{LAST_YEAR}",
+        )
+    fristen_type_enum = FristenType(type) if type is not None else None
+    return Response(
+        content=serialize_fristen(upcoming_fristen(from_date, n, fristen_type_enum)),
         status_code=HTTPStatus.OK,
+        media_type="application/json",
     )
 
 
@@ -70,16 +193,7 @@ def generate_and_export_whole_calendar(
     )
 
     try:
-        with tempfile.NamedTemporaryFile(mode="w+", suffix=".ics", delete=False) as tmp_file:
-            local_ics_file_path = FilePath(tmp_file.name)
-            FristenkalenderGenerator().generate_and_export_whole_calendar(local_ics_file_path, attendee, year)
-
-        return FileResponse(
-            path=local_ics_file_path,
-            filename=f"{filename}.ics",
-            media_type="text/calendar",
-            background=BackgroundTask(local_ics_file_path.unlink),
-        )
+        return _ics_file_response(export_whole_calendar(attendee, year), filename)
     except TypeError as error:
         logging.warning("Request parameter was invalid: %s", str(error))
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(error)) from error
@@ -110,18 +224,79 @@ def generate_and_export_fristen_for_type(
     )
 
     try:
-        with tempfile.NamedTemporaryFile(mode="w+", suffix=".ics", delete=False) as tmp_file:
-            local_ics_file_path = FilePath(tmp_file.name)
-            FristenkalenderGenerator().generate_and_export_fristen_for_type(
-                local_ics_file_path, attendee, year, fristen_type_enum
-            )
-
-        return FileResponse(
-            path=local_ics_file_path,
-            filename=f"{filename}.ics",
-            media_type="text/calendar",
-            background=BackgroundTask(local_ics_file_path.unlink),
-        )
+        return _ics_file_response(export_fristen_for_type(attendee, year, fristen_type_enum), filename)
     except TypeError as error:
         logging.warning("Request parameter was invalid: %s", str(error))
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(error)) from error
+
+
+@router.get(
+    "/GenerateAndExportFristenRange/{filename}/{attendee}/{from_year}/{to_year}",
+    response_class=StreamingResponse,
+    responses={HTTPStatus.OK: {"content": {"text/calendar": {}}, "description": "The ICS file"}},
+)
+def generate_and_export_fristen_range(
+    filename: Annotated[str, Path(..., description="Filename for the ICS file (without extension)")],
+    attendee: Annotated[str, Path(..., description="Email address of the attendee")],
+    from_year: Annotated[int, Path(..., gt=1900, lt=2100, description="First year to generate the calendar for")],
+    to_year: Annotated[int, Path(..., gt=1900, lt=2100, description="Last year (inclusive) to generate it for")],
+    fristen_type: Annotated[
+        list[Literal["MABIS", "GPKE", "GELI", "KOV"]] | None,
+        Query(description="Only fristen of these types (repeat the parameter for several types); default: all"),
+    ] = None,
+):
+    """
+    Generate one ICS file with the fristen of several types for a range of years, ordered by date.
+    The events are streamed while the years are generated, so the download starts right away.
+    """
+    if to_year < from_year:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="to_year must not be before from_year")
+    fristen_types = [FristenType(name) for name in dict.fromkeys(fristen_type or [])]
+    logging.info(
+        "Generating an ics-calendar with parameters path='%s', attendee='%s' years='%s'-'%s' fristen_types='%s'",
+        filename,
+        attendee,
+        from_year,
+        to_year,
+        ",".join(fristen_type or []) or "all",
+    )
+    return StreamingResponse(
+        stream_calendar(attendee, from_year, to_year, fristen_types),
+        media_type="text/calendar",
+        headers={"content-disposition": _ics_content_disposition(filename)},
+    )
+
+
+@router.get(
+    SUBSCRIPTION_PATH.removeprefix(router.prefix) + "{attendee}",
+    response_class=Response,
+    responses={
+        HTTPStatus.OK: {"content": {"text/calendar": {}}, "description": "The ICS feed"},
+        HTTPStatus.NOT_MODIFIED: {"description": "The feed did not change since the last request"},
+    },
+)
+def fristen_subscription(
+    request: Request,
+    attendee: Annotated[str, Path(..., description="Email address of the attendee")],
+    fristen_type: Annotated[
+        list[Literal["MABIS", "GPKE", "GELI", "KOV"]] | None,
+        Query(description="Only fristen of these types (repeat the parameter for several types); default: all"),
+    ] = None,
+    months_before: Annotated[int, Query(ge=0, le=24, description="Number of past months in the feed")] = 3,
+    months_after: Annotated[int, Query(ge=0, le=36, description="Number of future months in the feed")] = 15,
+):
+    """
+    A rolling ICS feed to subscribe to (e.g. as webcal://.../api/FristenSubscription/{attendee}?fristen_type=GPKE):
+    the fristen of the current month and of the given number of months before and after it.
+    The feed only changes when a new month begins; until then, requests with If-None-Match (or
+    If-Modified-Since) are answered with 304.
+    """
+    feed = subscription_feed([FristenType(name) for name in fristen_type or []], months_before, months_after)
+    headers: dict[str, str] = {}
+    if _http_caching_settings.http_caching_enable:
+        headers["ETag"] = feed.etag(attendee)
+        headers["Last-Modified"] = format_datetime(feed.last_modified, usegmt=True)
+        headers["Cache-Control"] = f"public, max-age={_http_caching_settings.http_cache_max_age}"
+        if is_not_modified(request.headers, headers["ETag"], feed.last_modified):
+            return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+    return Response(content=feed.calendar.with_attendee(attendee), media_type="text/calendar", headers=headers)
@@ -0,0 +1,128 @@
+"""
+Serializes the Frist dataclasses of the ``fristenkalender_generator`` to compact JSON bytes in one pass.
+
+The Fristen endpoints used to run ``dataclasses.asdict`` -> ``json.dumps(..., sort_keys=True, default=str)``
+-> ``json.loads`` -> ``JSONResponse``. This module produces exactly the bytes that pipeline sent to the
+clients (sorted keys, dates as ISO strings, enums as ``str(enum)``, non-ASCII characters unescaped, no
+whitespace) but without the intermediate dicts and strings, so the result can be cached as is.
+
+:func:`serialize_fristen_columnar` writes the same values column by column instead ("struct of arrays"),
+without repeating the keys and the (few distinct) labels and descriptions for every Frist.
+"""
+
+import dataclasses
+import functools
+import json
+import types
+import typing
+from enum import Enum
+from typing import Any, Iterable, Literal, Sequence, Union
+
+from fristenkalender_generator.bdew_calendar_generator import FristWithAttributes
+
+_encode_str = json.encoder.encode_basestring  # the C implementation (if available) of json.dumps(ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=1024)
+def _encode_str_cached(value: str) -> str:
+    """labels and descriptions repeat for every month, so their (long) encoded forms are worth caching"""
+    return _encode_str(value)
+
+
+def _encode_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return _encode_str_cached(value)
+    # dates and enums used to be serialized via json.dumps(..., default=str)
+    return _encode_str(str(value))
+
+
+_SORTED_FIELDS: dict[type, tuple[tuple[str, str], ...]] = {}
+
+
+def _sorted_fields(frist_type: type) -> tuple[tuple[str, str], ...]:
+    """(attribute name, encoded JSON key) of all dataclass fields, sorted like json.dumps(sort_keys=True)"""
+    fields = _SORTED_FIELDS.get(frist_type)
+    if fields is None:
+        fields = tuple(
+            (field.name, _encode_str(field.name))
+            for field in sorted(dataclasses.fields(frist_type), key=lambda f: f.name)
+        )
+        _SORTED_FIELDS[frist_type] = fields
+    return fields
+
+
+def _frist_to_json(frist: FristWithAttributes) -> str:
+    members = ",".join(f"{key}:{_encode_value(getattr(frist, name))}" for name, key in _sorted_fields(type(frist)))
+    return "{" + members + "}"
+
+
+def serialize_frist(frist: FristWithAttributes) -> bytes:
+    """serializes a single Frist (with or without type) to a compact UTF-8 encoded JSON object"""
+    return _frist_to_json(frist).encode("utf-8")
+
+
+def serialize_fristen(fristen: Iterable[FristWithAttributes]) -> bytes:
+    """serializes the given Fristen to a compact UTF-8 encoded JSON array"""
+    return ("[" + ",".join(_frist_to_json(frist) for frist in fristen) + "]").encode("utf-8")
+
+
+def _is_text(annotation: Any) -> bool:
+    """true for str, enums and string literals (and unions or optionals of those)"""
+    origin = typing.get_origin(annotation)
+    if origin is Literal:
+        return all(isinstance(argument, str) for argument in typing.get_args(annotation))
+    if origin in (Union, types.UnionType):
+        return all(_is_text(argument) for argument in typing.get_args(annotation) if argument is not types.NoneType)
+    return isinstance(annotation, type) and issubclass(annotation, (str, Enum))
+
+
+_COLUMNAR_FIELDS: dict[type, tuple[tuple[str, str, bool], ...]] = {}
+
+
+def _columnar_fields(frist_type: type) -> tuple[tuple[str, str, bool], ...]:
+    """(attribute name, encoded JSON key, whether the values are interned) of all dataclass fields, sorted"""
+    fields = _COLUMNAR_FIELDS.get(frist_type)
+    if fields is None:
+        type_hints = typing.get_type_hints(frist_type)
+        fields = tuple((name, key, _is_text(type_hints[name])) for name, key in _sorted_fields(frist_type))
+        _COLUMNAR_FIELDS[frist_type] = fields
+    return fields
+
+
+def serialize_fristen_columnar(
+    fristen: Sequence[FristWithAttributes], frist_type: type[FristWithAttributes] | None = None
+) -> bytes:
+    """
+    serializes the given Fristen (all of the same type; frist_type defaults to the type of the first Frist)
+    to a compact UTF-8 encoded JSON object with one array per field: {"columns": {field: [value of the
+    1st Frist, value of the 2nd Frist, ...]}, "length": number of Fristen, "values": {field: [distinct values]}}.
+    The columns of the text fields (label, description, fristen_type) hold the index of the respective value in
+    "values" (in the order of first occurrence) instead of the value itself. Values are encoded like in
+    serialize_fristen.
+    """
+    if frist_type is None:
+        frist_type = type(fristen[0]) if fristen else FristWithAttributes
+    columns: list[str] = []
+    values: list[str] = []
+    for name, key, interned in _columnar_fields(frist_type):
+        column = [getattr(frist, name) for frist in fristen]
+        if interned:
+            indices: dict[Any, int] = {}
+            encoded = ",".join(
+                "null" if value is None else str(indices.setdefault(value, len(indices))) for value in column
+            )
+            values.append(f"{key}:[" + ",".join(map(_encode_value, indices)) + "]")
+        else:
+            encoded = ",".join(map(_encode_value, column))
+        columns.append(f"{key}:[{encoded}]")
+    content = '{"columns":{' + ",".join(columns) + f'}},"length":{len(fristen)},"values":{{' + ",".join(values) + "}}"
+    return content.encode("utf-8")
+
+
+__all__ = ["serialize_frist", "serialize_fristen", "serialize_fristen_columnar"]
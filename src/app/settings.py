@@ -0,0 +1,135 @@
+"""
+Configuration for the REST API (the MCP wrapper has its own settings, see :mod:`app.mcp_server.settings`).
+
+Like :class:`app.mcp_server.settings.McpSettings`, every field name IS its environment variable
+(case-insensitive, no hidden prefix), e.g. ``fristen_cache_size`` <-> ``FRISTEN_CACHE_SIZE``.
+All defaults are safe for production; the env vars only exist to tune a deployment without
+code changes.
+"""
+
+from pathlib import Path
+
+from pydantic import Field, SecretStr
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class FristenCacheSettings(BaseSettings):
+    """env-driven settings for the in-process cache of generated Fristen (see app.fristen_cache)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # max. number of (year, fristen type) results kept in memory; least recently used ones are evicted.
+    # one year needs 5 entries (all fristen + one per FristenType)
+    fristen_cache_size: int = Field(default=128, ge=1)
+
+    # pre-compute the current year +/- fristen_cache_warmup_years during the app startup, so that the
+    # years the frontend asks for the most are served from the cache right from the first request
+    fristen_cache_warmup: bool = True
+    fristen_cache_warmup_years: int = Field(default=1, ge=0)
+
+
+class WorkingDayIndexSettings(BaseSettings):
+    """env-driven settings for the precomputed table of BDEW working days (see app.working_days)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # build the table in the background on startup; set WORKING_DAY_INDEX_ENABLE=false to always use bdew_datetimes
+    working_day_index_enable: bool = True
+
+    # the (inclusive) range of years covered by the table; dates outside of it are handled by bdew_datetimes.
+    # the default covers all years the Fristen can be generated for (1901-2099) plus the adjacent ones.
+    working_day_index_first_year: int = Field(default=1900, ge=1)
+    working_day_index_last_year: int = Field(default=2100, le=9998)
+
+
+class FristenIndexSettings(BaseSettings):
+    """env-driven settings for the date sorted index of the Fristen across years (see app.fristen_index)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # build the index in the background on startup; set FRISTEN_INDEX_ENABLE=false to always scan the (cached) years
+    fristen_index_enable: bool = True
+
+    # the index covers the years from the current year (at startup) - fristen_index_past_years up to the last year
+    # the Fristen can be generated for (2099); dates before are answered by scanning the (cached) years
+    fristen_index_past_years: int = Field(default=5, ge=0)
+
+
+class CalendarArtifactSettings(BaseSettings):
+    """env-driven settings for the precomputed calendar artifact (see app.calendar_artifact)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # the artifact written by `python -m app.calendar_artifact <path>` (the Docker image ships one). if set,
+    # the working day index and the Fristen of the covered years are read from the (memory mapped) file
+    # instead of being computed by every worker process. unset = compute everything in the process
+    calendar_artifact_path: Path | None = None
+
+
+class GenerationPoolSettings(BaseSettings):
+    """env-driven settings for generating the Fristen in worker processes (see app.generation)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # the generator is pure python CPU work that holds the GIL; with GENERATION_POOL_ENABLE=true it runs in
+    # worker processes instead, so that multi-year/multi-type requests use several cores and do not slow down
+    # the (cheap) requests served by the thread pool in the meantime
+    generation_pool_enable: bool = False
+
+    # number of worker processes; defaults to the number of CPUs
+    generation_pool_size: int | None = Field(default=None, ge=1)
+
+
+class HttpCachingSettings(BaseSettings):
+    """env-driven settings for the ETag/Cache-Control headers of the API responses (see app.http_caching)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # set HTTP_CACHING_ENABLE=false to neither send validators/cache headers nor answer with 304
+    http_caching_enable: bool = True
+
+    # max-age (in seconds) of resources that refer to the current or future years; the results for those
+    # years change when a new deployment ships updated holiday rules
+    http_cache_max_age: int = Field(default=3600, ge=0)
+
+    # max-age (in seconds) of resources that only refer to past years; these are marked as immutable
+    http_cache_immutable_max_age: int = Field(default=365 * 24 * 3600, ge=0)
+
+
+class MetricsSettings(BaseSettings):
+    """env-driven settings for the Prometheus metrics served at /metrics (see app.metrics)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # set METRICS_ENABLE=false to neither record metrics nor serve /metrics
+    metrics_enable: bool = True
+
+    # with several worker processes, set this to a directory that all workers share; every worker then
+    # writes its metrics there periodically and /metrics (served by any worker) reports the sum of all workers
+    metrics_multiprocess_dir: Path | None = None
+    metrics_dump_interval_seconds: float = Field(default=5.0, gt=0)
+
+
+class ProfilingSettings(BaseSettings):
+    """env-driven settings for profiling single requests (see app.profiling)"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # off by default; with PROFILING_ENABLE=true, the selected requests (see below) are profiled
+    profiling_enable: bool = False
+
+    # requests that send this value in the X-Profile header are profiled; unset = no request can ask for it
+    profiling_token: SecretStr | None = None
+
+    # the fraction (0-1) of all other requests that are profiled
+    profiling_sample_rate: float = Field(default=0.0, ge=0, le=1)
+
+    # the profiles (and the metadata of the profiled requests) are written to this local directory
+    profiling_output_dir: Path = Path("profiles")
+
+    # hard limit, so that leaving the profiling switched on cannot take the service down: at most this many
+    # requests are profiled per minute (per worker process), no matter how they were selected
+    profiling_max_per_minute: int = Field(default=6, ge=0)
+
+    # how often (in seconds) the stacks of the profiled request are sampled
+    profiling_sample_interval_seconds: float = Field(default=0.005, gt=0)
@@ -0,0 +1,356 @@
+"""
+Answers BDEW working day questions from a precomputed, day indexed table instead of evaluating the
+holiday rules of ``bdew_datetimes`` day by day.
+
+For every day of the covered range, the :class:`WorkingDayIndex` stores
+  * the BDEW holidays (national and state holidays plus the days the BDEW defines as holidays, e.g. Christmas
+    Eve and New Year's Eve), in ascending order,
+  * whether the day is a working day (one byte per day; derived from the holidays above and the weekends),
+  * how many working days lie before it (a prefix sum) and
+  * the positions of all working days (so that "the n-th working day after x" is a single lookup).
+With these, checking a day, finding the next/previous working day and adding working days are O(1)
+array operations, independent of the number of days added; the holidays of a range are found by bisection.
+
+The module level functions below use the index when it is built and covers the requested dates; otherwise
+(before the index is built or outside of its range) they fall back to ``bdew_datetimes``. Both return the
+same results (a test guards this).
+"""
+
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from itertools import accumulate, compress
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+from bdew_datetimes.calendar import create_bdew_calendar
+from bdew_datetimes.enums import DayType
+from bdew_datetimes.models import Period
+from bdew_datetimes.periods import add_frist as bdew_add_frist
+from bdew_datetimes.periods import get_next_working_day, get_previous_working_day, is_bdew_working_day
+from holidays import HolidayBase
+
+from app.settings import WorkingDayIndexSettings
+
+_logger = logging.getLogger(__name__)
+
+
+class Holiday(NamedTuple):
+    """a BDEW holiday; its name is the one of the holiday calendar (e.g. 'Heiligabend')"""
+
+    date: date
+    name: str
+
+
+def _days(first_day: date, last_day: date) -> Iterator[date]:
+    """all days in [first_day, last_day]"""
+    return (first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1))
+
+
+def _holidays(bdew_calendar: HolidayBase, days: Iterable[date]) -> list[Holiday]:
+    return [Holiday(day, name) for day in days if (name := bdew_calendar.get(day)) is not None]
+
+
+class WorkingDayIndex:  # pylint:disable=too-many-instance-attributes
+    """
+    An immutable table of the BDEW working days between first_day and last_day (both inclusive).
+
+    The lookups return None if answering them would require a day outside of the covered range.
+    """
+
+    def __init__(
+        self,
+        first_day: date,
+        flags: bytes | memoryview,
+        holidays: Sequence[Holiday] = (),
+        *,
+        working_days_before: Sequence[int] | None = None,
+        working_day_offsets: Sequence[int] | None = None,
+    ) -> None:
+        """
+        flags[i] is 1 if first_day + i days is a working day, 0 otherwise.
+        holidays are the BDEW holidays of the range, in ascending order.
+        The tables that are derived from the flags (see below) are computed unless they are given (e.g. as
+        memoryviews of the calendar artifact, see app.calendar_artifact, which are then used without copying).
+        """
+        self.first_day = first_day
+        self.last_day = first_day + timedelta(days=len(flags) - 1)
+        self._first_ordinal = first_day.toordinal()
+        self.flags = flags
+        # holiday_offsets[k] = offset (from first_day) of the k-th holiday of the range, named holiday_names[k]
+        self.holiday_offsets = array("I", (holiday.date.toordinal() - self._first_ordinal for holiday in holidays))
+        self.holiday_names = tuple(holiday.name for holiday in holidays)
+        # working_days_before[i] = number of working days in [first_day, first_day + i days)
+        self.working_days_before: Sequence[int] = (
+            array("I", accumulate(flags, initial=0)) if working_days_before is None else working_days_before
+        )
+        # working_day_offsets[k] = offset (from first_day) of the k-th working day of the range
+        self.working_day_offsets: Sequence[int] = (
+            array("I", compress(range(len(flags)), flags)) if working_day_offsets is None else working_day_offsets
+        )
+
+    @classmethod
+    def build(cls, first_day: date, last_day: date) -> "WorkingDayIndex":
+        """
+        Evaluates the BDEW holiday rules once for every day in [first_day, last_day]; the working days are
+        derived from the resulting table of holidays.
+
+        Uses its own holiday calendar (with the same rules as bdew_datetimes.periods.is_bdew_working_day),
+        because the calendar inside bdew_datetimes is populated lazily and is not safe to populate from a
+        background thread while requests use it.
+        """
+        holidays = _holidays(create_bdew_calendar(), _days(first_day, last_day))
+        holiday_dates = {holiday.date for holiday in holidays}
+        flags = bytes(day.weekday() < 5 and day not in holiday_dates for day in _days(first_day, last_day))
+        return cls(first_day, flags, holidays)
+
+    def covers(self, day: date) -> bool:
+        """true if the day lies within the range of the index"""
+        return self.first_day <= day <= self.last_day
+
+    def _offset(self, day: date) -> int:
+        return day.toordinal() - self._first_ordinal
+
+    def _nth_working_day(self, position: int) -> date | None:
+        if 0 <= position < len(self.working_day_offsets):
+            return date.fromordinal(self._first_ordinal + self.working_day_offsets[position])
+        return None
+
+    def is_working_day(self, day: date) -> bool | None:
+        """see bdew_datetimes.periods.is_bdew_working_day"""
+        if not self.covers(day):
+            return None
+        return self.flags[self._offset(day)] == 1
+
+    def next_working_day(self, day: date) -> date | None:
+        """see bdew_datetimes.periods.get_next_working_day"""
+        if not self.covers(day):
+            return None
+        # the first working day after day is the one right after all working days up to (incl.) day
+        return self._nth_working_day(self.working_days_before[self._offset(day) + 1])
+
+    def previous_working_day(self, day: date) -> date | None:
+        """see bdew_datetimes.periods.get_previous_working_day"""
+        if not self.covers(day):
+            return None
+        return self._nth_working_day(self.working_days_before[self._offset(day)] - 1)
+
+    def add_frist(self, start: date, period: Period) -> date | None:
+        """see bdew_datetimes.periods.add_frist (same semantics, but without iterating day by day)"""
+        if not self.covers(start):
+            return None
+        return self._add_days(self._offset(start), period.number_of_days, period.day_type)
+
+    def add_frists(
+        self, starts: Sequence[date], numbers_of_days: Sequence[int], day_type: DayType
+    ) -> list[date | None]:
+        """
+        add_frist for many start dates at once; numbers_of_days are the (exclusive, see Period) number of days
+        to add to the respective start date. Results that are not covered by the index are None.
+        """
+        last_offset = len(self.flags) - 1
+        results: list[date | None] = []
+        for start, number_of_days in zip(starts, numbers_of_days, strict=True):
+            offset = start.toordinal() - self._first_ordinal
+            results.append(self._add_days(offset, number_of_days, day_type) if 0 <= offset <= last_offset else None)
+        return results
+
+    def _add_days(self, offset: int, number_of_days: int, day_type: DayType) -> date | None:
+        if number_of_days < 0 and day_type == DayType.CALENDAR_DAY:
+            return date.fromordinal(self._first_ordinal + offset + number_of_days)
+        if number_of_days >= 0:
+            # the period calculation starts at the next working day, even if number_of_days == 0
+            position = self.working_days_before[offset + 1]
+            if day_type == DayType.CALENDAR_DAY:
+                begin = self._nth_working_day(position)
+                return None if begin is None else begin + timedelta(days=number_of_days)
+            return self._nth_working_day(position + number_of_days)
+        # going backwards, the result is the (|number_of_days| + 1)-th working day before the start
+        return self._nth_working_day(self.working_days_before[offset] + number_of_days - 1)
+
+    def count_working_days(self, first_day: date, last_day: date) -> int | None:
+        """number of working days in [first_day, last_day]; None if the range is not covered"""
+        if not (self.covers(first_day) and self.covers(last_day)):
+            return None
+        return self.working_days_before[self._offset(last_day) + 1] - self.working_days_before[self._offset(first_day)]
+
+    def iter_working_days(self, first_day: date, last_day: date) -> Iterator[date] | None:
+        """the working days in [first_day, last_day] (lazily, in ascending order); None if the range is not covered"""
+        if not (self.covers(first_day) and self.covers(last_day)):
+            return None
+        positions = range(
+            self.working_days_before[self._offset(first_day)], self.working_days_before[self._offset(last_day) + 1]
+        )
+        return (date.fromordinal(self._first_ordinal + self.working_day_offsets[position]) for position in positions)
+
+    def flags_for(self, days: Sequence[date]) -> bytes | None:
+        """1 (working day) or 0 for each of the days, in the same order; None if any day is not covered"""
+        offsets = [day.toordinal() - self._first_ordinal for day in days]
+        if offsets and (min(offsets) < 0 or max(offsets) >= len(self.flags)):
+            return None
+        return bytes(map(self.flags.__getitem__, offsets))
+
+    def holidays_between(self, first_day: date, last_day: date) -> list[Holiday] | None:
+        """the holidays in [first_day, last_day] in ascending order; None if the range is not covered"""
+        if not (self.covers(first_day) and self.covers(last_day)):
+            return None
+        start = bisect_left(self.holiday_offsets, self._offset(first_day))
+        end = bisect_right(self.holiday_offsets, self._offset(last_day))
+        return [
+            Holiday(
+                date.fromordinal(self._first_ordinal + self.holiday_offsets[position]), self.holiday_names[position]
+            )
+            for position in range(start, end)
+        ]
+
+    def flags_between(self, first_day: date, last_day: date) -> bytes | None:
+        """1 (working day) or 0 for each day in [first_day, last_day]; None if the range is not covered"""
+        if not (self.covers(first_day) and self.covers(last_day)):
+            return None
+        return bytes(self.flags[self._offset(first_day) : self._offset(last_day) + 1])
+
+
+_index: WorkingDayIndex | None = None  # pylint:disable=invalid-name
+_index_lock = threading.Lock()
+
+
+def get_index() -> WorkingDayIndex | None:
+    """the index used by the functions below; None as long as it is not built (yet)"""
+    return _index
+
+
+def build_index(settings: WorkingDayIndexSettings) -> WorkingDayIndex:
+    """builds the index for the configured years (once) and uses it for all following lookups"""
+    global _index  # pylint:disable=global-statement
+    with _index_lock:
+        if _index is None:
+            _index = WorkingDayIndex.build(
+                date(settings.working_day_index_first_year, 1, 1), date(settings.working_day_index_last_year, 12, 31)
+            )
+            _logger.info("Built the working day index for %s-%s", _index.first_day, _index.last_day)
+        return _index
+
+
+def use_index(index: WorkingDayIndex) -> None:
+    """uses the given (prebuilt) index for all following lookups instead of building one"""
+    global _index  # pylint:disable=global-statement
+    with _index_lock:
+        _index = index
+    _logger.info("Using the prebuilt working day index for %s-%s", index.first_day, index.last_day)
+
+
+def build_index_in_background(settings: WorkingDayIndexSettings) -> None:
+    """
+    Building the index for two centuries takes a few seconds. Until it is ready, lookups fall back to
+    bdew_datetimes, so the app does not have to wait for it to serve requests.
+    """
+    if _index is not None:
+        return
+    threading.Thread(target=build_index, args=(settings,), name="working-day-index", daemon=True).start()
+
+
+def is_covered(*days: date) -> bool:
+    """
+    true if the index is built and covers all days; lookups for those days are O(1) array operations that
+    never fall back to bdew_datetimes (as long as their results lie within the index, too)
+    """
+    index = _index
+    return index is not None and all(index.covers(day) for day in days)
+
+
+def is_working_day(candidate: date) -> bool:
+    """true if the candidate is a BDEW working day (see bdew_datetimes.periods.is_bdew_working_day)"""
+    result = _index.is_working_day(candidate) if _index is not None else None
+    return is_bdew_working_day(candidate) if result is None else result
+
+
+def next_working_day(start_date: date) -> date:
+    """the next BDEW working day after start_date (see bdew_datetimes.periods.get_next_working_day)"""
+    result = _index.next_working_day(start_date) if _index is not None else None
+    return get_next_working_day(start_date) if result is None else result
+
+
+def previous_working_day(start_date: date) -> date:
+    """the previous BDEW working day before start_date (see bdew_datetimes.periods.get_previous_working_day)"""
+    result = _index.previous_working_day(start_date) if _index is not None else None
+    return get_previous_working_day(start_date) if result is None else result
+
+
+def add_frist(start: date, period: Period) -> date:
+    """the date that is period after start (see bdew_datetimes.periods.add_frist)"""
+    result = _index.add_frist(start, period) if _index is not None else None
+    return bdew_add_frist(start, period) if result is None else result
+
+
+def add_frists(starts: Sequence[date], periods: Sequence[Period]) -> list[date]:
+    """add_frist for many (start, period) pairs at once; all periods must have the same day type"""
+    if not periods:
+        return []
+    day_type = periods[0].day_type
+    if any(period.day_type != day_type for period in periods):
+        raise ValueError("All periods must have the same day type")
+    results = (
+        _index.add_frists(starts, [period.number_of_days for period in periods], day_type)
+        if _index is not None
+        else [None] * len(starts)
+    )
+    return [
+        bdew_add_frist(start, period) if result is None else result
+        for start, period, result in zip(starts, periods, results, strict=True)
+    ]
+
+
+def count_working_days(first_day: date, last_day: date) -> int:
+    """the number of BDEW working days in [first_day, last_day]"""
+    result = _index.count_working_days(first_day, last_day) if _index is not None else None
+    return sum(working_day_flags_between(first_day, last_day)) if result is None else result
+
+
+def iter_working_days(first_day: date, last_day: date) -> Iterator[date]:
+    """the BDEW working days in [first_day, last_day], lazily and in ascending order"""
+    result = _index.iter_working_days(first_day, last_day) if _index is not None else None
+    if result is None:
+        return (day for day in _days(first_day, last_day) if is_working_day(day))
+    return result
+
+
+def holidays_between(first_day: date, last_day: date) -> list[Holiday]:
+    """the BDEW holidays in [first_day, last_day] in ascending order (weekends are only listed if they are holidays)"""
+    result = _index.holidays_between(first_day, last_day) if _index is not None else None
+    return _holidays(create_bdew_calendar(), _days(first_day, last_day)) if result is None else result
+
+
+def working_day_flags(days: Sequence[date]) -> bytes:
+    """is_working_day for many days at once: 1 (working day) or 0 for each of the days, in the same order"""
+    result = _index.flags_for(days) if _index is not None else None
+    return bytes(is_working_day(day) for day in days) if result is None else result
+
+
+def working_day_flags_between(first_day: date, last_day: date) -> bytes:
+    """is_working_day for all days in [first_day, last_day]: 1 (working day) or 0 for each day"""
+    result = _index.flags_between(first_day, last_day) if _index is not None else None
+    if result is None:
+        return bytes(is_working_day(day) for day in _days(first_day, last_day))
+    return result
+
+
+__all__ = [
+    "Holiday",
+    "WorkingDayIndex",
+    "add_frist",
+    "add_frists",
+    "build_index",
+    "build_index_in_background",
+    "count_working_days",
+    "get_index",
+    "holidays_between",
+    "is_covered",
+    "is_working_day",
+    "iter_working_days",
+    "next_working_day",
+    "previous_working_day",
+    "use_index",
+    "working_day_flags",
+    "working_day_flags_between",
+]
@@ -1,18 +1,29 @@
 """Tests for calendar endpoints."""
 
+import threading
+import time
 from datetime import date
 from http import HTTPStatus
 
+import anyio
 import pytest
 from fastapi.testclient import TestClient
+from pydantic import BaseModel
 
+from app import working_days
 from app.main import app
 from app.routers.calendar import (
+    AddDaysBatchResponse,
     AddDaysResponse,
+    HolidaysResponse,
+    IsWorkingDayBatchResponse,
     IsWorkingDayResponse,
     NextWorkingDayResponse,
     PreviousWorkingDayResponse,
+    WorkingDaysBetweenResponse,
+    add_working_days_endpoint,
 )
+from app.working_days import WorkingDayIndex
 
 client = TestClient(app)
 
@@ -87,6 +98,45 @@ class TestAddWorkingDays:
         result = AddDaysResponse.model_validate(response.json())
         assert result.end_date_type == "inclusive"
 
+    def test_result_outside_of_the_index_does_not_block_the_event_loop(self, monkeypatch: pytest.MonkeyPatch):
+        # the start date is covered by the index, but the result is not: the lookup falls back to bdew_datetimes,
+        # which takes seconds for a large number of days (simulated here), and must not run on the event loop
+        monkeypatch.setattr(working_days, "_index", WorkingDayIndex.build(date(2024, 1, 1), date(2024, 12, 31)))
+        fallback_threads: list[int] = []
+
+        def slow_add_frist(*_args: object) -> date:
+            fallback_threads.append(threading.get_ident())
+            time.sleep(0.5)
+            return date(2177, 1, 1)
+
+        monkeypatch.setattr(working_days, "add_frist", slow_add_frist)
+
+        async def lookup_while_ticking() -> tuple[int, int]:
+            ticks = 0
+            async with anyio.create_task_group() as task_group:
+
+                async def tick() -> None:
+                    nonlocal ticks
+                    while True:
+                        await anyio.sleep(0.01)
+                        ticks += 1
+
+                task_group.start_soon(tick)
+                response = await add_working_days_endpoint(date(2024, 1, 2), 40000)
+                task_group.cancel_scope.cancel()
+            assert b'"result_date":"2177-01-01"' in bytes(response.body)
+            return ticks, threading.get_ident()
+
+        ticks, loop_thread = anyio.run(lookup_while_ticking)
+        assert fallback_threads and fallback_threads[0] != loop_thread
+        assert ticks >= 10
+
+    def test_result_outside_of_the_index_equals_bdew_datetimes(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(working_days, "_index", WorkingDayIndex.build(date(2024, 1, 1), date(2024, 12, 31)))
+        response = client.get("/api/AddWorkingDays/2024-12-02/100")
+        assert response.status_code == HTTPStatus.OK
+        assert AddDaysResponse.model_validate(response.json()).result_date == date(2025, 5, 5)
+
 
 class TestAddCalendarDays:
     def test_add_calendar_days(self):
@@ -103,3 +153,192 @@ class TestAddCalendarDays:
         assert response.status_code == HTTPStatus.OK
         result = AddDaysResponse.model_validate(response.json())
         assert result.end_date_type == "inclusive"
+
+
+class TestIsWorkingDayBatch:
+    def test_dates(self):
+        dates = ["2024-01-02", "2024-01-06", "2024-12-24", "2024-12-27", "1850-05-01", "2500-01-04"]
+        response = client.post("/api/IsWorkingDayBatch", json={"dates": dates})
+        assert response.status_code == HTTPStatus.OK
+        result = IsWorkingDayBatchResponse.model_validate(response.json())
+        expected = [client.get(f"/api/IsWorkingDay/{d}").json()["is_working_day"] for d in dates]
+        assert result.is_working_day == [int(x) for x in expected]
+
+    def test_range(self):
+        response = client.post("/api/IsWorkingDayBatch", json={"start_date": "2024-12-23", "end_date": "2024-12-31"})
+        assert response.status_code == HTTPStatus.OK
+        # Mon 23, Heiligabend, 1. + 2. Weihnachtstag, Fri 27, weekend, Mon 30, Silvester
+        assert response.json() == {"is_working_day": [1, 0, 0, 0, 1, 0, 0, 1, 0]}
+
+    def test_empty_list(self):
+        response = client.post("/api/IsWorkingDayBatch", json={"dates": []})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {"is_working_day": []}
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            pytest.param({}, id="nothing"),
+            pytest.param({"dates": ["2024-01-01"], "start_date": "2024-01-01", "end_date": "2024-01-02"}, id="both"),
+            pytest.param({"start_date": "2024-01-01"}, id="no end"),
+            pytest.param({"start_date": "2024-01-02", "end_date": "2024-01-01"}, id="end before start"),
+            pytest.param({"dates": ["invalid"]}, id="invalid date"),
+        ],
+    )
+    def test_invalid_request(self, body: dict):
+        response = client.post("/api/IsWorkingDayBatch", json=body)
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+class TestAddDaysBatch:
+    @pytest.mark.parametrize("route,day_type", [("AddWorkingDays", "working_day"), ("AddCalendarDays", "calendar_day")])
+    def test_equals_single_requests(self, route: str, day_type: str):
+        start_dates = ["2024-01-02", "2024-12-20", "2024-12-31", "1850-03-01", "2024-05-10"]
+        numbers_of_days = [5, 3, -2, 10, 0]
+        end_date_types = ["exclusive", "inclusive", "inclusive", "exclusive", "exclusive"]
+        response = client.post(
+            f"/api/{route}Batch",
+            json={"start_dates": start_dates, "numbers_of_days": numbers_of_days, "end_date_types": end_date_types},
+        )
+        assert response.status_code == HTTPStatus.OK
+        result = AddDaysBatchResponse.model_validate(response.json())
+        assert result.day_type == day_type
+        expected = [
+            AddDaysResponse.model_validate(
+                client.get(f"/api/{route}/{start}/{number}?end_date_type={end_date_type}").json()
+            ).result_date
+            for start, number, end_date_type in zip(start_dates, numbers_of_days, end_date_types)
+        ]
+        assert result.result_dates == expected
+
+    def test_default_end_date_type_is_exclusive(self):
+        response = client.post("/api/AddWorkingDaysBatch", json={"start_dates": ["2024-01-02"], "numbers_of_days": [5]})
+        assert response.status_code == HTTPStatus.OK
+        single = client.get("/api/AddWorkingDays/2024-01-02/5").json()
+        assert response.json()["result_dates"] == [single["result_date"]]
+
+    def test_different_lengths(self):
+        response = client.post(
+            "/api/AddCalendarDaysBatch", json={"start_dates": ["2024-01-02", "2024-01-03"], "numbers_of_days": [5]}
+        )
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+class TestWorkingDaysBetween:
+    @pytest.mark.parametrize(
+        "start,end,end_date_type,expected",
+        [
+            pytest.param("2024-12-23", "2025-01-07", "exclusive", 5, id="christmas exclusive"),
+            pytest.param("2024-12-23", "2025-01-07", "inclusive", 6, id="christmas inclusive"),
+            pytest.param("2024-01-02", "2024-01-02", "exclusive", 0, id="empty range"),
+            pytest.param("2024-01-02", "2024-01-02", "inclusive", 1, id="single day"),
+            pytest.param("1850-01-01", "1851-01-01", "exclusive", 259, id="outside of index"),
+        ],
+    )
+    def test_count(self, start: str, end: str, end_date_type: str, expected: int):
+        response = client.get(f"/api/WorkingDaysBetween/{start}/{end}?end_date_type={end_date_type}")
+        assert response.status_code == HTTPStatus.OK
+        result = WorkingDaysBetweenResponse.model_validate(response.json())
+        assert result.number_of_working_days == expected
+        listed = client.get(f"/api/ListWorkingDays/{start}/{end}?end_date_type={end_date_type}").json()
+        assert len(listed) == expected
+
+    def test_end_before_start(self):
+        response = client.get("/api/WorkingDaysBetween/2024-01-02/2024-01-01")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+class TestListWorkingDays:
+    def test_list(self):
+        response = client.get("/api/ListWorkingDays/2024-12-23/2025-01-07?end_date_type=inclusive")
+        assert response.status_code == HTTPStatus.OK
+        # Heiligabend, Weihnachten, Silvester, Neujahr and Heilige Drei Koenige (6th of January) are no working days
+        assert response.json() == ["2024-12-23", "2024-12-27", "2024-12-30", "2025-01-02", "2025-01-03", "2025-01-07"]
+
+    def test_long_list_is_valid_json(self):
+        response = client.get("/api/ListWorkingDays/2000-01-01/2030-01-01")
+        assert response.status_code == HTTPStatus.OK
+        days = [date.fromisoformat(day) for day in response.json()]
+        assert days == sorted(days)
+        assert len(days) == client.get("/api/WorkingDaysBetween/2000-01-01/2030-01-01").json()["number_of_working_days"]
+
+    def test_empty(self):
+        response = client.get("/api/ListWorkingDays/2024-01-06/2024-01-08")  # weekend
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == []
+
+
+class TestHolidays:
+    def test_year(self):
+        response = client.get("/api/Holidays/2024")
+        assert response.status_code == HTTPStatus.OK
+        holidays = {holiday["date"]: holiday["name"] for holiday in response.json()["holidays"]}
+        assert list(holidays) == sorted(holidays)
+        assert holidays["2024-01-01"] == "Neujahr"
+        assert holidays["2024-10-31"] == "Reformationstag"  # a state holiday
+        assert holidays["2024-12-24"] == "Heiligabend"  # defined by the BDEW
+        assert holidays["2024-12-31"] == "Silvester"
+        assert "2024-03-31" in holidays  # Easter Sunday, although it is a Sunday anyway
+        assert all(key.startswith("2024-") for key in holidays)
+
+    def test_holidays_are_exactly_the_non_working_weekdays(self):
+        holidays = {holiday["date"] for holiday in client.get("/api/Holidays/2025").json()["holidays"]}
+        flags = client.post(
+            "/api/IsWorkingDayBatch", json={"start_date": "2025-01-01", "end_date": "2025-12-31"}
+        ).json()["is_working_day"]
+        days = [date.fromordinal(date(2025, 1, 1).toordinal() + offset) for offset in range(len(flags))]
+        non_working_weekdays = {day.isoformat() for day, flag in zip(days, flags) if not flag and day.weekday() < 5}
+        assert non_working_weekdays == {day for day in holidays if date.fromisoformat(day).weekday() < 5}
+        assert "2025-06-06" in non_working_weekdays  # the BDEW "Sonderfeiertag" of 2025
+
+    @pytest.mark.parametrize(
+        "end_date_type,expected",
+        [
+            pytest.param("exclusive", ["2024-12-24", "2024-12-25", "2024-12-26"], id="exclusive"),
+            pytest.param("inclusive", ["2024-12-24", "2024-12-25", "2024-12-26", "2024-12-31"], id="inclusive"),
+        ],
+    )
+    def test_between(self, end_date_type: str, expected: list[str]):
+        response = client.get(f"/api/HolidaysBetween/2024-12-20/2024-12-31?end_date_type={end_date_type}")
+        assert response.status_code == HTTPStatus.OK
+        assert [holiday["date"] for holiday in response.json()["holidays"]] == expected
+
+    def test_between_across_years(self):
+        response = client.get("/api/HolidaysBetween/2024-12-31/2025-01-01?end_date_type=inclusive")
+        assert response.json() == {
+            "holidays": [{"date": "2024-12-31", "name": "Silvester"}, {"date": "2025-01-01", "name": "Neujahr"}]
+        }
+
+    def test_between_end_before_start(self):
+        assert client.get("/api/HolidaysBetween/2024-12-31/2024-01-01").status_code == HTTPStatus.BAD_REQUEST
+
+    def test_invalid_year(self):
+        assert client.get("/api/Holidays/0").status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.parametrize(
+    "path,response_model",
+    [
+        pytest.param("/api/IsWorkingDay/2024-01-02", IsWorkingDayResponse, id="IsWorkingDay true"),
+        pytest.param("/api/IsWorkingDay/2024-01-06", IsWorkingDayResponse, id="IsWorkingDay false"),
+        pytest.param("/api/NextWorkingDay/2024-12-23", NextWorkingDayResponse, id="NextWorkingDay"),
+        pytest.param("/api/PreviousWorkingDay/2024-12-27", PreviousWorkingDayResponse, id="PreviousWorkingDay"),
+        pytest.param(
+            "/api/WorkingDaysBetween/2024-01-01/2024-02-01?end_date_type=inclusive",
+            WorkingDaysBetweenResponse,
+            id="WorkingDaysBetween",
+        ),
+        pytest.param("/api/AddWorkingDays/2024-01-02/-5", AddDaysResponse, id="AddWorkingDays"),
+        pytest.param(
+            "/api/AddCalendarDays/2024-01-02/10?end_date_type=inclusive", AddDaysResponse, id="AddCalendarDays"
+        ),
+        pytest.param("/api/Holidays/2024", HolidaysResponse, id="Holidays"),  # with non-ASCII names
+        pytest.param("/api/HolidaysBetween/2024-01-02/2024-01-05", HolidaysResponse, id="HolidaysBetween empty"),
+    ],
+)
+def test_templates_equal_response_models(path: str, response_model: type[BaseModel]):
+    """the JSON written from the templates must equal the JSON of the (documented) response models"""
+    response = client.get(path)
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == response_model.model_validate_json(response.content).model_dump_json().encode()
@@ -0,0 +1,75 @@
+"""Tests for the precomputed, memory mapped calendar artifact."""
+
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from fristenkalender_generator.bdew_calendar_generator import FristenType
+
+from app import calendar_artifact, fristen_cache, generation
+from app.cache import LruCache
+from app.calendar_artifact import CalendarArtifact
+from app.settings import CalendarArtifactSettings
+from app.working_days import WorkingDayIndex
+
+_YEARS = range(2023, 2026)
+
+
+@pytest.fixture(scope="module")
+def artifact_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    path = tmp_path_factory.mktemp("artifact") / "calendar.artifact"
+    calendar_artifact.write(path, _YEARS.start, _YEARS.stop - 1, 2022, 2026)
+    return path
+
+
+class TestCalendarArtifact:
+    @pytest.mark.parametrize("fristen_type", [None, *FristenType])
+    def test_fristen_equal_the_generated_ones(self, artifact_path: Path, fristen_type: FristenType | None):
+        artifact = CalendarArtifact.open(artifact_path)
+        for year in _YEARS:
+            assert artifact.covers(year, fristen_type)
+            assert artifact.fristen(year, fristen_type) == generation.generate(year, fristen_type)
+        assert not artifact.covers(_YEARS.stop, fristen_type)
+        assert artifact.fristen(_YEARS.stop, fristen_type) is None
+
+    def test_working_day_index_equals_the_built_one(self, artifact_path: Path):
+        index = CalendarArtifact.open(artifact_path).working_day_index
+        expected = WorkingDayIndex.build(date(2022, 1, 1), date(2026, 12, 31))
+        assert (index.first_day, index.last_day) == (expected.first_day, expected.last_day)
+        assert bytes(index.flags) == expected.flags
+        assert list(index.working_days_before) == list(expected.working_days_before)
+        assert list(index.working_day_offsets) == list(expected.working_day_offsets)
+        assert index.holidays_between(index.first_day, index.last_day) == expected.holidays_between(
+            expected.first_day, expected.last_day
+        )
+        for day in (date(2024, 12, 23) + timedelta(days=offset) for offset in range(14)):
+            assert index.is_working_day(day) == expected.is_working_day(day)
+            assert index.next_working_day(day) == expected.next_working_day(day)
+            assert index.previous_working_day(day) == expected.previous_working_day(day)
+
+    def test_other_library_versions_are_rejected(self, artifact_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(calendar_artifact, "installed_versions", lambda: {"holidays": "0.0"})
+        with pytest.raises(ValueError):
+            CalendarArtifact.open(artifact_path)
+        monkeypatch.setattr(calendar_artifact, "_artifact", None)
+        assert calendar_artifact.load(CalendarArtifactSettings(calendar_artifact_path=artifact_path)) is None
+        assert calendar_artifact.get_artifact() is None
+
+    def test_other_files_are_rejected(self, tmp_path: Path):
+        path = tmp_path / "calendar.artifact"
+        path.write_bytes(b"not an artifact")
+        with pytest.raises(ValueError):
+            CalendarArtifact.open(path)
+
+    def test_fristen_cache_reads_the_loaded_artifact(self, artifact_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(calendar_artifact, "_artifact", None)
+        artifact = calendar_artifact.load(CalendarArtifactSettings(calendar_artifact_path=artifact_path))
+        assert artifact is not None and calendar_artifact.get_artifact() is artifact
+        monkeypatch.setattr(fristen_cache, "fristen_cache", LruCache(maxsize=8))
+
+        def fail(*_):
+            raise AssertionError("must not generate fristen that the artifact contains")
+
+        monkeypatch.setattr(generation, "submit", fail)
+        assert fristen_cache.get_fristen_for_type(2024, FristenType.GPKE) == artifact.fristen(2024, FristenType.GPKE)
+        assert fristen_cache.get_all_fristen(2025) == generation.generate(2025)
@@ -0,0 +1,187 @@
+from datetime import date
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from fristenkalender_generator.bdew_calendar_generator import FristenType
+
+from app import fristen_index
+from app.fristen_cache import fristen_cache, get_all_fristen, get_fristen_for_type, make_key
+from app.fristen_index import FristenIndex
+from app.main import app
+from app.serialization import serialize_fristen
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def index_2023_2025() -> dict[FristenType | None, FristenIndex]:
+    return {fristen_type: FristenIndex.build(2023, 2025, fristen_type) for fristen_type in (None, *FristenType)}
+
+
+class TestFristenIndex:
+    @pytest.mark.parametrize("fristen_type", [None, *FristenType])
+    def test_contains_every_frist_of_the_years_sorted_by_date(
+        self, index_2023_2025: dict[FristenType | None, FristenIndex], fristen_type: FristenType | None
+    ):
+        index = index_2023_2025[fristen_type]
+        dates = [frist.date for frist in index.fristen]
+        assert dates == sorted(dates) and dates[0].year == 2023 and dates[-1].year == 2025
+        for year in (2023, 2024, 2025):
+            generated = get_all_fristen(year) if fristen_type is None else get_fristen_for_type(year, fristen_type)
+            assert {frist for frist in index.fristen if frist.date.year == year} == {
+                frist for frist in generated if frist.date.year == year
+            }
+
+    @pytest.mark.parametrize(
+        "first_day,last_day",
+        [
+            pytest.param(date(2024, 3, 4), date(2024, 3, 10), id="a week"),
+            pytest.param(date(2024, 12, 1), date(2025, 1, 31), id="across a year boundary"),
+            pytest.param(date(2024, 1, 1), date(2024, 12, 31), id="a whole year"),
+            pytest.param(date(2024, 3, 5), date(2024, 3, 4), id="empty"),
+        ],
+    )
+    def test_between_equals_a_scan_of_the_years(
+        self,
+        index_2023_2025: dict[FristenType | None, FristenIndex],
+        monkeypatch: pytest.MonkeyPatch,
+        first_day: date,
+        last_day: date,
+    ):
+        for fristen_type, index in index_2023_2025.items():
+            monkeypatch.setattr(fristen_index, "_indexes", {})
+            scanned = fristen_index.fristen_between(first_day, last_day, fristen_type)
+            assert index.between(first_day, last_day) == scanned
+            monkeypatch.setattr(fristen_index, "_indexes", {fristen_type: index})
+            assert fristen_index.fristen_between(first_day, last_day, fristen_type) == scanned
+            assert all(first_day <= frist.date <= last_day for frist in scanned)
+
+    def test_scanned_years_are_not_added_to_the_cache(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(fristen_index, "_indexes", {})
+        fristen = fristen_index.fristen_between(date(2051, 1, 1), date(2054, 12, 31), FristenType.GELI)
+        assert {frist.date.year for frist in fristen} == {2051, 2052, 2053, 2054}
+        assert not any(make_key(year, FristenType.GELI) in fristen_cache for year in range(2051, 2055))
+
+    def test_ranges_outside_of_the_index_are_scanned(self, index_2023_2025: dict[FristenType | None, FristenIndex]):
+        index = index_2023_2025[None]
+        assert index.between(date(2022, 12, 1), date(2023, 1, 31)) is None
+        assert index.between(date(2025, 12, 1), date(2026, 1, 31)) is None
+
+    @pytest.mark.parametrize(
+        "from_day,number",
+        [
+            pytest.param(date(2024, 3, 4), 5, id="within a year"),
+            pytest.param(date(2024, 12, 20), 30, id="across a year boundary"),
+            pytest.param(date(2025, 12, 20), 30, id="beyond the index"),
+        ],
+    )
+    def test_upcoming_equals_a_scan_of_the_years(
+        self,
+        index_2023_2025: dict[FristenType | None, FristenIndex],
+        monkeypatch: pytest.MonkeyPatch,
+        from_day: date,
+        number: int,
+    ):
+        for fristen_type, index in index_2023_2025.items():
+            monkeypatch.setattr(fristen_index, "_indexes", {})
+            scanned = fristen_index.upcoming_fristen(from_day, number, fristen_type)
+            # the GPKE fristen end in 2025
+            assert len(scanned) == number or fristen_type == FristenType.GPKE
+            assert (
+                scanned
+                == fristen_index.fristen_between(from_day, date(from_day.year + 3, 12, 31), fristen_type)[:number]
+            )
+            monkeypatch.setattr(fristen_index, "_indexes", {fristen_type: index})
+            assert fristen_index.upcoming_fristen(from_day, number, fristen_type) == scanned
+
+    def test_upcoming_needs_the_fristen_after_the_index(self, index_2023_2025: dict[FristenType | None, FristenIndex]):
+        index = index_2023_2025[None]
+        assert index.upcoming(date(2025, 12, 20), 30) is None
+        assert index.upcoming(date(2022, 12, 20), 1) is None
+        assert index.upcoming(date(2023, 1, 1), 1) == index.fristen[:1]
+
+    def test_upcoming_ends_with_the_last_year(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(fristen_index, "_indexes", {})
+        upcoming = fristen_index.upcoming_fristen(date(2099, 12, 1), 100)
+        assert upcoming and len(upcoming) < 100
+        assert all(frist.date.year == 2099 for frist in upcoming)
+        # an index that reaches up to the last year knows that there are no more fristen
+        assert FristenIndex.build(2099, 2099).upcoming(date(2099, 12, 1), 100) == upcoming
+        assert FristenIndex.build(2025, 2099, FristenType.GPKE).upcoming(date(2026, 1, 1), 10) == ()
+
+    def test_indexed_years(self):
+        settings = fristen_index.FristenIndexSettings(fristen_index_past_years=5)
+        assert fristen_index.indexed_years(settings, date(2026, 10, 18)) == (2021, 2099)
+        assert fristen_index.indexed_years(settings, date(1903, 1, 1)) == (1901, 2099)
+
+
+class TestFristenBetween:
+    def test_ok_get(self):
+        response = client.get("/api/FristenBetween/2024-03-01/2024-04-01")
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"] == "application/json"
+        assert response.content == serialize_fristen(fristen_index.fristen_between(date(2024, 3, 1), date(2024, 3, 31)))
+        dates = [frist["date"] for frist in response.json()]
+        assert dates and dates == sorted(dates)
+        assert all(day.startswith("2024-03-") for day in dates)
+
+    def test_end_date_type_inclusive(self):
+        exclusive = client.get("/api/FristenBetween/2024-03-01/2024-04-02").json()
+        inclusive = client.get("/api/FristenBetween/2024-03-01/2024-04-01?end_date_type=inclusive").json()
+        assert inclusive == exclusive
+
+    def test_fristen_type(self):
+        fristen = client.get("/api/FristenBetween/2024-12-01/2025-02-01?fristen_type=GPKE").json()
+        assert fristen
+        assert all(frist["fristen_type"] == "FristenType.GPKE" for frist in fristen)
+
+    def test_empty_range(self):
+        response = client.get("/api/FristenBetween/2024-03-01/2024-03-01")
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == []
+
+    @pytest.mark.parametrize(
+        "path,expected_status",
+        [
+            pytest.param("2024-03-02/2024-03-01", HTTPStatus.BAD_REQUEST, id="end before start"),
+            pytest.param("1900-12-01/1901-02-01", HTTPStatus.BAD_REQUEST, id="year out of range"),
+            pytest.param("2024-03-01/2024-03-32", HTTPStatus.UNPROCESSABLE_ENTITY, id="invalid date"),
+            pytest.param("2024-03-01/2024-04-01?fristen_type=FOO", HTTPStatus.UNPROCESSABLE_ENTITY, id="invalid type"),
+        ],
+    )
+    def test_bad_request(self, path: str, expected_status: HTTPStatus):
+        response = client.get(f"/api/FristenBetween/{path}")
+        assert response.status_code == expected_status
+
+
+class TestUpcomingFristen:
+    def test_ok_get(self):
+        response = client.get("/api/UpcomingFristen/2024-12-20?n=20")
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"] == "application/json"
+        assert response.content == serialize_fristen(fristen_index.upcoming_fristen(date(2024, 12, 20), 20))
+        dates = [frist["date"] for frist in response.json()]
+        assert len(dates) == 20 and dates == sorted(dates)
+        assert dates[0] >= "2024-12-20" and dates[-1].startswith("2025-")
+
+    def test_default_number(self):
+        assert len(client.get("/api/UpcomingFristen/2024-03-01").json()) == 10
+
+    def test_type(self):
+        fristen = client.get("/api/UpcomingFristen/2024-12-01?n=3&type=GPKE").json()
+        assert len(fristen) == 3
+        assert all(frist["fristen_type"] == "FristenType.GPKE" for frist in fristen)
+
+    @pytest.mark.parametrize(
+        "path,expected_status",
+        [
+            pytest.param("1900-12-01", HTTPStatus.BAD_REQUEST, id="year out of range"),
+            pytest.param("2024-03-01?n=0", HTTPStatus.UNPROCESSABLE_ENTITY, id="n too small"),
+            pytest.param("2024-03-01?n=101", HTTPStatus.UNPROCESSABLE_ENTITY, id="n too large"),
+            pytest.param("2024-03-01?type=FOO", HTTPStatus.UNPROCESSABLE_ENTITY, id="invalid type"),
+        ],
+    )
+    def test_bad_request(self, path: str, expected_status: HTTPStatus):
+        response = client.get(f"/api/UpcomingFristen/{path}")
+        assert response.status_code == expected_status
@@ -0,0 +1,147 @@
+"""Tests for the in-process cache of generated Fristen."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+from fristenkalender_generator.bdew_calendar_generator import FristenkalenderGenerator, FristenType
+
+from app.cache import LruCache
+from app.fristen_cache import (
+    GENERATOR_VERSION,
+    HOLIDAYS_VERSION,
+    fristen_cache,
+    get_all_fristen,
+    get_all_fristen_json,
+    get_fristen_for_type,
+    make_key,
+    serialized_fristen_cache,
+    warm_up,
+    warmup_years,
+)
+from app.main import app
+from app.settings import FristenCacheSettings
+
+client = TestClient(app)
+
+
+class TestLruCache:
+    def test_counts_hits_and_misses(self):
+        cache: LruCache[str, int] = LruCache(maxsize=2)
+        assert cache.get_or_compute("a", lambda: 1) == 1
+        assert cache.get_or_compute("a", lambda: 2) == 1  # cached, compute is not called
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.size, stats.maxsize) == (1, 1, 1, 2)
+
+    def test_evicts_least_recently_used(self):
+        cache: LruCache[str, int] = LruCache(maxsize=2)
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("b", lambda: 2)
+        cache.get_or_compute("a", lambda: 1)  # 'a' is now the most recently used entry
+        cache.get_or_compute("c", lambda: 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_clear(self):
+        cache: LruCache[str, int] = LruCache(maxsize=2)
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("a", lambda: 1)
+        cache.clear()
+        assert "a" not in cache
+        # the counters are monotonic
+        assert cache.stats() == (1, 1, 0, 2, 0)
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            LruCache(maxsize=0)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        cache: LruCache[str, int] = LruCache(maxsize=2)
+        computation_started = threading.Event()
+        release_computation = threading.Event()
+        calls = []
+
+        def compute() -> int:
+            calls.append(1)
+            computation_started.set()
+            release_computation.wait(timeout=10)
+            return 42
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            first = executor.submit(cache.get_or_compute, "a", compute)
+            assert computation_started.wait(timeout=10)
+            waiters = [executor.submit(cache.get_or_compute, "a", compute) for _ in range(7)]
+            while cache.stats().coalesced < 7:
+                time.sleep(0.001)
+            release_computation.set()
+            assert first.result() == 42
+            assert [waiter.result() for waiter in waiters] == [42] * 7
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.coalesced) == (0, 1, 7)
+
+    def test_failed_computation_is_raised_in_waiters_and_not_cached(self):
+        cache: LruCache[str, int] = LruCache(maxsize=2)
+        computation_started = threading.Event()
+        release_computation = threading.Event()
+
+        def fail() -> int:
+            computation_started.set()
+            release_computation.wait(timeout=10)
+            raise RuntimeError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(cache.get_or_compute, "a", fail)
+            assert computation_started.wait(timeout=10)
+            waiter = executor.submit(cache.get_or_compute, "a", fail)
+            while cache.stats().coalesced < 1:
+                time.sleep(0.001)
+            release_computation.set()
+            with pytest.raises(RuntimeError):
+                first.result()
+            with pytest.raises(RuntimeError):
+                waiter.result()
+        assert "a" not in cache
+        assert cache.get_or_compute("a", lambda: 1) == 1
+
+
+class TestFristenCache:
+    def test_key_contains_package_versions(self):
+        key = make_key(2024, FristenType.GPKE)
+        assert key == (2024, FristenType.GPKE, GENERATOR_VERSION, HOLIDAYS_VERSION)
+
+    def test_cached_results_equal_generator_output(self):
+        assert list(get_all_fristen(2022)) == FristenkalenderGenerator().generate_all_fristen(2022)
+        assert list(
+            get_fristen_for_type(2022, FristenType.KOV)
+        ) == FristenkalenderGenerator().generate_fristen_for_type(2022, FristenType.KOV)
+
+    def test_endpoint_is_served_from_cache(self):
+        get_all_fristen_json(2021)
+        hits_before = serialized_fristen_cache.stats().hits
+        response = client.get("/api/GenerateAllFristen/2021")
+        assert response.status_code == HTTPStatus.OK
+        assert serialized_fristen_cache.stats().hits == hits_before + 1
+        assert response.content == get_all_fristen_json(2021)
+
+    def test_warm_up(self):
+        warm_up(range(2019, 2020))
+        assert make_key(2019) in fristen_cache
+        assert all(make_key(2019, fristen_type) in fristen_cache for fristen_type in FristenType)
+        assert make_key(2019) in serialized_fristen_cache
+
+    @pytest.mark.parametrize(
+        "warmup_years_setting,expected",
+        [
+            pytest.param(0, range(2024, 2025), id="only current year"),
+            pytest.param(1, range(2023, 2026), id="current year +/- 1"),
+        ],
+    )
+    def test_warmup_years(self, warmup_years_setting: int, expected: range):
+        settings = FristenCacheSettings(fristen_cache_warmup_years=warmup_years_setting)
+        assert warmup_years(settings, today=date(2024, 5, 1)) == expected
@@ -24,6 +24,20 @@ class TestGenerateAllFristen:
         assert not isinstance(body[0], str)
         assert all(isinstance(x, dict) for x in body)
 
+    def test_columnar_format(self):
+        rows = client.get("/api/GenerateAllFristen/2023").json()
+        response = client.get("/api/GenerateAllFristen/2023", params={"format": "columnar"})
+        assert response.status_code == HTTPStatus.OK
+        columnar = response.json()
+        assert columnar["length"] == len(rows)
+        assert columnar["columns"]["date"] == [frist["date"] for frist in rows]
+        labels = columnar["values"]["label"]
+        assert [labels[index] for index in columnar["columns"]["label"]] == [frist["label"] for frist in rows]
+
+    def test_unknown_format(self):
+        response = client.get("/api/GenerateAllFristen/2023", params={"format": "xml"})
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
     @pytest.mark.parametrize(
         "year",
         [
@@ -0,0 +1,56 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+class TestGenerateAllFristenRange:
+    def test_ok_get(self):
+        response = client.get("/api/GenerateAllFristenRange/2022/2024")
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        fristen = [json.loads(line) for line in lines]
+        assert all(isinstance(x, dict) for x in fristen)
+        dates = [frist["date"] for frist in fristen]
+        assert dates == sorted(dates)
+        # every frist of every single year is contained exactly once
+        keys = [(frist["date"], frist["label"]) for frist in fristen]
+        assert len(keys) == len(set(keys))
+        for year in (2022, 2023, 2024):
+            single_year = client.get(f"/api/GenerateAllFristen/{year}").json()
+            assert {(frist["date"], frist["label"]) for frist in single_year} <= set(keys)
+
+    def test_lines_equal_single_year_objects(self):
+        lines = client.get("/api/GenerateAllFristenRange/2023/2023").text.splitlines()
+        single_year = client.get("/api/GenerateAllFristen/2023").json()
+        # the same objects, but ordered by date
+        assert sorted(map(json.loads, lines), key=json.dumps) == sorted(single_year, key=json.dumps)
+
+    @pytest.mark.parametrize("fristen_type", ["MABIS", "KOV", "GELI", "GPKE"])
+    def test_fristen_type(self, fristen_type: str):
+        response = client.get(f"/api/GenerateAllFristenRange/2024/2026?fristen_type={fristen_type}")
+        assert response.status_code == HTTPStatus.OK
+        fristen = [json.loads(line) for line in response.text.splitlines()]
+        assert fristen
+        assert all(frist["fristen_type"] == f"FristenType.{fristen_type}" for frist in fristen)
+        # the generator groups the fristen of one type by label
+        dates = [frist["date"] for frist in fristen]
+        assert dates == sorted(dates)
+
+    @pytest.mark.parametrize(
+        "path,expected_status",
+        [
+            pytest.param("2024/2023", HTTPStatus.BAD_REQUEST, id="to before from"),
+            pytest.param("1900/2023", HTTPStatus.UNPROCESSABLE_ENTITY, id="year out of range"),
+            pytest.param("2023/2024?fristen_type=FOO", HTTPStatus.UNPROCESSABLE_ENTITY, id="invalid type"),
+        ],
+    )
+    def test_bad_request(self, path: str, expected_status: HTTPStatus):
+        response = client.get(f"/api/GenerateAllFristenRange/{path}")
+        assert response.status_code == expected_status
@@ -23,6 +23,14 @@ class TestGenerateFristenForType:
         }
         assert actual_frist == expected
 
+    def test_columnar_format(self):
+        response = client.get("/api/GenerateFristenForType/2025/GPKE", params={"format": "columnar"})
+        assert response.status_code == HTTPStatus.OK
+        columnar = response.json()
+        assert columnar["length"] == 6
+        assert columnar["values"]["fristen_type"] == ["FristenType.GPKE"]
+        assert columnar["columns"]["fristen_type"] == [0] * 6
+
     @pytest.mark.parametrize(
         "year,fristen_type,expected_length",
         [
@@ -0,0 +1,69 @@
+"""Tests for generating the Fristen in worker processes."""
+
+from typing import Iterator
+
+import pytest
+from fristenkalender_generator.bdew_calendar_generator import FristenkalenderGenerator, FristenType
+
+from app import generation
+from app.fristen_cache import fristen_cache, get_fristen_for_type, iter_fristen
+from app.settings import GenerationPoolSettings
+
+
+@pytest.fixture
+def with_pool() -> Iterator[None]:
+    generation.start_pool(GenerationPoolSettings(generation_pool_enable=True, generation_pool_size=2))
+    fristen_cache.clear()
+    yield
+    generation.shutdown_pool()
+    fristen_cache.clear()
+
+
+class TestGeneration:
+    def test_without_pool_generates_in_process(self):
+        assert not generation.is_pool_running()
+        assert generation.submit_all([(2023, None)]) == {}
+        future = generation.submit(2023, FristenType.GELI)
+        assert future.done()
+        assert list(future.result()) == FristenkalenderGenerator().generate_fristen_for_type(2023, FristenType.GELI)
+
+    @pytest.mark.usefixtures("with_pool")
+    def test_pool_results_equal_in_process_results(self):
+        assert generation.is_pool_running()
+        futures = generation.submit_all([(2023, None), (2024, FristenType.KOV), (2023, None)])
+        assert list(futures) == [(2023, None), (2024, FristenType.KOV)]
+        assert futures[(2023, None)].result() == generation.generate(2023)
+        assert futures[(2024, FristenType.KOV)].result() == generation.generate(2024, FristenType.KOV)
+
+    @pytest.mark.usefixtures("with_pool")
+    def test_cache_is_filled_from_pool(self):
+        assert list(
+            get_fristen_for_type(2022, FristenType.MABIS)
+        ) == FristenkalenderGenerator().generate_fristen_for_type(2022, FristenType.MABIS)
+        fristen = list(iter_fristen(2021, 2023))
+        assert [frist.date for frist in fristen] == sorted(frist.date for frist in fristen)
+        assert set(generation.generate(2022)) <= set(fristen)
+
+    @pytest.mark.usefixtures("with_pool")
+    def test_years_are_generated_a_few_years_ahead(self, monkeypatch: pytest.MonkeyPatch):
+        submitted: list[int] = []
+        submit = generation.submit
+
+        def recording_submit(year: int, fristen_type: FristenType | None = None):  # type: ignore[no-untyped-def]
+            submitted.append(year)
+            return submit(year, fristen_type)
+
+        monkeypatch.setattr(generation, "submit", recording_submit)
+        assert generation.pool_size() == 2
+        fristen = iter_fristen(2000, 2019)
+        next(fristen)
+        # 2 x pool size years are generated ahead, not the whole range at once
+        assert submitted == [2000, 2001, 2002, 2003]
+        rest = list(fristen)
+        assert submitted == list(range(2000, 2020))
+        assert {frist.date.year for frist in rest} >= set(range(2000, 2020))
+
+    def test_settings_defaults(self):
+        settings = GenerationPoolSettings()
+        assert settings.generation_pool_enable is False
+        assert settings.generation_pool_size is None
@@ -0,0 +1,130 @@
+"""Tests for the ETag/Cache-Control headers and the 304 responses of the API routes."""
+
+from datetime import date
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.http_caching import ConditionalGetMiddleware, _etag_matches, _latest_year
+from app.main import app
+
+client = TestClient(app)
+
+
+def _etag(path: str) -> str:
+    """the etag that the middleware would send with a successful response to the (query-less) path"""
+    middleware = app.middleware_stack or app.build_middleware_stack()
+    while not isinstance(middleware, ConditionalGetMiddleware):
+        middleware = middleware.app  # type: ignore[attr-defined]
+    return middleware._etag({"path": path, "query_string": b""})  # pylint:disable=protected-access
+
+
+class TestConditionalGet:
+    def test_etag_and_cache_control(self):
+        response = client.get("/api/GenerateAllFristen/2020")
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["etag"].startswith('W/"')
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    def test_current_year_is_not_immutable(self):
+        response = client.get(f"/api/GenerateAllFristen/{date.today().year}")
+        assert response.headers["cache-control"] == "public, max-age=3600"
+
+    def test_not_modified(self):
+        etag = client.get("/api/IsWorkingDay/2021-05-12").headers["etag"]
+        response = client.get("/api/IsWorkingDay/2021-05-12", headers={"If-None-Match": etag})
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert response.headers["cache-control"].endswith("immutable")
+
+    def test_etag_depends_on_path_and_query(self):
+        etags = {
+            client.get("/api/GenerateAllFristenRange/2022/2023").headers["etag"],
+            client.get("/api/GenerateAllFristenRange/2022/2023?fristen_type=GPKE").headers["etag"],
+            client.get("/api/GenerateAllFristenRange/2022/2024").headers["etag"],
+        }
+        assert len(etags) == 3
+
+    def test_other_etag_is_answered_in_full(self):
+        response = client.get("/api/GenerateAllFristen/2020", headers={"If-None-Match": 'W/"something-else"'})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            pytest.param("/api/GenerateAllFristen/1800", id="error response"),
+            pytest.param("/health", id="outside of /api"),
+        ],
+    )
+    def test_no_validators(self, path: str):
+        response = client.get(path)
+        assert "etag" not in response.headers
+        assert "cache-control" not in response.headers
+
+    @pytest.mark.parametrize(
+        "path,expected_status",
+        [
+            pytest.param("/api/DoesNotExist", HTTPStatus.NOT_FOUND, id="unknown route"),
+            pytest.param("/api/IsWorkingDay/notadate", HTTPStatus.UNPROCESSABLE_ENTITY, id="invalid parameter"),
+            pytest.param("/api/FristenBetween/1900-12-01/1901-02-01", HTTPStatus.BAD_REQUEST, id="error response"),
+        ],
+    )
+    @pytest.mark.parametrize("matching", [True, False], ids=["matching etag", "wildcard"])
+    def test_errors_are_never_not_modified(self, path: str, expected_status: HTTPStatus, matching: bool):
+        response = client.get(path, headers={"If-None-Match": _etag(path) if matching else "*"})
+        assert response.status_code == expected_status
+        assert "etag" not in response.headers
+
+    def test_wildcard_is_answered_in_full(self):
+        response = client.get("/api/IsWorkingDay/2021-05-12", headers={"If-None-Match": "*"})
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["etag"] == _etag("/api/IsWorkingDay/2021-05-12")
+
+    def test_streamed_response_is_not_modified(self):
+        etag = client.get("/api/GenerateAllFristenRange/2020/2021").headers["etag"]
+        response = client.get("/api/GenerateAllFristenRange/2020/2021", headers={"If-None-Match": etag})
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.content == b""
+
+    def test_number_of_days_is_never_immutable(self):
+        response = client.get("/api/AddWorkingDays/2010-01-01/5000")
+        assert response.headers["cache-control"] == "public, max-age=3600"
+
+    def test_upcoming_fristen_are_never_immutable(self):
+        # a past date, but the next 100 GELI Fristen reach years into the future
+        response = client.get(f"/api/UpcomingFristen/{date.today().year - 2}-01-01?n=100&type=GELI")
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()[-1]["date"] > f"{date.today().year + 1}"
+        assert response.headers["cache-control"] == "public, max-age=3600"
+
+
+@pytest.mark.parametrize(
+    "path_params,expected",
+    [
+        pytest.param({"year": "2020"}, 2020, id="year"),
+        pytest.param({"from_year": "2020", "to_year": "2022"}, 2022, id="year range"),
+        pytest.param({"start_date": "2019-01-01", "end_date": "2021-12-31"}, 2021, id="date range"),
+        pytest.param({"filename": "foo", "attendee": "bar"}, None, id="no years"),
+        pytest.param({"start_date": "2019-01-01", "number_of_days": "5"}, None, id="unbounded"),
+        pytest.param({"year": "abc"}, None, id="invalid"),
+    ],
+)
+def test_latest_year(path_params: dict[str, str], expected: int | None):
+    assert _latest_year(path_params) == expected
+
+
+@pytest.mark.parametrize(
+    "if_none_match,expected",
+    [
+        pytest.param('W/"abc"', True, id="same"),
+        pytest.param('"abc"', True, id="weak comparison"),
+        pytest.param('"x", W/"abc"', True, id="list"),
+        pytest.param("*", False, id="no wildcard"),
+        pytest.param('"abcd"', False, id="different"),
+    ],
+)
+def test_etag_matches(if_none_match: str, expected: bool):
+    assert _etag_matches(if_none_match, 'W/"abc"') is expected
@@ -0,0 +1,182 @@
+"""Tests for the in-memory ICS export."""
+
+import re
+from datetime import date, datetime, timezone
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from fristenkalender_generator.bdew_calendar_generator import FristenkalenderGenerator, FristenType
+
+from app.fristen_cache import fristen_cache, make_key
+from app.ics_export import (
+    FeedWindow,
+    IcsCacheKey,
+    export_fristen_for_type,
+    export_whole_calendar,
+    feed_cache,
+    ics_cache,
+    stream_calendar,
+    subscription_feed,
+)
+from app.main import app
+
+client = TestClient(app)
+
+_DTSTAMP = re.compile(rb"^DTSTAMP:\d{8}T\d{6}Z\r$", flags=re.MULTILINE)
+
+
+def _without_dtstamps(ics: bytes) -> bytes:
+    """DTSTAMP is the time of the rendering; it's the only difference between two renderings on the same day"""
+    return _DTSTAMP.sub(b"DTSTAMP:-\r", ics)
+
+
+class TestIcsExport:
+    @pytest.mark.parametrize(
+        "attendee",
+        [
+            pytest.param("info@hochfrequenz.de", id="mail address"),
+            pytest.param("a" * 100 + "@example.com", id="folded attendee line"),
+            pytest.param("mailto:x,y;z", id="special characters"),
+        ],
+    )
+    def test_whole_calendar_equals_generator_export(self, attendee: str, tmp_path: Path):
+        FristenkalenderGenerator().generate_and_export_whole_calendar(tmp_path / "expected.ics", attendee, 2023)
+        expected = (tmp_path / "expected.ics").read_bytes()
+        assert _without_dtstamps(export_whole_calendar(attendee, 2023)) == _without_dtstamps(expected)
+
+    def test_fristen_for_type_equals_generator_export(self, tmp_path: Path):
+        FristenkalenderGenerator().generate_and_export_fristen_for_type(
+            tmp_path / "expected.ics", "foo@bar.de", 2024, FristenType.KOV
+        )
+        expected = (tmp_path / "expected.ics").read_bytes()
+        actual = export_fristen_for_type("foo@bar.de", 2024, FristenType.KOV)
+        assert _without_dtstamps(actual) == _without_dtstamps(expected)
+
+    def test_one_rendering_serves_all_attendees(self):
+        export_whole_calendar("first@example.com", 2022)
+        misses_before = ics_cache.stats().misses
+        ics = export_whole_calendar("second@example.com", 2022)
+        assert ics_cache.stats().misses == misses_before
+        assert b"ATTENDEE:second@example.com\r\n" in ics
+        assert b"first@example.com" not in ics
+        assert IcsCacheKey(make_key(2022), date.today()) in ics_cache
+
+
+def _events(ics: bytes) -> list[bytes]:
+    return [b"BEGIN:VEVENT" + event for event in ics.removesuffix(b"END:VCALENDAR\r\n").split(b"BEGIN:VEVENT")[1:]]
+
+
+class TestStreamCalendar:
+    def test_one_year_and_type_has_the_events_of_the_export(self):
+        expected = export_fristen_for_type("foo@bar.de", 2024, FristenType.GELI)
+        actual = b"".join(stream_calendar("foo@bar.de", 2024, 2024, [FristenType.GELI]))
+        assert actual.split(b"BEGIN:VEVENT")[0] == expected.split(b"BEGIN:VEVENT")[0]
+        assert actual.endswith(b"END:VEVENT\r\nEND:VCALENDAR\r\n")
+        assert sorted(_events(actual)) == sorted(_events(expected))
+
+    def test_events_are_ordered_and_unique(self):
+        ics = b"".join(stream_calendar("foo@bar.de", 2024, 2026, [FristenType.MABIS, FristenType.KOV]))
+        events = _events(ics)
+        dates = [re.search(rb"DTSTART;VALUE=DATE:(\d{8})", event).group(1) for event in events]  # type: ignore[union-attr]
+        assert dates == sorted(dates)
+        assert len(events) == len(set(events))
+        single_type_ics = b"".join(stream_calendar("foo@bar.de", 2024, 2026, [FristenType.MABIS]))
+        assert set(_events(_without_dtstamps(single_type_ics))) < set(_events(_without_dtstamps(ics)))
+
+    def test_first_bytes_are_sent_before_later_years_are_rendered(self):
+        chunks = stream_calendar("foo@bar.de", 2061, 2080, [FristenType.GPKE])
+        assert next(chunks).startswith(b"BEGIN:VCALENDAR")
+        assert IcsCacheKey(make_key(2080, FristenType.GPKE), date.today()) not in ics_cache
+
+    def test_years_that_are_not_cached_are_not_added_to_the_caches(self):
+        ics = b"".join(stream_calendar("foo@bar.de", 2041, 2043, [FristenType.GELI, FristenType.KOV]))
+        for year in (2041, 2042, 2043):
+            for fristen_type in (FristenType.GELI, FristenType.KOV):
+                assert IcsCacheKey(make_key(year, fristen_type), date.today()) not in ics_cache
+                assert make_key(year, fristen_type) not in fristen_cache
+        # the same events as if the years were cached
+        export_fristen_for_type("foo@bar.de", 2042, FristenType.GELI)
+        export_fristen_for_type("foo@bar.de", 2042, FristenType.KOV)
+        cached = b"".join(stream_calendar("foo@bar.de", 2041, 2043, [FristenType.GELI, FristenType.KOV]))
+        assert _without_dtstamps(cached) == _without_dtstamps(ics)
+
+
+class TestSubscriptionFeed:
+    def test_window(self):
+        assert FeedWindow.around(date(2025, 1, 15), 3, 15) == FeedWindow(date(2024, 10, 1), date(2026, 4, 30))
+        assert FeedWindow.around(date(2025, 12, 31), 0, 0) == FeedWindow(date(2025, 12, 1), date(2025, 12, 31))
+
+    def test_events_of_the_window(self):
+        feed = subscription_feed([FristenType.KOV, FristenType.MABIS], 3, 15, today=date(2025, 1, 15))
+        events = _events(feed.calendar.with_attendee("foo@bar.de"))
+        dates = [re.search(rb"DTSTART;VALUE=DATE:(\d{8})", event).group(1) for event in events]  # type: ignore[union-attr]
+        assert dates == sorted(dates)
+        assert b"20241001" <= dates[0] and dates[-1] <= b"20260430"
+        uids = [re.search(rb"UID:(\S+)", event).group(1) for event in events]  # type: ignore[union-attr]
+        assert len(uids) == len(set(uids))
+        assert feed.last_modified == datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def test_feed_only_changes_with_the_window(self):
+        feed = subscription_feed([FristenType.GELI], 3, 15, today=date(2025, 2, 1))
+        assert subscription_feed([FristenType.GELI], 3, 15, today=date(2025, 2, 28)) is feed
+        feed_cache.clear()
+        rerendered = subscription_feed([FristenType.GELI], 3, 15, today=date(2025, 2, 10))
+        assert rerendered.calendar == feed.calendar  # stable UIDs and DTSTAMPs
+        assert rerendered.etag("foo@bar.de") == feed.etag("foo@bar.de") != feed.etag("other@bar.de")
+        next_month = subscription_feed([FristenType.GELI], 3, 15, today=date(2025, 3, 1))
+        assert next_month.etag("foo@bar.de") != feed.etag("foo@bar.de")
+
+
+class TestIcsEndpoints:
+    def test_subscription_revalidation(self):
+        url = "/api/FristenSubscription/foo@bar.de?fristen_type=MABIS&months_before=1&months_after=2"
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"].startswith("text/calendar")
+        assert response.content.startswith(b"BEGIN:VCALENDAR")
+        etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+        assert not etag.startswith("W/")  # not the one of the ConditionalGetMiddleware
+        for headers in ({"If-None-Match": etag}, {"If-Modified-Since": last_modified}):
+            not_modified = client.get(url, headers=headers)
+            assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+            assert not_modified.content == b""
+            assert not_modified.headers["etag"] == etag
+        assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == HTTPStatus.OK
+        assert client.get(url, headers={"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}).status_code == 200
+
+    def test_range_download(self):
+        response = client.get(
+            "/api/GenerateAndExportFristenRange/team/foo@bar.de/2024/2025", params={"fristen_type": ["GPKE", "KOV"]}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"].startswith("text/calendar")
+        assert response.headers["content-disposition"] == 'attachment; filename="team.ics"'
+        assert "content-length" not in response.headers
+        # years that are not cached are rendered (with the current time as DTSTAMP) on every request
+        assert _without_dtstamps(response.content) == _without_dtstamps(
+            b"".join(stream_calendar("foo@bar.de", 2024, 2025, [FristenType.GPKE, FristenType.KOV]))
+        )
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            pytest.param("/api/GenerateAndExportFristenRange/team/foo@bar.de/2025/2024", id="reversed range"),
+            pytest.param("/api/GenerateAndExportFristenRange/team/foo@bar.de/2024/2025?fristen_type=FOO", id="type"),
+        ],
+    )
+    def test_range_download_bad_request(self, path: str):
+        assert client.get(path).status_code in (HTTPStatus.BAD_REQUEST, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+    def test_download_headers(self):
+        response = client.get("/api/GenerateAndExportWholeCalendar/foo/bar/2023")
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-type"].startswith("text/calendar")
+        assert response.headers["content-disposition"] == 'attachment; filename="foo.ics"'
+        assert response.content.startswith(b"BEGIN:VCALENDAR")
+
+    def test_non_ascii_filename(self):
+        response = client.get("/api/GenerateAndExportFristenForType/Fristenübersicht/bar/2023/GPKE")
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers["content-disposition"] == "attachment; filename*=utf-8''Fristen%C3%BCbersicht.ics"
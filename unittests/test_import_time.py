@@ -0,0 +1,48 @@
+"""
+Guards the cold start of the app: importing app.main must neither import the MCP stack (it is built
+lazily, see app.mcp_server.lazy) nor take longer than a budget.
+
+The budget (in seconds) can be adapted to slower CI runners via the IMPORT_TIME_BUDGET_SECONDS env var.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+_SRC_DIR = Path(__file__).parent.parent / "src"
+
+_DEFAULT_IMPORT_TIME_BUDGET_SECONDS = 2.0
+
+_MEASUREMENT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+duration = time.perf_counter() - start
+print(json.dumps({"duration": duration, "modules": sorted(sys.modules)}))
+"""
+
+
+def _measure_import() -> dict:
+    """imports app.main in a fresh interpreter (nothing is imported/cached yet, like in a cold start)"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(_SRC_DIR), os.environ.get("PYTHONPATH", "")])}
+    completed = subprocess.run(
+        [sys.executable, "-c", _MEASUREMENT], env=env, capture_output=True, check=True, text=True, timeout=120
+    )
+    result: dict = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result
+
+
+def test_import_of_app_does_not_import_the_mcp_stack() -> None:
+    modules = set(_measure_import()["modules"])
+    assert "fastmcp" not in modules
+    assert "mcp" not in modules
+    assert "app.mcp_server.server" not in modules
+
+
+def test_import_time_is_within_budget() -> None:
+    budget = float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", _DEFAULT_IMPORT_TIME_BUDGET_SECONDS))
+    # the best of a few runs, so that a single hiccup of the machine does not fail the test
+    duration = min(_measure_import()["duration"] for _ in range(3))
+    assert duration <= budget, f"importing app.main took {duration:.2f}s (budget: {budget:.2f}s)"
@@ -13,7 +13,8 @@ import pytest  # type: ignore[import]
 from fastapi.testclient import TestClient
 
 from app.main import _mcp_app, app
-from app.mcp_server import _MCP_NAMES, _annotate_read_only, _build_route_map_fn
+from app.mcp_server import _MCP_NAMES
+from app.mcp_server.server import _annotate_read_only, _build_route_map_fn
 from app.mcp_server.settings import McpSettings
 
 
@@ -34,12 +35,16 @@ def _build_test_mcp(fastapi_app):  # type: ignore[no-untyped-def]
 # endpoints are intentionally excluded -- see app.mcp_server._MCP_NAMES)
 EXPECTED_TOOL_NAMES = {
     "is_working_day",
+    "is_working_day_batch",
     "next_working_day",
     "previous_working_day",
     "add_working_days",
     "add_calendar_days",
+    "add_working_days_batch",
+    "add_calendar_days_batch",
     "generate_all_fristen",
     "generate_fristen_for_type",
+    "upcoming_fristen",
 }
 
 
@@ -158,7 +163,7 @@ def test_attach_mcp_propagates_partial_config(monkeypatch: pytest.MonkeyPatch) -
     """
     from fastapi import FastAPI
 
-    from app.mcp_server import attach_mcp
+    from app.mcp_server.server import attach_mcp
 
     _clear_auth_env(monkeypatch)
     monkeypatch.setenv("MCP_AUTH0_ISSUER_BASE_URL", "https://auth.hochfrequenz.de/")  # audience missing
@@ -206,7 +211,7 @@ def test_auth_is_scoped_to_mcp_route_not_the_whole_app(monkeypatch: pytest.Monke
     from fastapi import FastAPI
     from starlette.routing import Route
 
-    from app.mcp_server import attach_mcp
+    from app.mcp_server.server import attach_mcp
 
     _clear_auth_env(monkeypatch)
     monkeypatch.setenv("MCP_AUTH0_ISSUER_BASE_URL", "https://auth.hochfrequenz.de/")
@@ -234,7 +239,7 @@ def test_no_auth_middleware_when_auth_disabled(monkeypatch: pytest.MonkeyPatch)
     from fastapi import FastAPI
     from starlette.routing import Route
 
-    from app.mcp_server import attach_mcp
+    from app.mcp_server.server import attach_mcp
 
     _clear_auth_env(monkeypatch)
     host_app = FastAPI()
@@ -307,7 +312,7 @@ def test_resource_server_prm_and_401(monkeypatch: pytest.MonkeyPatch) -> None:
     """
     from fastapi import FastAPI
 
-    from app.mcp_server import attach_mcp
+    from app.mcp_server.server import attach_mcp
 
     _clear_auth_env(monkeypatch)
     monkeypatch.setenv("MCP_AUTH0_ISSUER_BASE_URL", "https://auth.hochfrequenz.de/")
@@ -407,3 +412,190 @@ def test_is_working_day_tool_works_over_mcp_session(tester_client: TestClient) -
     assert result["result"].get("isError") is not True, f"tool call errored: {result}"
     structured = result["result"]["structuredContent"]
     assert structured["is_working_day"] is False
+
+
+# ---------------------------------------------------------------------------
+# Lazy construction (see app.mcp_server.lazy)
+# ---------------------------------------------------------------------------
+
+
+def test_tools_listed_over_lazily_built_mcp_are_the_allowlisted_ones(tester_client: TestClient) -> None:
+    """the MCP the app builds lazily enforces the same allowlist as attach_mcp"""
+    import json
+
+    session_id = _mcp_session(tester_client)
+    resp = tester_client.post(
+        "/mcp",
+        headers={**_MCP_HEADERS, "mcp-session-id": session_id},
+        json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    )
+    assert resp.status_code == 200
+    data_lines = [line[6:] for line in resp.text.splitlines() if line.startswith("data: ")]
+    tools = json.loads(data_lines[0])["result"]["tools"]
+    assert {tool["name"] for tool in tools} == EXPECTED_TOOL_NAMES
+
+
+def test_lazy_mcp_is_built_on_first_request_without_lifespan(monkeypatch: pytest.MonkeyPatch) -> None:
+    """without a lifespan (nothing builds it in the background), the first request to an MCP route builds it"""
+    from fastapi import FastAPI
+
+    from app.mcp_server.lazy import attach_lazy_mcp
+
+    _clear_auth_env(monkeypatch)
+    monkeypatch.setenv("MCP_AUTH0_ISSUER_BASE_URL", "https://auth.hochfrequenz.de/")
+    monkeypatch.setenv("MCP_AUTH0_AUDIENCE", "http://testserver/mcp")
+    host_app = FastAPI()
+    lazy_mcp = attach_lazy_mcp(host_app)
+    assert lazy_mcp is not None
+    assert not lazy_mcp.is_built()
+    assert lazy_mcp.paths == ["/mcp", "/.well-known/oauth-protected-resource/mcp"]
+
+    client = TestClient(host_app)
+    prm = client.get("/.well-known/oauth-protected-resource/mcp")
+    assert prm.status_code == 200
+    assert prm.json()["resource"] == "http://testserver/mcp"
+    assert lazy_mcp.is_built()
+    assert client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list"}).status_code == 401
+
+
+def test_attach_lazy_mcp_validates_settings_right_away(monkeypatch: pytest.MonkeyPatch) -> None:
+    """deferring the build must not defer the config check: a partial config still aborts the startup"""
+    from fastapi import FastAPI
+
+    from app.mcp_server.lazy import attach_lazy_mcp
+
+    _clear_auth_env(monkeypatch)
+    monkeypatch.setenv("MCP_AUTH0_ISSUER_BASE_URL", "https://auth.hochfrequenz.de/")  # audience missing
+    with pytest.raises(ValueError, match="partially configured"):
+        attach_lazy_mcp(FastAPI())
+
+
+def test_attach_lazy_mcp_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    from fastapi import FastAPI
+
+    from app.mcp_server.lazy import attach_lazy_mcp
+
+    monkeypatch.setenv("MCP_ENABLE", "false")
+    host_app = FastAPI()
+    assert attach_lazy_mcp(host_app) is None
+    assert not any(getattr(route, "path", "") == "/mcp" for route in host_app.routes)
+
+
+# ---------------------------------------------------------------------------
+# Direct (in-process) tool execution (see app.mcp_server.direct)
+# ---------------------------------------------------------------------------
+
+
+def _build_direct_test_mcp(fastapi_app):  # type: ignore[no-untyped-def]
+    """build an MCP from the app exactly as attach_mcp does with MCP_DIRECT_TOOL_EXECUTION=true"""
+    from app.mcp_server.direct import DirectExecution, direct_endpoints
+
+    mcp = _build_test_mcp(fastapi_app)
+    mcp.add_transform(DirectExecution(direct_endpoints(fastapi_app, _MCP_NAMES)))
+    return mcp
+
+
+_TOOL_CALLS = [
+    ("is_working_day", {"check_date": "2024-01-01"}),
+    ("is_working_day", {"check_date": "2024-01-02"}),
+    ("next_working_day", {"start_date": "2024-12-23"}),
+    ("previous_working_day", {"start_date": "2024-01-02"}),
+    ("add_working_days", {"start_date": "2024-12-20", "number_of_days": 3}),
+    ("add_working_days", {"start_date": "2024-12-20", "number_of_days": -3, "end_date_type": "inclusive"}),
+    ("add_calendar_days", {"start_date": "2024-02-27", "number_of_days": 3}),
+    ("generate_all_fristen", {"year": 2024}),
+    ("generate_fristen_for_type", {"year": 2024, "fristen_type": "GPKE"}),
+    ("is_working_day_batch", {"dates": ["2024-01-01", "2024-01-02", "2024-12-24"]}),
+    ("is_working_day_batch", {"start_date": "2024-12-20", "end_date": "2025-01-06"}),
+    (
+        "add_working_days_batch",
+        {
+            "start_dates": ["2024-12-20", "2024-12-20"],
+            "numbers_of_days": [3, -3],
+            "end_date_types": ["exclusive", "inclusive"],
+        },
+    ),
+    ("add_calendar_days_batch", {"start_dates": ["2024-02-27"], "numbers_of_days": [3]}),
+    ("upcoming_fristen", {"from_date": "2024-12-20", "n": 5, "type": "GPKE"}),
+    # invalid arguments: rejected by the validation of the parameters resp. by the endpoint
+    ("generate_all_fristen", {"year": 1800}),
+    ("generate_fristen_for_type", {"year": 2024, "fristen_type": "FOO"}),
+    ("is_working_day", {"check_date": "not-a-date"}),
+    ("is_working_day_batch", {"dates": ["2024-01-01"], "start_date": "2024-01-01", "end_date": "2024-01-02"}),
+    ("add_working_days_batch", {"start_dates": ["2024-12-20"], "numbers_of_days": [1, 2]}),
+    ("upcoming_fristen", {"from_date": "2024-12-20", "n": 0}),
+]
+
+
+async def _call_tools(mcp) -> list[tuple[bool, object]]:  # type: ignore[no-untyped-def]
+    from fastmcp import Client
+
+    results = []
+    async with Client(mcp) as client:
+        for tool, arguments in _TOOL_CALLS:
+            result = await client.call_tool(tool, arguments, raise_on_error=False)
+            results.append((result.is_error, None if result.is_error else result.structured_content))
+    return results
+
+
+def test_direct_tools_have_the_openapi_definitions() -> None:
+    """the tool definitions (and thus the schemas the clients see) do not depend on how the tools are executed"""
+    from fastmcp import Client
+
+    from app.mcp_server.direct import direct_endpoints
+
+    async def list_tools(mcp) -> dict:  # type: ignore[no-untyped-def]
+        async with Client(mcp) as client:
+            return {tool.name: tool.model_dump() for tool in await client.list_tools()}
+
+    assert set(direct_endpoints(app, _MCP_NAMES)) == EXPECTED_TOOL_NAMES
+    assert asyncio.run(list_tools(_build_direct_test_mcp(app))) == asyncio.run(list_tools(_build_test_mcp(app)))
+
+
+def test_direct_tools_return_the_same_results_as_via_http() -> None:
+    via_http = asyncio.run(_call_tools(_build_test_mcp(app)))
+    direct = asyncio.run(_call_tools(_build_direct_test_mcp(app)))
+    assert direct == via_http
+    assert [is_error for is_error, _ in direct] == [False] * 14 + [True] * 6
+
+
+def test_direct_tools_do_not_send_http_requests(monkeypatch: pytest.MonkeyPatch) -> None:
+    import httpx
+
+    async def no_http(*_args, **_kwargs):  # type: ignore[no-untyped-def]
+        raise AssertionError("the tool must not send an HTTP request")
+
+    monkeypatch.setattr(httpx.AsyncClient, "send", no_http)
+    results = asyncio.run(_call_tools(_build_direct_test_mcp(app)))
+    assert results[0] == (False, {"date": "2024-01-01", "is_working_day": False})
+
+
+def test_endpoints_with_other_than_path_query_or_body_parameters_are_executed_via_http() -> None:
+    from fastapi import FastAPI, Header
+    from fastapi.routing import APIRoute
+    from pydantic import BaseModel
+
+    from app.mcp_server.direct import direct_endpoints
+
+    class Body(BaseModel):
+        value: int
+
+    throwaway = FastAPI()
+
+    @throwaway.post("/WithBody")
+    async def with_body(body: Body) -> dict:  # pragma: no cover - never called
+        return {"value": body.value}
+
+    @throwaway.get("/WithPath/{value}")
+    async def with_path(value: int) -> dict:  # pragma: no cover - never called
+        return {"value": value}
+
+    @throwaway.get("/WithHeader")
+    async def with_header(value: int = Header()) -> dict:  # pragma: no cover - never called
+        return {"value": value}
+
+    names = {route.unique_id: route.name for route in throwaway.routes if isinstance(route, APIRoute)}
+    endpoints = direct_endpoints(throwaway, names)
+    assert set(endpoints) == {"with_body", "with_path"}
+    assert endpoints["with_body"].body_parameter == "body"
+    assert endpoints["with_path"].body_parameter is None
@@ -0,0 +1,148 @@
+"""Tests for the Prometheus metrics served at /metrics."""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.fristen_cache import fristen_cache, serialized_fristen_cache
+from app.main import app
+from app.settings import MetricsSettings
+
+client = TestClient(app)
+
+
+def _sample(text: str, name: str, **labels: str) -> float:
+    """the value of the sample with the given name and (at least) the given labels; 0 if there is none"""
+    for line in text.splitlines():
+        match = re.fullmatch(r"(\w+)(?:\{(.*)\})? (\S+)", line)
+        if match is None or match.group(1) != name:
+            continue
+        sample_labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(sample_labels.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return 0
+
+
+class TestMetricsEndpoint:
+    def test_requests_are_recorded_per_route_template(self):
+        before = client.get("/metrics").text
+        client.get("/api/IsWorkingDay/2024-01-02")
+        client.get("/api/IsWorkingDay/2024-01-03")
+        client.get("/api/IsWorkingDay/invalid")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == metrics.CONTENT_TYPE
+        after = response.text
+        route = "/api/IsWorkingDay/{check_date}"
+        for status, expected_increase in (("200", 2), ("422", 1)):
+            increase = _sample(after, "http_requests_total", route=route, status=status) - _sample(
+                before, "http_requests_total", route=route, status=status
+            )
+            assert increase == expected_increase
+        assert _sample(after, "http_request_duration_seconds_count", route=route) >= 3
+        assert _sample(after, "http_request_duration_seconds_bucket", route=route, le="+Inf") >= 3
+        assert "2024-01-02" not in after  # the dates must not become labels
+        assert _sample(after, "http_requests_in_flight", route=route) == 0
+
+    def test_unmatched_routes_are_not_labeled_with_their_path(self):
+        client.get("/api/does/not/exist")
+        text = client.get("/metrics").text
+        assert _sample(text, "http_requests_total", route="unmatched", status="404") >= 1
+        assert "/api/does/not/exist" not in text
+
+    def test_generation_serialization_and_cache_metrics(self):
+        fristen_cache.clear()
+        serialized_fristen_cache.clear()
+        before = client.get("/metrics").text
+        client.get("/api/GenerateAllFristen/2019")
+        client.get("/api/GenerateAllFristen/2019")
+        text = client.get("/metrics").text
+        assert _sample(text, "fristen_generation_seconds_count", fristen_type="all") >= 1
+        assert _sample(text, "fristen_serialization_seconds_count", fristen_type="all") >= 1
+        for name in ("cache_hits_total", "cache_misses_total"):
+            assert _sample(text, name, cache="fristen_json") - _sample(before, name, cache="fristen_json") == 1
+        assert _sample(text, "cache_max_entries", cache="fristen") == fristen_cache.stats().maxsize
+
+    def test_cache_counters_do_not_decrease_when_the_cache_is_cleared(self):
+        client.get("/api/GenerateAllFristen/2018")
+        before = client.get("/metrics").text
+        serialized_fristen_cache.clear()
+        after = client.get("/metrics").text
+        for name in ("cache_hits_total", "cache_misses_total", "cache_coalesced_total"):
+            assert _sample(after, name, cache="fristen_json") == _sample(before, name, cache="fristen_json")
+        assert _sample(before, "cache_misses_total", cache="fristen_json") >= 1
+        assert _sample(after, "cache_entries", cache="fristen_json") == 0
+
+    def test_mcp_and_metrics_are_not_in_the_openapi_schema(self):
+        assert "/metrics" not in app.openapi()["paths"]
+
+
+class TestRecording:
+    def test_shards_of_all_threads_are_summed_up(self):
+        labels = (("test", "threads"),)
+
+        def record() -> None:
+            for _ in range(1000):
+                metrics.inc("http_requests_total", labels)
+                metrics.observe("http_request_duration_seconds", labels, 0.003)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = metrics.snapshot()
+        assert snapshot.counters[("http_requests_total", labels)] == 4000
+        histogram = snapshot.histograms[("http_request_duration_seconds", labels)]
+        assert sum(histogram[:-1]) == 4000
+        assert histogram[metrics.DURATION_BUCKETS.index(0.005)] == 4000  # 0.0025 < 0.003 <= 0.005
+
+    def test_render_histogram_is_cumulative(self):
+        values = metrics.Snapshot(
+            {},
+            {},
+            {("ics_render_seconds", (("fristen_type", "GPKE"),)): [1, 2] + [0] * len(metrics.DURATION_BUCKETS) + [0.5]},
+        )
+        text = metrics.render(values)
+        assert 'ics_render_seconds_bucket{fristen_type="GPKE",le="0.0005"} 1' in text
+        assert 'ics_render_seconds_bucket{fristen_type="GPKE",le="0.001"} 3' in text
+        assert 'ics_render_seconds_bucket{fristen_type="GPKE",le="+Inf"} 3' in text
+        assert 'ics_render_seconds_sum{fristen_type="GPKE"} 0.5' in text
+        assert 'ics_render_seconds_count{fristen_type="GPKE"} 3' in text
+
+
+class TestMultiprocess:
+    def test_collect_sums_up_the_dumps_of_other_workers(self, tmp_path: Path):
+        settings = MetricsSettings(metrics_multiprocess_dir=tmp_path)
+        labels = (("test", "multiprocess"),)
+        metrics.inc("http_requests_total", labels, 5)
+        metrics.add("http_requests_in_flight", labels, 1)
+        metrics.dump(tmp_path)
+        own_file = next(tmp_path.glob("metrics-*.json"))
+        # pretend that the dump of this process was written by another worker
+        own_file.rename(tmp_path / "metrics-1.json")
+        collected = metrics.collect(settings)
+        assert (
+            collected.counters[("http_requests_total", labels)]
+            == 2 * metrics.snapshot().counters[("http_requests_total", labels)]
+        )
+        assert collected.gauges[("http_requests_in_flight", labels)] == 2
+        metrics.add("http_requests_in_flight", labels, -1)
+
+    def test_gauges_of_stale_workers_are_ignored(self, tmp_path: Path):
+        labels = (("test", "stale"),)
+        metrics.add("http_requests_in_flight", labels, 1)
+        metrics.dump(tmp_path)
+        metrics.add("http_requests_in_flight", labels, -1)
+        stale_file = tmp_path / "metrics-1.json"
+        next(tmp_path.glob("metrics-*.json")).rename(stale_file)
+        an_hour_ago = time.time() - 3600
+        os.utime(stale_file, (an_hour_ago, an_hour_ago))
+        settings = MetricsSettings(metrics_multiprocess_dir=tmp_path)
+        collected = metrics.collect(settings)
+        assert collected.gauges.get(("http_requests_in_flight", labels), 0) == 0
@@ -0,0 +1,109 @@
+"""Tests for the opt-in profiling of single requests."""
+
+import json
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.profiling import PROFILE_HEADER, PROFILE_ID_HEADER, ProfilingMiddleware
+from app.settings import ProfilingSettings
+
+
+def _busy_sync_work() -> None:
+    end = time.perf_counter() + 0.1
+    while time.perf_counter() < end:
+        pass
+
+
+async def _busy_async_work() -> None:
+    _busy_sync_work()
+
+
+def _client(tmp_path: Path, **settings) -> TestClient:
+    test_app = FastAPI()
+
+    @test_app.get("/sync")
+    def sync_endpoint():
+        _busy_sync_work()
+        return {}
+
+    @test_app.get("/async")
+    async def async_endpoint():
+        await _busy_async_work()
+        return {}
+
+    test_app.add_middleware(
+        ProfilingMiddleware,
+        routers=[test_app.router],
+        settings=ProfilingSettings(
+            profiling_enable=True,
+            profiling_output_dir=tmp_path,
+            profiling_sample_interval_seconds=0.001,
+            **settings,
+        ),
+    )
+    return TestClient(test_app)
+
+
+def _wait_for_profile(directory: Path, profile_id: str) -> tuple[str, dict]:
+    """the profile is written by the sampling thread, shortly after the response was sent"""
+    metadata_file = directory / f"{profile_id}.json"
+    deadline = time.monotonic() + 5
+    while not metadata_file.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return (directory / f"{profile_id}.folded").read_text(encoding="utf-8"), json.loads(metadata_file.read_text())
+
+
+class TestProfilingMiddleware:
+    def test_requests_without_token_are_not_profiled(self, tmp_path: Path):
+        client = _client(tmp_path, profiling_token="secret")
+        for headers in ({}, {PROFILE_HEADER: "wrong"}):
+            response = client.get("/sync", headers=headers)
+            assert response.status_code == 200
+            assert PROFILE_ID_HEADER not in response.headers
+        time.sleep(0.05)
+        assert not list(tmp_path.iterdir())
+
+    def test_sync_endpoint_is_profiled_on_request(self, tmp_path: Path):
+        client = _client(tmp_path, profiling_token="secret")
+        response = client.get("/sync", headers={PROFILE_HEADER: "secret"})
+        assert response.status_code == 200
+        profile, metadata = _wait_for_profile(tmp_path, response.headers[PROFILE_ID_HEADER])
+        assert metadata["trigger"] == "header"
+        assert metadata["path"] == "/sync"
+        assert metadata["route"] == "/sync"
+        assert metadata["status"] == 200
+        assert metadata["duration_seconds"] >= 0.1
+        assert metadata["samples"] > 0
+        lines = profile.splitlines()
+        # the stacks of the worker thread start at the endpoint function; the event loop thread is sampled, too,
+        # when it happens to run the (code around the) request at that moment
+        worker_lines = [line for line in lines if not line.startswith("__call__ (")]
+        assert worker_lines
+        assert all(line.startswith("sync_endpoint (") for line in worker_lines)
+        assert any("_busy_sync_work (" in line for line in worker_lines)
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == metadata["samples"]
+
+    def test_async_endpoint_is_profiled_on_request(self, tmp_path: Path):
+        client = _client(tmp_path, profiling_token="secret")
+        response = client.get("/async", headers={PROFILE_HEADER: "secret"})
+        profile, _ = _wait_for_profile(tmp_path, response.headers[PROFILE_ID_HEADER])
+        # the stacks of the event loop thread start at the middleware
+        assert all(line.startswith("__call__ (") for line in profile.splitlines())
+        assert "async_endpoint (" in profile
+        assert "_busy_async_work (" in profile
+
+    def test_sampled_requests_are_rate_limited(self, tmp_path: Path):
+        client = _client(tmp_path, profiling_sample_rate=1.0, profiling_max_per_minute=2)
+        for _ in range(4):
+            response = client.get("/sync")
+            assert response.status_code == 200
+            assert PROFILE_ID_HEADER not in response.headers
+        deadline = time.monotonic() + 5
+        while len(list(tmp_path.glob("*.json"))) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        metadata = [json.loads(file.read_text()) for file in tmp_path.glob("*.json")]
+        assert [entry["trigger"] for entry in metadata] == ["sample", "sample"]
@@ -0,0 +1,91 @@
+"""Tests for the one-pass JSON serialization of the generated Fristen."""
+
+import dataclasses
+import json
+from typing import Sequence
+
+import pytest
+from fastapi.responses import JSONResponse
+from fristenkalender_generator.bdew_calendar_generator import (
+    FristenkalenderGenerator,
+    FristenType,
+    FristWithAttributes,
+    FristWithAttributesAndType,
+)
+
+from app.serialization import serialize_frist, serialize_fristen, serialize_fristen_columnar
+
+
+def _legacy_response_body(fristen: list) -> bytes:
+    """the bytes the Fristen endpoints sent before the dedicated serializer existed"""
+    serialized = [dataclasses.asdict(x) for x in fristen]
+    return bytes(JSONResponse(content=json.loads(json.dumps(serialized, indent=4, sort_keys=True, default=str))).body)
+
+
+def _columnar_to_rows(columnar: dict) -> list[dict]:
+    """the rows the columnar format stands for"""
+    columns = {
+        key: (
+            [None if index is None else columnar["values"][key][index] for index in column]
+            if key in columnar["values"]
+            else column
+        )
+        for key, column in columnar["columns"].items()
+    }
+    return [{key: column[row] for key, column in columns.items()} for row in range(columnar["length"])]
+
+
+class TestSerializeFristen:
+    @pytest.mark.parametrize("year", [pytest.param(1901), pytest.param(2023), pytest.param(2025), pytest.param(2099)])
+    def test_all_fristen_are_byte_compatible(self, year: int):
+        fristen = FristenkalenderGenerator().generate_all_fristen(year)
+        assert serialize_fristen(fristen) == _legacy_response_body(fristen)
+
+    @pytest.mark.parametrize("fristen_type", list(FristenType))
+    def test_fristen_for_type_are_byte_compatible(self, fristen_type: FristenType):
+        fristen = FristenkalenderGenerator().generate_fristen_for_type(2024, fristen_type)
+        assert serialize_fristen(fristen) == _legacy_response_body(fristen)
+
+    def test_single_frist(self):
+        frist = FristenkalenderGenerator().generate_fristen_for_type(2024, FristenType.GPKE)[0]
+        assert json.loads(serialize_frist(frist)) == json.loads(_legacy_response_body([frist]))[0]
+
+    def test_empty(self):
+        assert serialize_fristen([]) == b"[]"
+
+
+class TestSerializeFristenColumnar:
+    @pytest.mark.parametrize("fristen_type", [None, *FristenType])
+    def test_same_fristen_as_rows(self, fristen_type: FristenType | None):
+        generator = FristenkalenderGenerator()
+        fristen: Sequence[FristWithAttributes]
+        if fristen_type is None:
+            fristen = generator.generate_all_fristen(2024)
+        else:
+            fristen = generator.generate_fristen_for_type(2024, fristen_type)
+        columnar = serialize_fristen_columnar(fristen)
+        assert _columnar_to_rows(json.loads(columnar)) == json.loads(serialize_fristen(fristen))
+        assert len(columnar) < len(serialize_fristen(fristen))
+
+    def test_text_values_are_interned(self):
+        fristen = FristenkalenderGenerator().generate_fristen_for_type(2024, FristenType.GPKE)
+        columnar = json.loads(serialize_fristen_columnar(fristen))
+        assert columnar["length"] == len(fristen)
+        assert columnar["values"]["fristen_type"] == ["FristenType.GPKE"]
+        assert columnar["columns"]["fristen_type"] == [0] * len(fristen)
+        assert sorted(columnar["values"]) == ["description", "fristen_type", "label"]
+        assert columnar["columns"]["date"] == [frist.date.isoformat() for frist in fristen]
+
+    def test_empty(self):
+        columnar = json.loads(serialize_fristen_columnar([], FristWithAttributesAndType))
+        assert columnar == {
+            "columns": {
+                "date": [],
+                "description": [],
+                "fristen_type": [],
+                "label": [],
+                "ref_not_in_the_same_month": [],
+            },
+            "length": 0,
+            "values": {"description": [], "fristen_type": [], "label": []},
+        }
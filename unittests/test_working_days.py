@@ -0,0 +1,137 @@
+"""Tests for the precomputed working day index."""
+
+from datetime import date, timedelta
+from http import HTTPStatus
+
+import pytest
+from bdew_datetimes.enums import DayType, EndDateType
+from bdew_datetimes.models import Period
+from bdew_datetimes.periods import add_frist, get_next_working_day, get_previous_working_day, is_bdew_working_day
+from fastapi.testclient import TestClient
+
+from app import working_days
+from app.main import app
+from app.working_days import WorkingDayIndex
+
+client = TestClient(app)
+
+_FIRST_DAY = date(2023, 1, 1)
+_LAST_DAY = date(2026, 12, 31)
+_INDEX = WorkingDayIndex.build(_FIRST_DAY, _LAST_DAY)
+_ALL_DAYS = [_FIRST_DAY + timedelta(days=offset) for offset in range((_LAST_DAY - _FIRST_DAY).days + 1)]
+_INNER_DAYS = [day for day in _ALL_DAYS if date(2023, 3, 1) <= day <= date(2026, 10, 31)]  # results stay in the index
+
+
+@pytest.fixture
+def with_index(monkeypatch: pytest.MonkeyPatch) -> WorkingDayIndex:
+    """makes the module level functions (and thus the endpoints) use the small test index"""
+    monkeypatch.setattr(working_days, "_index", _INDEX)
+    return _INDEX
+
+
+class TestWorkingDayIndex:
+    def test_flags_equal_bdew_datetimes(self):
+        assert all(_INDEX.is_working_day(day) == is_bdew_working_day(day) for day in _ALL_DAYS)
+
+    def test_next_and_previous_working_day_equal_bdew_datetimes(self):
+        for day in _INNER_DAYS:
+            assert _INDEX.next_working_day(day) == get_next_working_day(day), day
+            assert _INDEX.previous_working_day(day) == get_previous_working_day(day), day
+
+    @pytest.mark.parametrize("number_of_days", [-20, -5, -1, 0, 1, 5, 20])
+    @pytest.mark.parametrize("day_type", [DayType.WORKING_DAY, DayType.CALENDAR_DAY])
+    @pytest.mark.parametrize("end_date_type", [EndDateType.INCLUSIVE, EndDateType.EXCLUSIVE])
+    def test_add_frist_equals_bdew_datetimes(self, number_of_days: int, day_type: DayType, end_date_type: EndDateType):
+        period = Period(number_of_days=number_of_days, day_type=day_type, end_date_type=end_date_type)
+        for day in _INNER_DAYS[::3]:
+            assert _INDEX.add_frist(day, period) == add_frist(day, period), day
+
+    def test_outside_of_range(self):
+        assert _INDEX.is_working_day(date(2022, 12, 31)) is None
+        assert _INDEX.next_working_day(_LAST_DAY) is None  # the next working day is not covered
+        assert _INDEX.previous_working_day(_FIRST_DAY) is None
+        assert _INDEX.add_frist(date(2026, 12, 1), Period(100, DayType.WORKING_DAY)) is None
+
+
+class TestFallback:
+    def test_without_index(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(working_days, "_index", None)
+        assert working_days.is_working_day(date(2024, 12, 24)) is False
+        assert working_days.next_working_day(date(2024, 12, 23)) == date(2024, 12, 27)
+        assert working_days.add_frist(date(2024, 1, 2), Period(5, DayType.WORKING_DAY)) == date(2024, 1, 10)
+
+    def test_is_covered(self, with_index: WorkingDayIndex):
+        assert working_days.is_covered(date(2023, 1, 1), date(2026, 12, 31))
+        assert not working_days.is_covered(date(2023, 1, 1), date(2027, 1, 1))
+
+    def test_outside_of_index(self, with_index: WorkingDayIndex):
+        assert working_days.is_working_day(date(2030, 1, 1)) is False
+        assert working_days.previous_working_day(date(2023, 1, 2)) == date(2022, 12, 30)
+        # the result leaves the index, so the whole calculation falls back to bdew_datetimes
+        assert working_days.add_frist(date(2026, 12, 1), Period(100, DayType.WORKING_DAY)) == add_frist(
+            date(2026, 12, 1), Period(100, DayType.WORKING_DAY)
+        )
+
+
+class TestEndpointsUseIndex:
+    def test_endpoints(self, with_index: WorkingDayIndex):
+        assert client.get("/api/IsWorkingDay/2024-12-24").json()["is_working_day"] is False
+        assert client.get("/api/NextWorkingDay/2024-12-23").json()["next_working_day"] == "2024-12-27"
+        assert client.get("/api/PreviousWorkingDay/2024-12-27").json()["previous_working_day"] == "2024-12-23"
+        response = client.get("/api/AddWorkingDays/2024-01-02/500")
+        assert response.status_code == HTTPStatus.OK
+        assert (
+            response.json()["result_date"] == add_frist(date(2024, 1, 2), Period(500, DayType.WORKING_DAY)).isoformat()
+        )
+
+
+class TestBatchFlags:
+    def test_flags_for_equal_single_lookups(self, with_index: WorkingDayIndex):
+        days = _ALL_DAYS[::7] + [date(1999, 1, 1)]  # the last one is not covered by the index
+        assert list(working_days.working_day_flags(days)) == [is_bdew_working_day(d) for d in days]
+        assert _INDEX.flags_for(days) is None
+        assert _INDEX.flags_for(_ALL_DAYS) == bytes(is_bdew_working_day(d) for d in _ALL_DAYS)
+
+    def test_flags_between(self, with_index: WorkingDayIndex):
+        assert _INDEX.flags_between(_FIRST_DAY, _LAST_DAY) == _INDEX.flags
+        assert working_days.working_day_flags_between(date(2022, 12, 30), date(2023, 1, 3)) == bytes([1, 0, 0, 1, 1])
+
+
+class TestAddFrists:
+    @pytest.mark.parametrize("day_type", [DayType.WORKING_DAY, DayType.CALENDAR_DAY])
+    def test_equals_add_frist(self, with_index: WorkingDayIndex, day_type: DayType):
+        starts = _INNER_DAYS[::11] + [date(2010, 1, 1), date(2026, 12, 20)]  # the last two are not (fully) covered
+        periods = [Period(number_of_days=(i % 41) - 20, day_type=day_type) for i in range(len(starts))]
+        expected = [add_frist(start, period) for start, period in zip(starts, periods)]
+        assert working_days.add_frists(starts, periods) == expected
+
+    def test_mixed_day_types(self):
+        with pytest.raises(ValueError):
+            working_days.add_frists(
+                [date(2024, 1, 1)] * 2, [Period(1, DayType.WORKING_DAY), Period(1, DayType.CALENDAR_DAY)]
+            )
+
+
+class TestHolidays:
+    def test_equal_fallback(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(working_days, "_index", None)
+        assert _INDEX.holidays_between(_FIRST_DAY, _LAST_DAY) == working_days.holidays_between(_FIRST_DAY, _LAST_DAY)
+
+    def test_flags_are_derived_from_the_holidays(self):
+        holidays = _INDEX.holidays_between(_FIRST_DAY, _LAST_DAY)
+        assert holidays is not None
+        holiday_dates = {holiday.date for holiday in holidays}
+        assert all(_INDEX.is_working_day(day) == (day.weekday() < 5 and day not in holiday_dates) for day in _ALL_DAYS)
+
+    def test_range(self, with_index: WorkingDayIndex):
+        assert working_days.holidays_between(date(2024, 12, 24), date(2024, 12, 26)) == [
+            working_days.Holiday(date(2024, 12, 24), "Heiligabend"),
+            working_days.Holiday(date(2024, 12, 25), "Erster Weihnachtstag"),
+            working_days.Holiday(date(2024, 12, 26), "Zweiter Weihnachtstag"),
+        ]
+        assert not working_days.holidays_between(date(2024, 12, 27), date(2024, 12, 30))
+        assert _INDEX.holidays_between(date(2022, 12, 31), date(2023, 1, 1)) is None  # not covered
+        assert working_days.holidays_between(date(2022, 12, 31), date(2023, 1, 1)) == [
+            working_days.Holiday(date(2022, 12, 31), "Silvester"),
+            working_days.Holiday(date(2023, 1, 1), "Neujahr"),
+        ]